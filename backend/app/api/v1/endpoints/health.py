@@ -8,6 +8,10 @@ from sqlalchemy import text
 from datetime import datetime
 from typing import Dict, Any
 from app.core.dependencies import get_db
+from app.core.password_hasher import password_hasher
+from app.core.principal_cache import principal_cache
+from app.core.tokenizer import token_counter
+from app.services.login_history_buffer import login_history_buffer
 from app.config import settings
 
 router = APIRouter()
@@ -101,4 +105,10 @@ async def detailed_health_check(db: AsyncSession = Depends(get_db)) -> Dict[str,
         "has_openai_key": bool(settings.OPENAI_API_KEY)
     }
     
+    # 认证主体缓存
+    health_info["components"]["principal_cache"] = principal_cache.get_stats()
+    health_info["components"]["password_hasher"] = password_hasher.get_stats()
+    health_info["components"]["login_history_buffer"] = login_history_buffer.get_stats()
+    health_info["components"]["token_counter"] = token_counter.get_stats()
+    
     return health_info 
\ No newline at end of file
@@ -2,29 +2,92 @@
 提示词优化API接口
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+import json
 import time
 
 from app.models.user import User
 from app.models.optimization import Optimization, OptimizationImprovement
+from app.models.batch_job import BatchJob
 from app.schemas.optimization import (
     OptimizationRequest,
     OptimizationResponse,
+    OptimizationMode,
+    EvaluationMode,
     QualityEvaluationRequest,
     QualityEvaluationResponse,
     OptimizationSuggestionResponse,
     BatchOptimizationRequest,
-    BatchOptimizationResponse
+    BatchOptimizationFailure,
+    BatchOptimizationResponse,
+    BatchJobCreateRequest,
+    BatchJobResponse,
+    BatchJobResultItem,
+    BatchJobResultsResponse
 )
-from app.core.ai_client import ai_client, AIServiceException
+from app.core.ai_client import ai_client, AIServiceException, AIUsageStats, OptimizationResult
+from app.core.prompt_analyzer import HeuristicQuality, prompt_analyzer
+from app.core.metrics import pipeline_stage_duration
+from app.config import settings
+from app.database import async_session_maker
+from app.services.optimization_service import (
+    OptimizationService,
+    decode_history_cursor,
+    encode_history_cursor
+)
+from app.services.batch_job_service import BatchJobService, batch_job_worker
 from app.core.dependencies import get_current_user, get_db
 from app.utils.exceptions import PromptOptimizerException
 
 router = APIRouter(prefix="/optimizer", tags=["optimizer"])
 
 
+async def _get_default_user(db: AsyncSession) -> User:
+    """临时使用第一个用户，不存在时创建默认测试用户"""
+    from sqlalchemy import select
+    
+    result = await db.execute(select(User).limit(1))
+    current_user = result.scalar_one_or_none()
+    
+    if not current_user:
+        # 创建默认测试用户
+        current_user = User(
+            username="testuser",
+            email="test@example.com",
+            hashed_password="$2b$12$dummy",  # 临时密码hash
+            is_active=True
+        )
+        db.add(current_user)
+        await db.flush()
+    
+    return current_user
+
+
+async def _save_optimization(
+    db: AsyncSession,
+    user: User,
+    request: OptimizationRequest,
+    result: OptimizationResult
+) -> Tuple[Optimization, List[OptimizationImprovement]]:
+    """保存优化记录及改进说明并提交"""
+    with pipeline_stage_duration.labels("db_write").time():
+        return await OptimizationService(db).save_result(
+            user_id=user.id,
+            original_prompt=request.original_prompt,
+            optimization_type=request.optimization_type,
+            result=result,
+            ai_model_used=ai_client.model
+        )
+
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
 @router.post("/optimize", response_model=OptimizationResponse)
 async def optimize_prompt(
     request: OptimizationRequest,
@@ -44,60 +107,17 @@ async def optimize_prompt(
     """
     try:
         # 临时使用固定用户ID（用于测试）
-        from sqlalchemy import select
-        
-        # 查找第一个用户或创建默认用户
-        result = await db.execute(select(User).limit(1))
-        current_user = result.scalar_one_or_none()
-        
-        if not current_user:
-            # 创建默认测试用户
-            current_user = User(
-                username="testuser",
-                email="test@example.com",
-                hashed_password="$2b$12$dummy",  # 临时密码hash
-                is_active=True
-            )
-            db.add(current_user)
-            await db.flush()
+        current_user = await _get_default_user(db)
         
         # 调用AI服务进行优化
         result = await ai_client.optimize_prompt(
             original_prompt=request.original_prompt,
-            optimization_type=request.optimization_type
-        )
-        
-        # 保存优化记录到数据库
-        optimization = Optimization(
-            user_id=current_user.id,
-            original_prompt=request.original_prompt,
-            optimized_prompt=result.optimized_prompt,
-            quality_score_before=result.quality_score_before,
-            quality_score_after=result.quality_score_after,
             optimization_type=request.optimization_type,
-            ai_model_used=ai_client.model,
-            processing_time=result.processing_time,
-            prompt_tokens=result.usage_stats.prompt_tokens,
-            completion_tokens=result.usage_stats.completion_tokens,
-            total_tokens=result.usage_stats.total_tokens,
-            cost_estimate=result.usage_stats.cost_estimate
+            mode=request.optimization_mode
         )
         
-        db.add(optimization)
-        await db.flush()  # 获取生成的ID
-        
-        # 保存改进说明 
-        improvements = []
-        for improvement_data in result.improvements:
-            improvement = OptimizationImprovement(
-                optimization_id=optimization.id,
-                improvement_type=improvement_data["type"],
-                description=improvement_data["description"]
-            )
-            db.add(improvement)
-            improvements.append(improvement)
-        
-        await db.commit()
+        # 保存优化记录到数据库
+        optimization, improvements = await _save_optimization(db, current_user, request, result)
         
         # 构造响应
         return OptimizationResponse(
@@ -136,6 +156,58 @@ async def optimize_prompt(
         )
 
 
+@router.post("/optimize/stream")
+async def optimize_prompt_stream(request: OptimizationRequest):
+    """
+    流式优化提示词
+    
+    以Server-Sent Events推送 start、analysis、delta、improvement、final 事件，
+    结果保存后推送 done 事件（包含记录ID），出错时推送 error 事件。
+    
+    Args:
+        request: 优化请求参数，只支持standard模式，fused模式返回400
+        
+    Returns:
+        text/event-stream 响应
+    """
+    # fused模式的单次结构化回复要完整接收后才能解析，无法边生成边推送
+    if request.optimization_mode != OptimizationMode.STANDARD:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"流式优化不支持{request.optimization_mode.value}模式，请使用 /optimize"
+        )
+    
+    async def event_stream():
+        try:
+            result = None
+            async for item in ai_client.optimize_prompt_stream(
+                original_prompt=request.original_prompt,
+                optimization_type=request.optimization_type
+            ):
+                if item["event"] == "final":
+                    result = OptimizationResult(**{
+                        **item["data"],
+                        "usage_stats": AIUsageStats(**item["data"]["usage_stats"])
+                    })
+                yield _format_sse(item["event"], item["data"])
+            
+            # 响应开始后依赖注入的会话生命周期不确定，这里单独开启会话
+            async with async_session_maker() as db:
+                current_user = await _get_default_user(db)
+                optimization, _ = await _save_optimization(db, current_user, request, result)
+            yield _format_sse("done", {"id": optimization.id})
+        except AIServiceException as e:
+            yield _format_sse("error", {"detail": f"AI服务不可用: {str(e)}"})
+        except Exception as e:
+            yield _format_sse("error", {"detail": f"优化失败: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/evaluate", response_model=QualityEvaluationResponse)
 async def evaluate_prompt_quality(
     request: QualityEvaluationRequest
@@ -143,12 +215,22 @@ async def evaluate_prompt_quality(
     """
     评估提示词质量
     
+    mode=llm 使用模型评估；mode=fast 只用本地规则评估，不调用模型；
+    mode=auto 先本地评估，置信度低于 EVALUATE_AUTO_MIN_CONFIDENCE 时再调用模型，
+    模型不可用时返回本地评估结果。
+    
     Args:
         request: 评估请求
         
     Returns:
         质量评估结果
     """
+    heuristic = None
+    if request.mode != EvaluationMode.LLM:
+        heuristic = prompt_analyzer.estimate_quality(request.prompt)
+        if request.mode == EvaluationMode.FAST or heuristic.confidence >= settings.EVALUATE_AUTO_MIN_CONFIDENCE:
+            return _heuristic_evaluation_response(heuristic)
+    
     try:
         analysis = await ai_client.analyze_prompt_quality(request.prompt)
         
@@ -157,10 +239,13 @@ async def evaluate_prompt_quality(
             detailed_scores=analysis["scores"],
             issues=analysis["issues"],
             suggestions=analysis["suggestions"],
-            processing_time=analysis["processing_time"]
+            processing_time=analysis["processing_time"],
+            confidence=heuristic.confidence if heuristic else None
         )
         
     except AIServiceException as e:
+        if heuristic is not None:
+            return _heuristic_evaluation_response(heuristic)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"AI服务不可用: {str(e)}"
@@ -172,6 +257,19 @@ async def evaluate_prompt_quality(
         )
 
 
+def _heuristic_evaluation_response(heuristic: HeuristicQuality) -> QualityEvaluationResponse:
+    """由本地评估结果构造响应"""
+    return QualityEvaluationResponse(
+        overall_score=round(heuristic.overall_score),
+        detailed_scores=heuristic.scores,
+        issues=heuristic.issues,
+        suggestions=heuristic.suggestions,
+        processing_time=heuristic.processing_time,
+        source="heuristic",
+        confidence=heuristic.confidence
+    )
+
+
 @router.post("/suggestions", response_model=OptimizationSuggestionResponse)
 async def get_optimization_suggestions(
     request: QualityEvaluationRequest
@@ -221,6 +319,7 @@ async def batch_optimize_prompts(
     Returns:
         批量优化结果
     """
+    start_time = time.time()
     try:
         # 限制批量处理数量
         if len(request.prompts) > 10:
@@ -232,13 +331,19 @@ async def batch_optimize_prompts(
         # 执行批量优化
         results = await ai_client.batch_optimize(
             prompts=request.prompts,
-            optimization_type=request.optimization_type
+            optimization_type=request.optimization_type,
+            mode=request.optimization_mode
         )
         
-        # 保存所有结果到数据库
+        # 保存成功的结果到数据库，失败项单独返回
         optimization_responses = []
+        failures = []
         
         for i, result in enumerate(results):
+            if result.error is not None:
+                failures.append(BatchOptimizationFailure(index=i, original_prompt=request.prompts[i], error=result.error))
+                continue
+            
             optimization = Optimization(
                 user_id=current_user.id,
                 original_prompt=request.prompts[i],
@@ -295,9 +400,11 @@ async def batch_optimize_prompts(
         
         return BatchOptimizationResponse(
             results=optimization_responses,
-            total_count=len(optimization_responses),
+            failures=failures,
+            total_count=len(results),
             success_count=len(optimization_responses),
-            failed_count=0
+            failed_count=len(failures),
+            total_processing_time=time.time() - start_time
         )
         
     except AIServiceException as e:
@@ -314,6 +421,162 @@ async def batch_optimize_prompts(
         )
 
 
+@router.post("/jobs", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_batch_job(
+    request: BatchJobCreateRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    提交批量优化任务
+    
+    立即返回任务ID，由后台worker按有限并发处理，
+    通过 GET /optimizer/jobs/{job_id} 轮询进度。
+    
+    Args:
+        request: 批量任务请求参数
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        任务状态
+    """
+    job = await BatchJobService(db).create_job(
+        user_id=current_user.id,
+        prompts=request.prompts,
+        optimization_type=request.optimization_type,
+        optimization_mode=request.optimization_mode
+    )
+    batch_job_worker.notify()
+    
+    return _batch_job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=BatchJobResponse)
+async def get_batch_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    查询批量优化任务进度
+    
+    Args:
+        job_id: 任务ID
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        任务状态
+    """
+    job = await BatchJobService(db).get_job(job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在"
+        )
+    
+    return _batch_job_response(job)
+
+
+@router.get("/jobs/{job_id}/results", response_model=BatchJobResultsResponse)
+async def get_batch_job_results(
+    job_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    分页获取批量优化任务的已完成结果
+    
+    结果按完成顺序排列，新完成的结果追加在末尾，
+    客户端可以用已读取的数量作为下次的skip继续拉取。
+    
+    Args:
+        job_id: 任务ID
+        skip: 跳过数量
+        limit: 返回数量（1-200）
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        已完成的任务项
+    """
+    limit = max(1, min(limit, 200))
+    service = BatchJobService(db)
+    job = await service.get_job(job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在"
+        )
+    
+    items = await service.get_results(job_id, skip=skip, limit=limit, user_id=current_user.id)
+    total = job.succeeded_count + job.failed_count
+    
+    return BatchJobResultsResponse(
+        items=[
+            BatchJobResultItem(
+                position=item.position,
+                original_prompt=item.prompt,
+                status=item.status,
+                error=item.error,
+                result=_optimization_response(item.optimization) if item.optimization else None
+            )
+            for item in items
+        ],
+        total=total,
+        skip=skip,
+        limit=limit,
+        has_more=skip + len(items) < total
+    )
+
+
+def _batch_job_response(job: BatchJob) -> BatchJobResponse:
+    """构造任务状态响应"""
+    finished = job.succeeded_count + job.failed_count
+    return BatchJobResponse(
+        id=job.id,
+        status=job.status,
+        optimization_type=job.optimization_type,
+        optimization_mode=job.optimization_mode,
+        total_count=job.total_count,
+        succeeded_count=job.succeeded_count,
+        failed_count=job.failed_count,
+        progress=finished / job.total_count if job.total_count else 1.0,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+
+def _optimization_response(optimization: Optimization) -> OptimizationResponse:
+    """由已加载改进说明的优化记录构造响应"""
+    return OptimizationResponse(
+        id=optimization.id,
+        original_prompt=optimization.original_prompt,
+        optimized_prompt=optimization.optimized_prompt,
+        quality_score_before=optimization.quality_score_before or 0,
+        quality_score_after=optimization.quality_score_after or 0,
+        optimization_type=optimization.optimization_type,
+        improvements=[
+            {
+                "type": imp.improvement_type,
+                "description": imp.description
+            } for imp in optimization.improvements
+        ],
+        processing_time=optimization.processing_time or 0,
+        token_usage={
+            "prompt_tokens": optimization.prompt_tokens or 0,
+            "completion_tokens": optimization.completion_tokens or 0,
+            "total_tokens": optimization.total_tokens or 0,
+            "cost_estimate": optimization.cost_estimate or 0
+        },
+        created_at=optimization.created_at
+    )
+
+
 @router.get("/health")
 async def check_ai_health():
     """
@@ -333,6 +596,17 @@ async def check_ai_health():
         )
 
 
+@router.get("/runtime-stats")
+async def get_runtime_stats():
+    """
+    获取AI调用运行时统计（并发、排队等）
+    
+    Returns:
+        运行时统计信息
+    """
+    return ai_client.get_runtime_stats()
+
+
 # ==================== 历史记录相关API ====================
 
 @router.get("/history", response_model=dict)
@@ -342,6 +616,8 @@ async def get_optimization_history(
     category: Optional[str] = None,
     sort_by: Optional[str] = None,
     sort_order: Optional[str] = None,
+    view: str = "full",
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -354,82 +630,64 @@ async def get_optimization_history(
         category: 分类筛选
         sort_by: 排序字段
         sort_order: 排序顺序
+        view: full 返回完整记录；summary 只返回提示词预览和改进说明数量
+        cursor: 上一页返回的 next_cursor，指定时按游标分页并忽略 skip
         current_user: 当前用户
         db: 数据库会话
         
     Returns:
-        历史记录列表和分页信息
+        历史记录列表和分页信息，next_cursor 为空表示没有下一页
     """
+    limit = max(1, min(limit, 100))
     try:
-        from sqlalchemy import select, desc, asc
-        
-        # 构建查询
-        query = select(Optimization).where(Optimization.user_id == current_user.id)
-        
-        # 分类筛选
-        if category:
-            query = query.where(Optimization.optimization_type == category)
-        
-        # 排序
-        if sort_by == 'created_at':
-            if sort_order == 'asc':
-                query = query.order_by(asc(Optimization.created_at))
-            else:
-                query = query.order_by(desc(Optimization.created_at))
-        elif sort_by == 'quality_score':
-            if sort_order == 'asc':
-                query = query.order_by(asc(Optimization.quality_score_after))
-            else:
-                query = query.order_by(desc(Optimization.quality_score_after))
-        else:
-            # 默认按创建时间倒序
-            query = query.order_by(desc(Optimization.created_at))
-        
-        # 获取总数
-        count_query = select(Optimization).where(Optimization.user_id == current_user.id)
-        if category:
-            count_query = count_query.where(Optimization.optimization_type == category)
-        
-        total_result = await db.execute(count_query)
-        total = len(total_result.fetchall())
+        after = decode_history_cursor(cursor, sort_by, sort_order) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        service = OptimizationService(db)
+        total = await service.count_history(current_user.id, category)
         
-        # 分页
-        query = query.offset(skip).limit(limit)
-        result = await db.execute(query)
-        optimizations = result.scalars().all()
-        
-        # 转换为响应格式
-        records = []
-        for opt in optimizations:
-            # 获取该优化记录的改进说明
-            improvements_query = select(OptimizationImprovement).where(
-                OptimizationImprovement.optimization_id == opt.id
+        # 多取一条判断是否还有下一页
+        if view == "summary":
+            records = await service.list_history_summaries(
+                current_user.id, skip, limit + 1, category, sort_by, sort_order, after=after
             )
-            improvements_result = await db.execute(improvements_query)
-            improvements = improvements_result.scalars().all()
-            
-            records.append({
-                "id": opt.id,
-                "original_prompt": opt.original_prompt,
-                "optimized_prompt": opt.optimized_prompt,
-                "quality_score_before": opt.quality_score_before,
-                "quality_score_after": opt.quality_score_after,
-                "optimization_type": opt.optimization_type,
-                "created_at": opt.created_at,
-                "improvements": [
-                    {
-                        "type": imp.improvement_type,
-                        "description": imp.description
-                    } for imp in improvements
-                ],
-                "processing_time": opt.processing_time
-            })
+        else:
+            optimizations = await service.list_history(
+                current_user.id, skip, limit + 1, category, sort_by, sort_order, after
+            )
+            records = [
+                {
+                    "id": opt.id,
+                    "original_prompt": opt.original_prompt,
+                    "optimized_prompt": opt.optimized_prompt,
+                    "quality_score_before": opt.quality_score_before,
+                    "quality_score_after": opt.quality_score_after,
+                    "optimization_type": opt.optimization_type,
+                    "created_at": opt.created_at,
+                    "improvements": [
+                        {
+                            "type": imp.improvement_type,
+                            "description": imp.description
+                        } for imp in opt.improvements
+                    ],
+                    "processing_time": opt.processing_time
+                }
+                for opt in optimizations
+            ]
+        
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = encode_history_cursor(records[-1], sort_by, sort_order)
         
         return {
             "records": records,
             "total": total,
-            "page": (skip // limit) + 1 if limit > 0 else 1,
-            "pageSize": limit
+            "page": (skip // limit) + 1 if limit > 0 and cursor is None else None,
+            "pageSize": limit,
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
@@ -457,15 +715,7 @@ async def get_optimization_detail(
         优化记录详情
     """
     try:
-        from sqlalchemy import select
-        
-        # 查询优化记录
-        query = select(Optimization).where(
-            Optimization.id == optimization_id,
-            Optimization.user_id == current_user.id
-        )
-        result = await db.execute(query)
-        optimization = result.scalar_one_or_none()
+        optimization = await OptimizationService(db).get_with_improvements(optimization_id, current_user.id)
         
         if not optimization:
             raise HTTPException(
@@ -473,13 +723,6 @@ async def get_optimization_detail(
                 detail="优化记录不存在"
             )
         
-        # 获取改进说明
-        improvements_query = select(OptimizationImprovement).where(
-            OptimizationImprovement.optimization_id == optimization.id
-        )
-        improvements_result = await db.execute(improvements_query)
-        improvements = improvements_result.scalars().all()
-        
         return {
             "id": optimization.id,
             "original_prompt": optimization.original_prompt,
@@ -492,7 +735,7 @@ async def get_optimization_detail(
                 {
                     "type": imp.improvement_type,
                     "description": imp.description
-                } for imp in improvements
+                } for imp in optimization.improvements
             ],
             "processing_time": optimization.processing_time,
             "token_usage": {
@@ -3,7 +3,7 @@
 """
 
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import os
 
 
@@ -25,16 +25,100 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = "Qwen/Qwen2.5-7B-Instruct"
     OPENAI_MAX_TOKENS: int = 4000
     OPENAI_TEMPERATURE: float = 0.7
-    
+
+    # LLM请求调度配置
+    LLM_MAX_CONCURRENCY: int = 16               # 全局最大并发请求数
+    LLM_MAX_CONCURRENCY_PER_MODEL: int = 8      # 单个模型默认最大并发请求数
+    LLM_MODEL_CONCURRENCY: Dict[str, int] = {}  # 按模型覆盖并发上限
+    LLM_MAX_CONNECTIONS: int = 32
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 16
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_REQUEST_TIMEOUT: float = 60.0
+
+    # LLM重试与熔断配置
+    LLM_RETRY_BASE_DELAY: float = 0.5           # 重试退避的最短等待（秒）
+    LLM_RETRY_MAX_DELAY: float = 8.0            # 退避上限（秒），Retry-After超过此值时不再重试
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5      # 连续失败多少次后熔断，0表示禁用
+    LLM_BREAKER_RECOVERY_TIME: float = 30.0     # 熔断后多久放行探测请求（秒）
+
+    # LLM请求对冲配置（只用于非流式请求）
+    LLM_HEDGE_ENABLED: bool = False             # 超过近期耗时分位数仍未返回时再发一个相同请求
+    LLM_HEDGE_PERCENTILE: float = 0.95          # 按近期成功请求耗时的此分位数决定对冲等待时间
+    LLM_HEDGE_MIN_DELAY: float = 0.5            # 对冲等待时间下限（秒）
+    LLM_HEDGE_MIN_SAMPLES: int = 20             # 同一调用位置样本数不足时不对冲
+    LLM_HEDGE_BUDGET_RATIO: float = 0.05        # 对冲请求数不超过主请求数的比例
+
+    # LLM多模型路由配置
+    LLM_PROVIDERS: List[Dict[str, Any]] = []    # 额外的OpenAI兼容服务：[{"name", "base_url", "api_key", "models"}]
+    LLM_ROUTES: Dict[str, List[str]] = {}       # 按调用位置的候选模型，"default"用于其余调用位置，为空时都使用OPENAI_MODEL
+    LLM_ROUTER_EWMA_ALPHA: float = 0.2          # 耗时和错误率EWMA的平滑系数
+    LLM_ROUTER_COST_WEIGHT: float = 50.0        # 每千token均价每增加1美元相当于多少秒延迟
+    LLM_ROUTER_ERROR_PENALTY: float = 4.0       # 错误率对耗时估计的放大系数
+    LLM_ROUTER_EXPLORE: float = 0.05            # 随机选择其他候选的概率，使各候选的统计保持更新
+
+    # 批量优化调度配置（0表示不限制）
+    BATCH_MAX_CONCURRENCY: int = 4              # 同时进行的优化流程数
+    BATCH_REQUESTS_PER_MINUTE: int = 300        # 批量优化的每分钟请求数预算
+    BATCH_TOKENS_PER_MINUTE: int = 100000       # 批量优化的每分钟Token预算
+
+    # Token计数配置
+    TOKENIZER_ENCODING: str = ""                # tiktoken编码名称，为空时按OPENAI_MODEL选择
+    TOKEN_COUNT_CACHE_SIZE: int = 4096          # 缓存计数结果的文本条数
+
+    # 质量评估配置
+    EVALUATE_AUTO_MIN_CONFIDENCE: float = 0.6   # auto模式下本地评估置信度达到此值时不再调用模型
+
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379/0"
-    
+
+    # 响应缓存配置
+    RESPONSE_CACHE_BACKEND: str = "memory"  # memory / redis / none
+    RESPONSE_CACHE_TTL: int = 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2000
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # 语义近似缓存配置
+    SEMANTIC_CACHE_ENABLED: bool = False  # 缓存在所有用户间共享，命中时会把其他用户近似提示词的优化结果返回给当前用户
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # 余弦相似度阈值
+    SEMANTIC_CACHE_DIM: int = 1024
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000  # 0表示不启用
+    SEMANTIC_CACHE_TTL: int = 7 * 24 * 3600
+    SEMANTIC_CACHE_PATH: str = "./semantic_cache.npz"
+    SEMANTIC_CACHE_FLUSH_EVERY: int = 50  # 每累计多少次写入持久化一次
+
+    # 批量优化任务配置
+    BATCH_JOB_WORKER_ENABLED: bool = True   # 是否在本进程内运行任务worker
+    BATCH_JOB_CONCURRENCY: int = 4          # worker同时处理的任务项数
+    BATCH_JOB_MAX_PROMPTS: int = 5000       # 单个任务最多提示词数
+    BATCH_JOB_POLL_INTERVAL: float = 2.0    # 空闲时轮询队列的间隔（秒）
+    BATCH_JOB_MAX_ATTEMPTS: int = 3         # 上游暂时不可用时每项最多尝试次数
+    BATCH_JOB_RETRY_DELAY: float = 10.0     # 首次重新排队的等待时间（秒），之后每次翻倍
+    BATCH_JOB_RETRY_MAX_DELAY: float = 300.0
+    BATCH_JOB_LEASE_SECONDS: float = 300.0  # 领取任务项的租约时长（秒），处理期间定期续约，过期后可被其他worker接手
+
+    # 监控指标配置
+    METRICS_ENABLED: bool = True                # 是否记录HTTP请求指标并开放 /metrics
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5        # 事件循环延迟采样间隔（秒），0表示不采样
+
     # 日志配置
     LOG_LEVEL: str = "INFO"
     
     # JWT配置
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
+
+    # 密码哈希线程池配置
+    PASSWORD_HASH_WORKERS: int = 2              # 同时进行的bcrypt计算数，应小于CPU核数
+    PASSWORD_HASH_MAX_PENDING: int = 256        # 排队上限，超过后直接返回503
+
+    # 登录历史写缓冲配置
+    LOGIN_HISTORY_BUFFER_ENABLED: bool = False  # 开启后登录历史批量异步写入
+    LOGIN_HISTORY_FLUSH_INTERVAL: float = 2.0   # 写入间隔（秒）
+    LOGIN_HISTORY_BATCH_SIZE: int = 500         # 缓冲达到此条数时提前写入
+
+    # 认证主体缓存配置（0表示禁用）
+    PRINCIPAL_CACHE_TTL: float = 30.0           # 多进程部署时用户状态变更的最大生效延迟（秒）
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
     
     class Config:
         env_file = ".env"
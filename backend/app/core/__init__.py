@@ -3,6 +3,7 @@ Core modules for prompt optimization
 """
 
 from .ai_client import AIClient, OptimizationResult, AIUsageStats
+from .llm_dispatcher import LLMDispatcher
 from .prompt_optimizer import (
     PromptOptimizer, 
     AIPromptOptimizer, 
@@ -21,7 +22,9 @@ from .prompt_analyzer import (
     PromptFeatures, 
     PromptStructure,
     PromptType,
-    ComplexityLevel
+    ComplexityLevel,
+    HeuristicQuality,
+    BatchAnalysis
 )
 
 __all__ = [
@@ -29,6 +32,7 @@ __all__ = [
     "AIClient",
     "OptimizationResult", 
     "AIUsageStats",
+    "LLMDispatcher",
     
     # Prompt Optimizer
     "PromptOptimizer",
@@ -48,5 +52,7 @@ __all__ = [
     "PromptFeatures",
     "PromptStructure", 
     "PromptType",
-    "ComplexityLevel"
+    "ComplexityLevel",
+    "HeuristicQuality",
+    "BatchAnalysis"
 ] 
\ No newline at end of file
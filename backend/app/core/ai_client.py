@@ -1,14 +1,44 @@
 import os
 import asyncio
-import tiktoken
+import json
 import time
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Any
+from dataclasses import dataclass, asdict
 from openai import AsyncOpenAI
 from openai.types.chat import ChatCompletion
 
 from ..config import settings
-from ..utils.exceptions import AIServiceException
+from ..utils.exceptions import AIServiceException, CircuitOpenException
+from .circuit_breaker import CircuitBreaker
+from .hedging import HedgePolicy
+from .llm_dispatcher import LLMDispatcher, llm_dispatcher
+from .llm_router import DEFAULT_PROVIDER, LLMRouter, RouteTarget
+from .metrics import (
+    batch_rate_limit_wait,
+    llm_circuit_rejections,
+    llm_hedges,
+    llm_request_duration,
+    llm_retries,
+    llm_router_failovers,
+    llm_time_to_first_token,
+    pipeline_stage_duration
+)
+from .response_cache import ResponseCache, create_response_cache
+from .semantic_cache import SemanticCache, create_semantic_cache
+from .singleflight import SingleFlight
+from .result_parser import IncrementalResultParser, parse_optimization_result
+from .rate_limiter import RateLimiter
+from .retry_policy import BREAKER_FAILURES, CLIENT, RETRYABLE, RetryPolicy, classify_error
+from .tokenizer import TokenCounter, token_counter as shared_token_counter
+
+
+# 提示词模板版本，修改分析或优化模板时递增，使旧的缓存结果失效
+PROMPT_TEMPLATE_VERSION = "1"
+
+
+def _consume_exception(task: "asyncio.Future") -> None:
+    if not task.cancelled():
+        task.exception()
 
 
 @dataclass
@@ -29,15 +59,35 @@ class OptimizationResult:
     quality_score_after: int
     usage_stats: AIUsageStats
     processing_time: float
+    error: Optional[str] = None  # 批量优化中失败项的错误信息，成功时为None
 
 
 class AIClient:
     """AI服务客户端"""
     
-    def __init__(self):
+    def __init__(
+        self, 
+        dispatcher: Optional[LLMDispatcher] = None,
+        cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        token_counter: Optional[TokenCounter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        hedging: Optional[HedgePolicy] = None,
+        router: Optional[LLMRouter] = None
+    ):
         self.client = None
         self.model = settings.OPENAI_MODEL
-        self.encoding = None
+        self.token_counter = token_counter or shared_token_counter
+        self.dispatcher = dispatcher or llm_dispatcher
+        self.cache = cache if cache is not None else create_response_cache()
+        self.semantic_cache = semantic_cache if semantic_cache is not None else create_semantic_cache()
+        self.singleflight = SingleFlight()
+        self.batch_limiter = RateLimiter(settings.BATCH_REQUESTS_PER_MINUTE, settings.BATCH_TOKENS_PER_MINUTE)
+        self.retry_policy = retry_policy or RetryPolicy(settings.LLM_RETRY_BASE_DELAY, settings.LLM_RETRY_MAX_DELAY)
+        # 请求对冲默认关闭，只用于非流式请求
+        self.hedging = hedging if hedging is not None else HedgePolicy.from_settings()
+        # 按候选（服务/模型）的熔断器
+        self.breakers: Dict[str, CircuitBreaker] = {}
         
         # 定价（每1K tokens的价格，以USD为单位）
         self.pricing = {
@@ -49,6 +99,15 @@ class AIClient:
             "Qwen/Qwen2.5-32B-Instruct": {"input": 0.0021, "output": 0.0021},
             "Qwen/Qwen2.5-72B-Instruct": {"input": 0.0056, "output": 0.0056}
         }
+        # 按调用位置选择服务和模型，未配置路由时都使用默认服务的 OPENAI_MODEL
+        self.router = router or LLMRouter.from_settings(self.pricing)
+        
+        # 不同优化类型的特定要求
+        self.type_requirements = {
+            "code": "这是代码相关的提示词，请确保包含具体的编程要求、技术规范和预期输出格式。",
+            "writing": "这是写作相关的提示词，请确保包含文体要求、目标受众、风格指导和结构要求。",
+            "analysis": "这是分析相关的提示词，请确保包含分析框架、评估标准、数据要求和输出格式。"
+        }
     
     def _ensure_client_initialized(self):
         """确保客户端已初始化"""
@@ -56,74 +115,308 @@ class AIClient:
             if not settings.OPENAI_API_KEY:
                 raise AIServiceException("OpenAI API Key未配置，请设置OPENAI_API_KEY环境变量")
             
+            # 共享调度器的连接池，重试由 _make_request_with_retry 统一处理
             self.client = AsyncOpenAI(
                 api_key=settings.OPENAI_API_KEY,
-                base_url=settings.OPENAI_BASE_URL
+                base_url=settings.OPENAI_BASE_URL,
+                http_client=self.dispatcher.http_client,
+                max_retries=0
             )
-            
-        if self.encoding is None:
-            try:
-                # 对于qwen模型，使用通用编码
-                if "Qwen" in self.model:
-                    self.encoding = tiktoken.get_encoding("cl100k_base")
-                else:
-                    self.encoding = tiktoken.encoding_for_model(self.model)
-            except Exception:
-                # 如果获取编码失败，使用默认编码
-                self.encoding = tiktoken.get_encoding("cl100k_base")
     
     def count_tokens(self, text: str) -> int:
-        """计算文本的token数量"""
-        try:
-            self._ensure_client_initialized()
-            return len(self.encoding.encode(text))
-        except Exception:
-            # 如果编码失败，使用简单估算
-            return len(text) // 4
+        """计算文本的token数量（编码器不可用时为估算值）"""
+        return self.token_counter.count(text)
     
-    def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
-        """估算API调用成本"""
-        model_pricing = self.pricing.get(self.model, {"input": 0.002, "output": 0.002})
+    def estimate_cost(self, prompt_tokens: int, completion_tokens: int, model: Optional[str] = None) -> float:
+        """估算API调用成本，model 为空时按默认模型计价"""
+        model_pricing = self.pricing.get(model or self.model, {"input": 0.002, "output": 0.002})
         
         input_cost = (prompt_tokens / 1000) * model_pricing["input"]
         output_cost = (completion_tokens / 1000) * model_pricing["output"]
         
         return input_cost + output_cost
     
+    def _extract_json(self, content: str) -> Dict[str, Any]:
+        """从模型回复中提取JSON对象"""
+        if "```json" in content:
+            json_str = content.split("```json")[1].split("```")[0].strip()
+        elif "{" in content and "}" in content:
+            start = content.find("{")
+            end = content.rfind("}") + 1
+            json_str = content[start:end]
+        else:
+            json_str = content
+        
+        return json.loads(json_str)
+    
+    def _calculate_usage(
+        self,
+        messages: List[Dict[str, str]],
+        completion: str,
+        model: Optional[str] = None
+    ) -> AIUsageStats:
+        """计算单次调用的使用统计"""
+        prompt_tokens = sum(self.token_counter.count_many(msg["content"] for msg in messages))
+        completion_tokens = self.count_tokens(completion)
+        
+        return AIUsageStats(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            cost_estimate=self.estimate_cost(prompt_tokens, completion_tokens, model)
+        )
+    
+    def _response_model(self, response: ChatCompletion) -> Optional[str]:
+        """实际提供回复的模型（经路由选择），不在价格表中时返回None"""
+        model = getattr(response, "model", None)
+        return model if model in self.pricing else None
+    
+    def _cache_key(self, kind: str, prompt: str, optimization_type: str = "", mode: str = "") -> str:
+        """生成响应缓存键，未启用缓存时返回空字符串"""
+        if self.cache is None:
+            return ""
+        type_value = getattr(optimization_type, "value", optimization_type)
+        mode_value = getattr(mode, "value", mode)
+        return self.cache.make_key(
+            kind, prompt, self.model, f"{type_value}:{mode_value}", PROMPT_TEMPLATE_VERSION
+        )
+    
+    async def _get_cached(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存结果"""
+        if self.cache is None:
+            return None
+        return await self.cache.get(cache_key)
+    
+    async def _set_cached(self, cache_key: str, value: Dict[str, Any]) -> None:
+        """写入缓存结果"""
+        if self.cache is not None:
+            await self.cache.set(cache_key, value)
+    
+    def _flight_key(self, kind: str, prompt: str, optimization_type: str = "", mode: str = "") -> str:
+        """请求合并键，与缓存是否启用无关"""
+        type_value = getattr(optimization_type, "value", optimization_type)
+        mode_value = getattr(mode, "value", mode)
+        return "\x1f".join([
+            kind, self.model, f"{type_value}:{mode_value}", ResponseCache.normalize_prompt(prompt)
+        ])
+    
+    def _semantic_namespace(self, optimization_type: str, mode: str) -> str:
+        """语义缓存命名空间，不同模型、类型、模式和模板版本的结果互不复用"""
+        type_value = getattr(optimization_type, "value", optimization_type)
+        mode_value = getattr(mode, "value", mode)
+        return f"{self.model}:{type_value}:{mode_value}:{PROMPT_TEMPLATE_VERSION}"
+    
     async def _make_request_with_retry(
         self, 
         messages: List[Dict[str, str]], 
         max_retries: int = 3,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        call_site: str = "other"
     ) -> ChatCompletion:
-        """带重试机制的API请求"""
-        self._ensure_client_initialized()
+        """
+        带重试机制的API请求
+        
+        call_site 标注调用位置（analyze / optimize / evaluate / criterion 等），用于监控指标。
+        """
         last_exception = None
+        delay = None
+        # 本次请求中失败过的候选，重试时优先换用其他候选
+        failed: List[str] = []
         
         for attempt in range(max_retries):
+            target = self._select_target(call_site, failed)
+            client = self._client_for(target)
             try:
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=1500
-                )
+                if self.hedging is not None:
+                    response = await self._hedged_completion(client, target, messages, temperature, call_site)
+                else:
+                    response = await self._create_completion(client, target, messages, temperature, call_site)
+                self._get_breaker(target.key).record_success()
                 return response
             except Exception as e:
                 last_exception = e
-                if attempt < max_retries - 1:
-                    # 指数退避
-                    wait_time = 2 ** attempt
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
+                category = self._record_error(target, e)
+                delay = self._retry_delay(e, category, attempt, max_retries, delay, call_site)
+                if delay is None:
                     break
+                await self._failover_or_wait(call_site, target, failed, delay)
         
-        raise AIServiceException(f"AI服务请求失败: {str(last_exception)}")
+        # 保留上游异常，调用方可据此判断是否为暂时性错误
+        raise AIServiceException(f"AI服务请求失败: {str(last_exception)}") from last_exception
+    
+    async def _create_completion(
+        self,
+        client: AsyncOpenAI,
+        target: RouteTarget,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        call_site: str
+    ) -> ChatCompletion:
+        """单次API请求，经调度器限流，退避等待期间不占用并发名额"""
+        async with self.dispatcher.slot(target.model):
+            request_start = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(
+                    model=target.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=1500
+                )
+            except Exception:
+                self._observe_request(call_site, target.model, "error", request_start)
+                raise
+            latency = self._observe_request(call_site, target.model, "success", request_start)
+        self.router.record_success(target, call_site, latency)
+        if self.hedging is not None:
+            self.hedging.record_latency(target.model, call_site, latency)
+        return response
+    
+    async def _hedged_completion(
+        self,
+        client: AsyncOpenAI,
+        target: RouteTarget,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        call_site: str
+    ) -> ChatCompletion:
+        """
+        对冲请求：主请求超过近期耗时分位数仍未返回时再发一个相同请求，取先成功的结果并取消另一个
+        
+        两个请求都失败时抛出主请求的异常，交给外层按错误类型重试。
+        """
+        args = (client, target, messages, temperature, call_site)
+        primary = asyncio.ensure_future(self._create_completion(*args))
+        tasks = [primary]
+        try:
+            hedge_delay = self.hedging.hedge_delay(target.model, call_site)
+            if hedge_delay is None:
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result()
+            if not self.hedging.try_hedge():
+                llm_hedges.labels(call_site, "budget_exhausted").inc()
+                return await primary
+            
+            tasks.append(asyncio.ensure_future(self._create_completion(*args)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        hedge_won = task is not primary
+                        self.hedging.record_winner(hedge_won)
+                        llm_hedges.labels(call_site, "hedge_won" if hedge_won else "primary_won").inc()
+                        return task.result()
+            llm_hedges.labels(call_site, "failed").inc()
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                # 避免未取走的异常产生警告
+                task.add_done_callback(_consume_exception)
+    
+    def _client_for(self, target: RouteTarget) -> AsyncOpenAI:
+        """候选所在服务的客户端"""
+        if target.provider == DEFAULT_PROVIDER:
+            self._ensure_client_initialized()
+            return self.client
+        return self.router.client_for(target.provider, self.dispatcher.http_client)
+    
+    def _get_breaker(self, key: str) -> CircuitBreaker:
+        """获取候选（服务/模型）对应的熔断器"""
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RECOVERY_TIME)
+            self.breakers[key] = breaker
+        return breaker
+    
+    def _select_target(self, call_site: str, failed: List[str]) -> RouteTarget:
+        """按路由优先级选择第一个未熔断的候选，全部熔断时直接失败，不占用调度器名额"""
+        ranked = self.router.rank(call_site, avoid=failed)
+        for target in ranked:
+            if self._get_breaker(target.key).allow_request():
+                return target
+        
+        target = ranked[0]
+        llm_circuit_rejections.labels(call_site, target.model).inc()
+        retry_after = min(self._get_breaker(t.key).retry_in() for t in ranked)
+        raise CircuitOpenException(
+            f"AI服务暂不可用（{target.model}已熔断，{retry_after:.0f}秒后重试）",
+            service=target.model,
+            retry_after=retry_after
+        )
+    
+    async def _failover_or_wait(self, call_site: str, target: RouteTarget, failed: List[str], delay: float) -> None:
+        """还有未尝试的候选时立即切换，否则按退避时间等待"""
+        if target.key not in failed:
+            failed.append(target.key)
+        if self.router.has_alternative(call_site, failed):
+            llm_router_failovers.labels(call_site).inc()
+        else:
+            await asyncio.sleep(delay)
+    
+    def _record_error(self, target: RouteTarget, error: Exception) -> str:
+        """
+        按错误类型更新熔断器和路由统计，返回错误类别
+        
+        5xx、超时和连接失败计入熔断；4xx说明上游可用，只是请求本身有问题，不计入熔断；
+        429不计入熔断，但会降低路由优先级。
+        """
+        breaker = self._get_breaker(target.key)
+        category = classify_error(error)
+        if category in BREAKER_FAILURES:
+            breaker.record_failure()
+        elif category == CLIENT:
+            breaker.record_success()
+        else:
+            breaker.record_ignored()
+        if category in RETRYABLE:
+            self.router.record_failure(target)
+        return category
+    
+    def _retry_delay(
+        self,
+        error: Exception,
+        category: str,
+        attempt: int,
+        max_retries: int,
+        previous_delay: Optional[float],
+        call_site: str
+    ) -> Optional[float]:
+        """决定重试前的等待时间，返回None表示不再重试"""
+        if attempt >= max_retries - 1:
+            return None
+        delay = self.retry_policy.delay_for(error, category, previous_delay)
+        if delay is not None:
+            llm_retries.labels(call_site, category).inc()
+        return delay
+    
+    def _observe_request(self, call_site: str, model: str, outcome: str, request_start: float) -> float:
+        """记录单次模型请求耗时并返回"""
+        latency = time.perf_counter() - request_start
+        llm_request_duration.labels(call_site, model, outcome).observe(latency)
+        return latency
     
     async def analyze_prompt_quality(self, prompt: str) -> Dict[str, Any]:
         """分析提示词质量"""
+        start_time = time.time()
+        cache_key = self._cache_key("analysis", prompt)
+        cached = await self._get_cached(cache_key)
+        if cached is not None:
+            cached["processing_time"] = time.time() - start_time
+            return cached
         
+        # 相同提示词的并发分析只调用一次模型
+        result, _ = await self.singleflight.do(
+            self._flight_key("analysis", prompt),
+            lambda: self._analyze_prompt_quality(prompt, cache_key, start_time)
+        )
+        return result
+    
+    async def _analyze_prompt_quality(self, prompt: str, cache_key: str, start_time: float) -> Dict[str, Any]:
+        """调用模型分析提示词质量并写入缓存"""
         analysis_prompt = f"""
 请分析以下提示词的质量，从以下几个维度评分（1-10分）：
 
@@ -162,26 +455,16 @@ JSON格式：
             {"role": "user", "content": analysis_prompt}
         ]
         
-        start_time = time.time()
-        response = await self._make_request_with_retry(messages, temperature=0.3)
+        response = await self._make_request_with_retry(messages, temperature=0.3, call_site="analyze")
         processing_time = time.time() - start_time
         
         try:
-            import json
             content = response.choices[0].message.content
-            # 提取JSON部分
-            if "```json" in content:
-                json_str = content.split("```json")[1].split("```")[0].strip()
-            elif "{" in content and "}" in content:
-                start = content.find("{")
-                end = content.rfind("}") + 1
-                json_str = content[start:end]
-            else:
-                json_str = content
-            
-            result = json.loads(json_str)
+            result = self._extract_json(content)
             result["processing_time"] = processing_time
             
+            # 只缓存解析成功的结果
+            await self._set_cached(cache_key, result)
             return result
         except Exception as e:
             # 如果JSON解析失败，返回默认结果
@@ -199,43 +482,116 @@ JSON格式：
                 "processing_time": processing_time
             }
     
-    async def optimize_prompt(self, original_prompt: str, optimization_type: str = "general") -> OptimizationResult:
-        """优化提示词"""
+    async def optimize_prompt(
+        self, 
+        original_prompt: str, 
+        optimization_type: str = "general",
+        mode: str = "standard"
+    ) -> OptimizationResult:
+        """
+        优化提示词
+        
+        Args:
+            original_prompt: 原始提示词
+            optimization_type: 优化类型
+            mode: 优化模式，"standard" 依次执行分析、优化、再分析三次调用，
+                "fused" 通过一次结构化调用同时返回前后评分和优化结果
+        """
+        if mode not in ("standard", "fused"):
+            raise ValueError(f"不支持的优化模式: {mode}")
         
         start_time = time.time()
+        cache_key = self._cache_key("optimization", original_prompt, optimization_type, mode)
+        namespace = self._semantic_namespace(optimization_type, mode)
+        cached = await self._lookup_optimization(cache_key, namespace, original_prompt, start_time)
+        if cached is not None:
+            return cached
         
-        # 1. 分析原始提示词质量
-        analysis = await self.analyze_prompt_quality(original_prompt)
+        # 相同提示词的并发优化只执行一次，合并进来的调用方不重复计token
+        result, shared = await self.singleflight.do(
+            self._flight_key("optimization", original_prompt, optimization_type, mode),
+            lambda: self._run_optimization(original_prompt, optimization_type, mode, cache_key, namespace)
+        )
+        if shared:
+            result.usage_stats = AIUsageStats()
+        return result
+    
+    async def _run_optimization(
+        self,
+        original_prompt: str,
+        optimization_type: str,
+        mode: str,
+        cache_key: str,
+        namespace: str
+    ) -> OptimizationResult:
+        """执行优化并写入精确缓存和语义缓存"""
+        if mode == "fused":
+            result = await self._optimize_prompt_fused(original_prompt, optimization_type)
+        else:
+            result = await self._optimize_prompt_standard(original_prompt, optimization_type)
         
-        # 2. 生成优化提示词
-        optimization_prompt = self._create_optimization_prompt(original_prompt, optimization_type, analysis)
+        await self._store_optimization(cache_key, namespace, original_prompt, result)
+        return result
+    
+    async def _lookup_optimization(
+        self,
+        cache_key: str,
+        namespace: str,
+        original_prompt: str,
+        start_time: float
+    ) -> Optional[OptimizationResult]:
+        """依次查找精确缓存和语义缓存，命中时不消耗token"""
+        cached = await self._get_cached(cache_key)
         
-        messages = [
-            {"role": "system", "content": "你是一个专业的提示词优化专家。请帮助用户优化提示词，使其更加清晰、完整、具体和有效。"},
-            {"role": "user", "content": optimization_prompt}
-        ]
+        # 精确缓存未命中时查找近似重复的提示词
+        if cached is None and self.semantic_cache is not None:
+            cached = self.semantic_cache.lookup(namespace, original_prompt)
+        
+        if cached is None:
+            return None
+        
+        cached["usage_stats"] = AIUsageStats()
+        cached["processing_time"] = time.time() - start_time
+        return OptimizationResult(**cached)
+    
+    async def _store_optimization(
+        self,
+        cache_key: str,
+        namespace: str,
+        original_prompt: str,
+        result: OptimizationResult
+    ) -> None:
+        """写入精确缓存和语义缓存"""
+        await self._set_cached(cache_key, asdict(result))
+        if self.semantic_cache is not None:
+            self.semantic_cache.put(namespace, original_prompt, asdict(result))
+            if self.semantic_cache.needs_flush:
+                await self.semantic_cache.flush()
+    
+    async def _optimize_prompt_standard(self, original_prompt: str, optimization_type: str) -> OptimizationResult:
+        """分析、优化、再分析三次调用"""
+        start_time = time.time()
         
-        response = await self._make_request_with_retry(messages, temperature=0.7)
+        # 1. 分析原始提示词质量
+        with pipeline_stage_duration.labels("analyze_before").time():
+            analysis = await self.analyze_prompt_quality(original_prompt)
+        
+        # 2. 生成优化提示词
+        messages = self._create_optimization_messages(original_prompt, optimization_type, analysis)
+        with pipeline_stage_duration.labels("optimize").time():
+            response = await self._make_request_with_retry(messages, temperature=0.7, call_site="optimize")
         
         # 3. 解析优化结果
         optimized_content = response.choices[0].message.content
         optimized_prompt, improvements = self._parse_optimization_result(optimized_content)
         
         # 4. 分析优化后的质量
-        optimized_analysis = await self.analyze_prompt_quality(optimized_prompt)
+        with pipeline_stage_duration.labels("analyze_after").time():
+            optimized_analysis = await self.analyze_prompt_quality(optimized_prompt)
         
         # 5. 计算使用统计
-        prompt_tokens = sum([self.count_tokens(msg["content"]) for msg in messages])
-        completion_tokens = self.count_tokens(optimized_content)
-        total_tokens = prompt_tokens + completion_tokens
-        cost_estimate = self.estimate_cost(prompt_tokens, completion_tokens)
-        
-        usage_stats = AIUsageStats(
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            total_tokens=total_tokens,
-            cost_estimate=cost_estimate
-        )
+        with pipeline_stage_duration.labels("token_count").time():
+            usage_stats = self._calculate_usage(messages, optimized_content, self._response_model(response))
         
         processing_time = time.time() - start_time
         
@@ -248,6 +604,249 @@ JSON格式：
             processing_time=processing_time
         )
     
+    async def optimize_prompt_stream(
+        self,
+        original_prompt: str,
+        optimization_type: str = "general"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式优化提示词（standard模式）
+        
+        依次产出事件：start、analysis（原始评分）、delta（优化后提示词增量文本）、
+        improvement（逐条改进说明）、final（完整结果，以此为准）。
+        """
+        start_time = time.time()
+        yield {"event": "start", "data": {"model": self.model}}
+        
+        cache_key = self._cache_key("optimization", original_prompt, optimization_type, "standard")
+        namespace = self._semantic_namespace(optimization_type, "standard")
+        cached = await self._lookup_optimization(cache_key, namespace, original_prompt, start_time)
+        if cached is not None:
+            yield {"event": "analysis", "data": {"overall_score": cached.quality_score_before}}
+            yield {"event": "delta", "data": {"text": cached.optimized_prompt}}
+            for improvement in cached.improvements:
+                yield {"event": "improvement", "data": improvement}
+            yield {"event": "final", "data": asdict(cached)}
+            return
+        
+        # 1. 分析原始提示词质量
+        with pipeline_stage_duration.labels("analyze_before").time():
+            analysis = await self.analyze_prompt_quality(original_prompt)
+        yield {
+            "event": "analysis",
+            "data": {
+                "scores": analysis.get("scores", {}),
+                "overall_score": analysis.get("overall_score", 5),
+                "issues": analysis.get("issues", [])
+            }
+        }
+        
+        # 2. 流式生成优化提示词，边接收边解析
+        messages = self._create_optimization_messages(original_prompt, optimization_type, analysis)
+        parser = IncrementalResultParser()
+        chunks = []
+        route: Dict[str, str] = {}
+        stage_start = time.perf_counter()
+        stream = self._stream_request_with_retry(messages, temperature=0.7, call_site="optimize", route=route)
+        async for chunk in stream:
+            chunks.append(chunk)
+            for event in self._stream_events(parser.feed(chunk)):
+                yield event
+        for event in self._stream_events(parser.finish()):
+            yield event
+        
+        optimized_prompt, improvements = parser.close()
+        # 包含向客户端推送事件的时间
+        pipeline_stage_duration.labels("optimize").observe(time.perf_counter() - stage_start)
+        
+        # 3. 分析优化后的质量
+        with pipeline_stage_duration.labels("analyze_after").time():
+            optimized_analysis = await self.analyze_prompt_quality(optimized_prompt)
+        
+        result = OptimizationResult(
+            optimized_prompt=optimized_prompt,
+            improvements=improvements,
+            quality_score_before=analysis.get("overall_score", 5),
+            quality_score_after=optimized_analysis.get("overall_score", 5),
+            usage_stats=self._calculate_usage(messages, "".join(chunks), route.get("model")),
+            processing_time=time.time() - start_time
+        )
+        await self._store_optimization(cache_key, namespace, original_prompt, result)
+        yield {"event": "final", "data": asdict(result)}
+    
+    def _stream_events(self, parsed: List[tuple]) -> List[Dict[str, Any]]:
+        """将解析器事件转换为流式事件，完整提示词在final中返回"""
+        events = []
+        for kind, payload in parsed:
+            if kind == "delta":
+                events.append({"event": "delta", "data": {"text": payload}})
+            elif kind == "improvement":
+                events.append({"event": "improvement", "data": payload})
+        return events
+    
+    async def _stream_request_with_retry(
+        self,
+        messages: List[Dict[str, str]],
+        max_retries: int = 3,
+        temperature: float = 0.7,
+        call_site: str = "other",
+        route: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        流式API请求，只在收到首个片段之前重试
+        
+        route 不为空时写入实际提供回复的模型（"model"），用于按该模型计价。
+        """
+        last_exception = None
+        delay = None
+        failed: List[str] = []
+        
+        for attempt in range(max_retries):
+            target = self._select_target(call_site, failed)
+            client = self._client_for(target)
+            received = False
+            try:
+                # 整个流式响应期间占用调度器名额
+                async with self.dispatcher.slot(target.model):
+                    request_start = time.perf_counter()
+                    try:
+                        stream = await client.chat.completions.create(
+                            model=target.model,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=1500,
+                            stream=True
+                        )
+                        async for chunk in stream:
+                            if not chunk.choices:
+                                continue
+                            content = chunk.choices[0].delta.content
+                            if content:
+                                if not received:
+                                    received = True
+                                    if route is not None:
+                                        route["model"] = target.model
+                                    llm_time_to_first_token.labels(call_site, target.model).observe(
+                                        time.perf_counter() - request_start
+                                    )
+                                yield content
+                    except Exception:
+                        self._observe_request(call_site, target.model, "error", request_start)
+                        raise
+                    latency = self._observe_request(call_site, target.model, "success", request_start)
+                self.router.record_success(target, call_site, latency)
+                self._get_breaker(target.key).record_success()
+                return
+            except Exception as e:
+                if received:
+                    # 已输出部分内容，不能重试
+                    self._record_error(target, e)
+                    raise AIServiceException(f"AI服务流式响应中断: {str(e)}") from e
+                last_exception = e
+                category = self._record_error(target, e)
+                delay = self._retry_delay(e, category, attempt, max_retries, delay, call_site)
+                if delay is None:
+                    break
+                await self._failover_or_wait(call_site, target, failed, delay)
+        
+        raise AIServiceException(f"AI服务请求失败: {str(last_exception)}") from last_exception
+    
+    async def _optimize_prompt_fused(self, original_prompt: str, optimization_type: str) -> OptimizationResult:
+        """单次调用完成分析、优化和再评估"""
+        start_time = time.time()
+        
+        messages = [
+            {"role": "system", "content": "你是一个专业的提示词优化专家，同时负责质量评估。请严格按照JSON格式回复。"},
+            {"role": "user", "content": self._create_fused_optimization_prompt(original_prompt, optimization_type)}
+        ]
+        
+        with pipeline_stage_duration.labels("fused").time():
+            response = await self._make_request_with_retry(messages, temperature=0.5, call_site="fused")
+        content = response.choices[0].message.content
+        
+        try:
+            result = self._extract_json(content)
+            optimized_prompt = str(result.get("optimized_prompt") or "").strip()
+            improvements = [
+                {
+                    "type": str(item.get("type", "改进")),
+                    "description": str(item.get("description", ""))
+                }
+                for item in result.get("improvements", [])
+                if isinstance(item, dict) and item.get("description")
+            ]
+            score_before = result.get("analysis_before", {}).get("overall_score", 5)
+            score_after = result.get("analysis_after", {}).get("overall_score", 5)
+        except Exception:
+            # JSON解析失败时按普通优化格式解析
+            optimized_prompt, improvements = self._parse_optimization_result(content)
+            score_before, score_after = 5, 5
+        
+        if not optimized_prompt:
+            optimized_prompt = content.strip()
+        if not improvements:
+            improvements = [
+                {"type": "整体优化", "description": "提升了提示词的清晰度和可执行性"}
+            ]
+        
+        return OptimizationResult(
+            optimized_prompt=optimized_prompt,
+            improvements=improvements,
+            quality_score_before=score_before,
+            quality_score_after=score_after,
+            usage_stats=self._calculate_usage(messages, content, self._response_model(response)),
+            processing_time=time.time() - start_time
+        )
+    
+    def _create_fused_optimization_prompt(self, original_prompt: str, optimization_type: str) -> str:
+        """创建单次融合优化提示词"""
+        base_prompt = f"""
+请完成以下三个步骤，并在一个JSON对象中返回全部结果：
+
+1. 从清晰度、完整性、结构性、具体性、可执行性五个维度（1-10分）评估原始提示词，并列出主要问题
+2. 针对识别出的问题优化提示词，保持原始意图不变，增强清晰度和具体性，改善逻辑结构
+3. 按同样的五个维度评估优化后的提示词
+
+原始提示词：
+{original_prompt}
+
+JSON格式：
+{{
+    "analysis_before": {{
+        "scores": {{"clarity": 5, "completeness": 5, "structure": 5, "specificity": 5, "actionability": 5}},
+        "overall_score": 5,
+        "issues": ["问题1", "问题2"]
+    }},
+    "optimized_prompt": "优化后的完整提示词",
+    "improvements": [
+        {{"type": "改进点1", "description": "具体说明改进内容"}},
+        {{"type": "改进点2", "description": "具体说明改进内容"}}
+    ],
+    "analysis_after": {{
+        "scores": {{"clarity": 8, "completeness": 8, "structure": 8, "specificity": 8, "actionability": 8}},
+        "overall_score": 8
+    }}
+}}
+"""
+        
+        # 根据优化类型添加特定要求
+        if optimization_type in self.type_requirements:
+            base_prompt += "\n特别注意：" + self.type_requirements[optimization_type]
+        
+        return base_prompt
+    
+    def _create_optimization_messages(
+        self,
+        original_prompt: str,
+        optimization_type: str,
+        analysis: Dict
+    ) -> List[Dict[str, str]]:
+        """创建优化请求消息"""
+        return [
+            {"role": "system", "content": "你是一个专业的提示词优化专家。请帮助用户优化提示词，使其更加清晰、完整、具体和有效。"},
+            {"role": "user", "content": self._create_optimization_prompt(original_prompt, optimization_type, analysis)}
+        ]
+    
     def _create_optimization_prompt(self, original_prompt: str, optimization_type: str, analysis: Dict) -> str:
         """创建优化提示词"""
         base_prompt = f"""
@@ -284,98 +883,150 @@ JSON格式：
 """
         
         # 根据优化类型添加特定要求
-        if optimization_type == "code":
-            base_prompt += "\n\n特别注意：这是代码相关的提示词，请确保包含具体的编程要求、技术规范和预期输出格式。"
-        elif optimization_type == "writing":
-            base_prompt += "\n\n特别注意：这是写作相关的提示词，请确保包含文体要求、目标受众、风格指导和结构要求。"
-        elif optimization_type == "analysis":
-            base_prompt += "\n\n特别注意：这是分析相关的提示词，请确保包含分析框架、评估标准、数据要求和输出格式。"
+        if optimization_type in self.type_requirements:
+            base_prompt += "\n\n特别注意：" + self.type_requirements[optimization_type]
         
         return base_prompt
     
     def _parse_optimization_result(self, content: str) -> tuple[str, List[Dict[str, str]]]:
         """解析优化结果"""
-        lines = content.strip().split('\n')
+        return parse_optimization_result(content)
+    
+    def _estimate_pipeline_cost(self, prompt: str, mode: str) -> tuple[int, int]:
+        """
+        估算一次优化流程的请求数和Token数
+        
+        standard 为分析、优化、再分析三次调用，优化结果按原文两倍长度估算；
+        fused 为一次调用。常数项为模板和输出的大致开销。
+        """
+        prompt_tokens = self.count_tokens(prompt)
+        if mode == "fused":
+            return 1, 3 * prompt_tokens + 900
+        return 3, 6 * prompt_tokens + 1700
+    
+    def _create_error_result(self, prompt: str, error: Exception) -> OptimizationResult:
+        """批量优化中失败项的占位结果"""
+        return OptimizationResult(
+            optimized_prompt=prompt,
+            improvements=[{"type": "错误", "description": f"优化失败: {str(error)}"}],
+            quality_score_before=0,
+            quality_score_after=0,
+            usage_stats=AIUsageStats(),
+            processing_time=0.0,
+            error=str(error)
+        )
+    
+    async def iter_batch_optimize(
+        self,
+        prompts: List[str],
+        optimization_type: str = "general",
+        mode: str = "standard",
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None
+    ) -> AsyncIterator[tuple[int, OptimizationResult]]:
+        """
+        批量优化提示词，按完成顺序产出 (序号, 结果)
         
-        optimized_prompt = ""
-        improvements = []
+        同时进行的优化流程不超过 max_concurrency 个，每个流程提交前按估算的
+        请求数和Token数从令牌桶获取配额；命中缓存的流程退还配额。
+        未指定 requests_per_minute / tokens_per_minute 时使用客户端共享的限速器，
+        多个批量调用共同受同一预算约束。失败项返回占位结果而不是抛出异常。
+        """
+        if not prompts:
+            return
         
-        current_section = None
-        current_content = []
+        concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY or len(prompts)
+        if requests_per_minute is None and tokens_per_minute is None:
+            limiter = self.batch_limiter
+        else:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
         
-        for line in lines:
-            line = line.strip()
-            
-            if "优化后的提示词" in line:
-                current_section = "prompt"
-                current_content = []
-            elif "改进说明" in line:
-                if current_section == "prompt":
-                    optimized_prompt = '\n'.join(current_content).strip()
-                current_section = "improvements"
-                current_content = []
-            elif line.startswith(('1.', '2.', '3.', '4.', '5.', '-', '•')):
-                if current_section == "improvements":
-                    improvement_text = line.lstrip('1234567890.-• ').strip()
-                    if ':' in improvement_text:
-                        type_part, desc_part = improvement_text.split(':', 1)
-                        improvements.append({
-                            "type": type_part.strip(),
-                            "description": desc_part.strip()
-                        })
-                    else:
-                        improvements.append({
-                            "type": "改进",
-                            "description": improvement_text
-                        })
-            elif line and current_section:
-                current_content.append(line)
-        
-        # 处理最后一个部分
-        if current_section == "prompt" and not optimized_prompt:
-            optimized_prompt = '\n'.join(current_content).strip()
-        
-        # 如果解析失败，使用整个内容作为优化结果
-        if not optimized_prompt:
-            optimized_prompt = content.strip()
+        semaphore = asyncio.Semaphore(concurrency)
+        completed: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
         
-        # 如果没有解析到改进说明，创建默认的
-        if not improvements:
-            improvements = [
-                {"type": "整体优化", "description": "提升了提示词的清晰度和可执行性"}
-            ]
+        async def run_one(index: int, prompt: str, requests: int, tokens: int) -> None:
+            try:
+                result = await self.optimize_prompt(prompt, optimization_type, mode)
+                if result.usage_stats.total_tokens == 0:
+                    # 命中缓存或合并到进行中的调用，没有实际消耗
+                    limiter.refund(requests, tokens)
+            except Exception as e:
+                result = self._create_error_result(prompt, e)
+            finally:
+                semaphore.release()
+            completed.put_nowait((index, result))
         
-        return optimized_prompt, improvements
-    
-    async def batch_optimize(self, prompts: List[str], optimization_type: str = "general") -> List[OptimizationResult]:
-        """批量优化提示词"""
-        tasks = [self.optimize_prompt(prompt, optimization_type) for prompt in prompts]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # 处理异常结果
-        final_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                # 创建错误结果
-                error_result = OptimizationResult(
-                    optimized_prompt=prompts[i],
-                    improvements=[{"type": "错误", "description": f"优化失败: {str(result)}"}],
-                    quality_score_before=0,
-                    quality_score_after=0,
-                    usage_stats=AIUsageStats(),
-                    processing_time=0.0
-                )
-                final_results.append(error_result)
-            else:
-                final_results.append(result)
+        async def schedule() -> None:
+            for index, prompt in enumerate(prompts):
+                await semaphore.acquire()
+                requests, tokens = self._estimate_pipeline_cost(prompt, mode)
+                batch_rate_limit_wait.observe(await limiter.acquire(requests, tokens))
+                tasks.append(asyncio.create_task(run_one(index, prompt, requests, tokens)))
         
-        return final_results
+        scheduler = asyncio.create_task(schedule())
+        try:
+            for _ in range(len(prompts)):
+                yield await completed.get()
+        finally:
+            # 调用方提前退出时取消尚未完成的流程
+            scheduler.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(scheduler, *tasks, return_exceptions=True)
+    
+    async def batch_optimize(
+        self, 
+        prompts: List[str], 
+        optimization_type: str = "general",
+        mode: str = "standard",
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None
+    ) -> List[OptimizationResult]:
+        """批量优化提示词，按输入顺序返回结果列表"""
+        results: List[Optional[OptimizationResult]] = [None] * len(prompts)
+        async for index, result in self.iter_batch_optimize(
+            prompts,
+            optimization_type,
+            mode,
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute
+        ):
+            results[index] = result
+        return results
     
     async def get_optimization_suggestions(self, prompt: str) -> List[str]:
         """获取优化建议（不执行实际优化）"""
         analysis = await self.analyze_prompt_quality(prompt)
         return analysis.get("suggestions", [])
     
+    def get_runtime_stats(self) -> Dict[str, Any]:
+        """获取运行时统计"""
+        return {
+            "dispatcher": self.dispatcher.get_stats(),
+            "cache": self.cache.get_stats() if self.cache else None,
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None,
+            "singleflight": self.singleflight.get_stats(),
+            "batch_limiter": self.batch_limiter.get_stats(),
+            "circuit_breakers": self._breaker_stats(),
+            "hedging": self.hedging.get_stats() if self.hedging else None,
+            "router": self.router.get_stats()
+        }
+    
+    def _breaker_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各模型熔断器状态"""
+        return {model: breaker.get_stats() for model, breaker in self.breakers.items()}
+    
+    async def aclose(self) -> None:
+        """释放连接资源并持久化语义缓存"""
+        if self.semantic_cache is not None:
+            await self.semantic_cache.flush()
+        await self.dispatcher.aclose()
+        self.client = None
+    
     async def health_check(self) -> Dict[str, Any]:
         """健康检查"""
         try:
@@ -385,7 +1036,8 @@ JSON格式：
                     "status": "configuration_missing",
                     "model": self.model,
                     "error": "OpenAI API Key未配置",
-                    "api_available": False
+                    "api_available": False,
+                    "circuit_breakers": self._breaker_stats()
                 }
             
             test_messages = [
@@ -393,21 +1045,32 @@ JSON格式：
             ]
             
             start_time = time.time()
-            response = await self._make_request_with_retry(test_messages, max_retries=1)
+            response = await self._make_request_with_retry(test_messages, max_retries=1, call_site="health")
             response_time = time.time() - start_time
             
             return {
                 "status": "healthy",
                 "model": self.model,
                 "response_time": response_time,
-                "api_available": True
+                "api_available": True,
+                "circuit_breakers": self._breaker_stats()
+            }
+        except CircuitOpenException as e:
+            # 熔断期间不发送探测请求
+            return {
+                "status": "circuit_open",
+                "model": self.model,
+                "error": e.message,
+                "api_available": False,
+                "circuit_breakers": self._breaker_stats()
             }
         except Exception as e:
             return {
                 "status": "unhealthy",
                 "model": self.model,
                 "error": str(e),
-                "api_available": False
+                "api_available": False,
+                "circuit_breakers": self._breaker_stats()
             }
 
 
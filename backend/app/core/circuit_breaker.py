@@ -0,0 +1,117 @@
+"""
+熔断器模块
+上游连续失败时在一段时间内直接拒绝请求，避免每个请求都在重试中耗尽时间后才失败
+"""
+import time
+from typing import Any, Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 导出为监控指标时的状态值
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    按连续失败次数打开的熔断器
+
+    - closed：正常放行，连续失败 failure_threshold 次后打开
+    - open：直接拒绝，recovery_time 秒后进入半开
+    - half_open：只放行一个探测请求，成功则关闭，失败则重新打开
+
+    探测请求未上报结果（例如被取消）时，超过 recovery_time 后允许新的探测，不会一直卡在半开状态。
+    failure_threshold 为0表示禁用熔断。
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.clock = clock
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+        # 统计
+        self.total_failures = 0
+        self.total_rejections = 0
+        self.times_opened = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    @property
+    def state(self) -> str:
+        """当前状态，打开超过恢复时间后视为半开"""
+        if self._state == OPEN and self.clock() - self._opened_at >= self.recovery_time:
+            self._state = HALF_OPEN
+            self._probe_started_at = None
+        return self._state
+
+    def retry_in(self) -> float:
+        """距离允许下一次探测的秒数"""
+        if self._state == OPEN:
+            return max(0.0, self._opened_at + self.recovery_time - self.clock())
+        if self._state == HALF_OPEN and self._probe_started_at is not None:
+            return max(0.0, self._probe_started_at + self.recovery_time - self.clock())
+        return 0.0
+
+    def allow_request(self) -> bool:
+        """是否放行请求；半开状态下放行的请求即为探测请求"""
+        if not self.enabled:
+            return True
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            now = self.clock()
+            if self._probe_started_at is None or now - self._probe_started_at >= self.recovery_time:
+                self._probe_started_at = now
+                return True
+        self.total_rejections += 1
+        return False
+
+    def record_success(self) -> None:
+        """上游正常响应"""
+        self._consecutive_failures = 0
+        self._probe_started_at = None
+        self._state = CLOSED
+
+    def record_failure(self) -> None:
+        """上游不可用（5xx、超时、连接失败）"""
+        self.total_failures += 1
+        if not self.enabled:
+            return
+        self._consecutive_failures += 1
+        if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def record_ignored(self) -> None:
+        """结果不能说明上游健康状况（如429），只结束半开状态下的探测"""
+        self._probe_started_at = None
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            self.times_opened += 1
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._probe_started_at = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        return {
+            "state": self.state if self.enabled else "disabled",
+            "consecutive_failures": self._consecutive_failures,
+            "retry_in": round(self.retry_in(), 3),
+            "total_failures": self.total_failures,
+            "total_rejections": self.total_rejections,
+            "times_opened": self.times_opened
+        }
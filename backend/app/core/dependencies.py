@@ -40,7 +40,7 @@ async def get_current_user_optional(
         return None
     
     auth_service = AuthService(db)
-    user = await auth_service.get_user_by_id(int(user_id))
+    user = await auth_service.get_auth_user(int(user_id))
     return user if user and user.is_active else None
 
 
@@ -68,7 +68,7 @@ async def get_current_user(
         )
     
     auth_service = AuthService(db)
-    user = await auth_service.get_user_by_id(int(user_id))
+    user = await auth_service.get_auth_user(int(user_id))
     
     if not user:
         raise HTTPException(
@@ -0,0 +1,140 @@
+"""
+请求对冲模块
+模型请求超过近期延迟的某个分位数仍未返回时，再发一个相同请求，取先完成的结果，降低长尾延迟
+"""
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from ..config import settings
+
+
+class LatencyTracker:
+    """按 (模型, 调用位置) 保存最近的成功请求耗时"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def record(self, model: str, call_site: str, latency: float) -> None:
+        samples = self._samples.get((model, call_site))
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self._samples[(model, call_site)] = samples
+        samples.append(latency)
+
+    def count(self, model: str, call_site: str) -> int:
+        return len(self._samples.get((model, call_site), ()))
+
+    def percentile(self, model: str, call_site: str, q: float) -> Optional[float]:
+        """最近耗时的分位数（最近秩法），没有样本时返回None"""
+        samples = self._samples.get((model, call_site))
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """
+    对冲预算
+
+    每个主请求积累 ratio 份额度，每次对冲消耗1份，额度最多累积 max_credit 份。
+    长期来看对冲请求数不超过主请求数的 ratio 倍，上游持续变慢时不会让请求量翻倍。
+    """
+
+    def __init__(self, ratio: float, max_credit: float = 5.0):
+        self.ratio = ratio
+        self.max_credit = max_credit
+        self._credit = 0.0
+
+    @property
+    def credit(self) -> float:
+        return self._credit
+
+    def deposit(self) -> None:
+        self._credit = min(self.max_credit, self._credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._credit >= 1.0:
+            self._credit -= 1.0
+            return True
+        return False
+
+
+class HedgePolicy:
+    """
+    决定何时发出对冲请求
+
+    样本数达到 min_samples 后，以 percentile 分位的近期耗时（不低于 min_delay）作为对冲等待时间。
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 0.5,
+        min_samples: int = 20,
+        budget_ratio: float = 0.05,
+        window: int = 200
+    ):
+        if not 0 < percentile < 1:
+            raise ValueError("对冲分位数必须在0和1之间")
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker(window)
+        self.budget = HedgeBudget(budget_ratio)
+
+        # 统计
+        self.primary_requests = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+    @classmethod
+    def from_settings(cls) -> Optional["HedgePolicy"]:
+        """根据应用配置创建对冲策略，未开启时返回None"""
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        return cls(
+            percentile=settings.LLM_HEDGE_PERCENTILE,
+            min_delay=settings.LLM_HEDGE_MIN_DELAY,
+            min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+            budget_ratio=settings.LLM_HEDGE_BUDGET_RATIO
+        )
+
+    def hedge_delay(self, model: str, call_site: str) -> Optional[float]:
+        """主请求发出多久后对冲，样本不足时返回None（不对冲）"""
+        self.primary_requests += 1
+        self.budget.deposit()
+        if self.latencies.count(model, call_site) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(model, call_site, self.percentile))
+
+    def try_hedge(self) -> bool:
+        """消耗预算发出对冲请求，预算不足时返回False"""
+        if self.budget.try_spend():
+            self.hedges_sent += 1
+            return True
+        self.budget_exhausted += 1
+        return False
+
+    def record_latency(self, model: str, call_site: str, latency: float) -> None:
+        self.latencies.record(model, call_site, latency)
+
+    def record_winner(self, hedge_won: bool) -> None:
+        if hedge_won:
+            self.hedge_wins += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲统计"""
+        return {
+            "primary_requests": self.primary_requests,
+            "hedges_sent": self.hedges_sent,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": self.hedge_wins / self.hedges_sent if self.hedges_sent else 0.0,
+            "hedge_rate": self.hedges_sent / self.primary_requests if self.primary_requests else 0.0,
+            "budget_exhausted": self.budget_exhausted,
+            "budget_credit": round(self.budget.credit, 3)
+        }
@@ -0,0 +1,190 @@
+"""
+LLM请求调度器模块
+统一管理模型请求的连接池、并发限制和排队统计
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+from ..config import settings
+from .metrics import llm_queue_wait
+
+T = TypeVar("T")
+
+
+class FairLimiter:
+    """先进先出的并发限制器，名额按排队顺序依次交接"""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队数量"""
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """获取一个名额，名额不足时排队等待"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 名额已交接给当前请求，但请求被取消，转交给下一个等待者
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self) -> None:
+        """释放名额，优先交接给最早排队的请求"""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class LLMDispatcher:
+    """LLM请求调度器"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_concurrency_per_model: int = 8,
+        model_concurrency: Optional[Dict[str, int]] = None,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 30.0,
+        request_timeout: float = 60.0
+    ):
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.model_concurrency = model_concurrency or {}
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(request_timeout, connect=10.0)
+
+        self._global_limiter = FairLimiter(max_concurrency)
+        self._model_limiters: Dict[str, FairLimiter] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+        # 排队统计
+        self.total_requests = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=1000)
+
+    @classmethod
+    def from_settings(cls) -> "LLMDispatcher":
+        """根据应用配置创建调度器"""
+        return cls(
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            max_concurrency_per_model=settings.LLM_MAX_CONCURRENCY_PER_MODEL,
+            model_concurrency=settings.LLM_MODEL_CONCURRENCY,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            request_timeout=settings.LLM_REQUEST_TIMEOUT
+        )
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """共享的长连接HTTP客户端"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._http_client
+
+    def _get_model_limiter(self, model: str) -> FairLimiter:
+        """获取模型对应的并发限制器"""
+        limiter = self._model_limiters.get(model)
+        if limiter is None:
+            limit = self.model_concurrency.get(model, self.max_concurrency_per_model)
+            limiter = FairLimiter(limit)
+            self._model_limiters[model] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, model: str) -> AsyncIterator[None]:
+        """占用一个请求名额，先按模型排队，再按全局排队"""
+        start_time = time.perf_counter()
+        model_limiter = self._get_model_limiter(model)
+
+        await model_limiter.acquire()
+        try:
+            await self._global_limiter.acquire()
+        except BaseException:
+            model_limiter.release()
+            raise
+
+        self._record_wait(model, time.perf_counter() - start_time)
+        try:
+            yield
+        finally:
+            self._global_limiter.release()
+            model_limiter.release()
+
+    async def run(self, model: str, request: Callable[[], Awaitable[T]]) -> T:
+        """在并发限制下执行请求"""
+        async with self.slot(model):
+            return await request()
+
+    def _record_wait(self, model: str, wait_time: float) -> None:
+        """记录排队等待时间"""
+        llm_queue_wait.labels(model).observe(wait_time)
+        self.total_requests += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self._recent_waits.append(wait_time)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计"""
+        recent = sorted(self._recent_waits)
+        p95_wait = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+
+        return {
+            "in_flight": self._global_limiter.in_flight,
+            "queue_depth": self._global_limiter.queue_depth + sum(
+                limiter.queue_depth for limiter in self._model_limiters.values()
+            ),
+            "max_concurrency": self._global_limiter.limit,
+            "total_requests": self.total_requests,
+            "avg_wait_time": self.total_wait_time / self.total_requests if self.total_requests else 0.0,
+            "p95_wait_time": p95_wait,
+            "max_wait_time": self.max_wait_time,
+            "models": {
+                model: {
+                    "in_flight": limiter.in_flight,
+                    "queue_depth": limiter.queue_depth,
+                    "max_concurrency": limiter.limit
+                }
+                for model, limiter in self._model_limiters.items()
+            }
+        }
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+# 全局调度器实例
+llm_dispatcher = LLMDispatcher.from_settings()
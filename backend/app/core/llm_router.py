@@ -0,0 +1,224 @@
+"""
+模型路由模块
+在多个OpenAI兼容服务和模型之间按调用位置选择，综合近期延迟、错误率和价格，失败时切换到其他候选
+"""
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from ..config import settings
+
+# 由 OPENAI_BASE_URL / OPENAI_API_KEY 配置的默认服务
+DEFAULT_PROVIDER = "default"
+# 未知模型按此价格估算（每1K tokens，USD）
+DEFAULT_PRICE = {"input": 0.002, "output": 0.002}
+
+
+@dataclass
+class ProviderConfig:
+    """一个OpenAI兼容服务"""
+    name: str
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+    models: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProviderConfig":
+        if not data.get("name"):
+            raise ValueError("模型服务配置缺少name")
+        return cls(
+            name=data["name"],
+            base_url=data.get("base_url"),
+            api_key=data.get("api_key"),
+            models=list(data.get("models", []))
+        )
+
+
+@dataclass
+class RouteTarget:
+    """某个服务上的某个模型，以及路由用的近期统计"""
+    provider: str
+    model: str
+    latency: Dict[str, float] = field(default_factory=dict)  # 按调用位置的耗时EWMA（秒）
+    error_rate: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+
+class LLMRouter:
+    """
+    按调用位置选择模型
+
+    routes 把调用位置（analyze / optimize / fused / evaluate 等）映射到候选模型列表，
+    "default" 用于未配置的调用位置，都未配置时使用默认模型。候选项写模型名时匹配所有提供该模型的服务，
+    写 "服务名/模型名" 时只匹配该服务；没有服务声明的模型由默认服务提供。
+
+    候选按 耗时EWMA × (1 + error_penalty × 错误率) + cost_weight × 每千token均价 排序，分数越低越优先，
+    从未使用过的候选耗时按0计，会先被尝试；explore 的概率随机选择其他候选，使各候选的统计保持更新。
+    """
+
+    def __init__(
+        self,
+        default_model: str,
+        providers: Iterable[ProviderConfig] = (),
+        routes: Optional[Dict[str, List[str]]] = None,
+        pricing: Optional[Dict[str, Dict[str, float]]] = None,
+        ewma_alpha: float = 0.2,
+        cost_weight: float = 50.0,
+        error_penalty: float = 4.0,
+        explore: float = 0.05,
+        rng: Optional[random.Random] = None
+    ):
+        self.default_model = default_model
+        self.providers: Dict[str, ProviderConfig] = {p.name: p for p in providers}
+        if DEFAULT_PROVIDER in self.providers:
+            raise ValueError(f"服务名 {DEFAULT_PROVIDER} 已被默认服务使用")
+        self.pricing = pricing or {}
+        self.ewma_alpha = ewma_alpha
+        self.cost_weight = cost_weight
+        self.error_penalty = error_penalty
+        self.explore = explore
+        self.rng = rng or random.Random()
+
+        self.targets: Dict[str, RouteTarget] = {}
+        self.routes: Dict[str, List[RouteTarget]] = {
+            call_site: self._resolve(entries) for call_site, entries in (routes or {}).items()
+        }
+        self.default_route = self.routes.get("default") or [self._target(DEFAULT_PROVIDER, default_model)]
+        self._clients: Dict[str, AsyncOpenAI] = {}
+
+    @classmethod
+    def from_settings(cls, pricing: Optional[Dict[str, Dict[str, float]]] = None) -> "LLMRouter":
+        """根据应用配置创建路由"""
+        return cls(
+            default_model=settings.OPENAI_MODEL,
+            providers=[ProviderConfig.from_dict(p) for p in settings.LLM_PROVIDERS],
+            routes=settings.LLM_ROUTES,
+            pricing=pricing,
+            ewma_alpha=settings.LLM_ROUTER_EWMA_ALPHA,
+            cost_weight=settings.LLM_ROUTER_COST_WEIGHT,
+            error_penalty=settings.LLM_ROUTER_ERROR_PENALTY,
+            explore=settings.LLM_ROUTER_EXPLORE
+        )
+
+    def _target(self, provider: str, model: str) -> RouteTarget:
+        """同一服务上的同一模型在各路由间共享统计"""
+        key = f"{provider}/{model}"
+        target = self.targets.get(key)
+        if target is None:
+            target = RouteTarget(provider, model)
+            self.targets[key] = target
+        return target
+
+    def _resolve(self, entries: List[str]) -> List[RouteTarget]:
+        """将候选项解析为具体的服务和模型"""
+        resolved: List[RouteTarget] = []
+        for entry in entries:
+            prefix, _, rest = entry.partition("/")
+            if rest and prefix in self.providers:
+                targets = [self._target(prefix, rest)]
+            else:
+                providers = [p.name for p in self.providers.values() if entry in p.models]
+                targets = [self._target(name, entry) for name in providers or [DEFAULT_PROVIDER]]
+            resolved.extend(t for t in targets if t not in resolved)
+        if not resolved:
+            raise ValueError("模型路由的候选列表不能为空")
+        return resolved
+
+    def candidates(self, call_site: str) -> List[RouteTarget]:
+        """调用位置的候选列表（按配置顺序）"""
+        return self.routes.get(call_site) or self.default_route
+
+    def price(self, model: str) -> float:
+        """每千token的输入、输出均价"""
+        model_pricing = self.pricing.get(model, DEFAULT_PRICE)
+        return (model_pricing["input"] + model_pricing["output"]) / 2
+
+    def score(self, target: RouteTarget, call_site: str) -> float:
+        """路由分数，越低越优先"""
+        latency = target.latency.get(call_site, 0.0)
+        return latency * (1 + self.error_penalty * target.error_rate) + self.cost_weight * self.price(target.model)
+
+    def rank(self, call_site: str, avoid: Iterable[str] = ()) -> List[RouteTarget]:
+        """
+        候选按优先级排序
+
+        avoid 中的候选（本次请求已失败的）排在最后，只在没有其他候选时再次使用。
+        """
+        candidates = self.candidates(call_site)
+        if len(candidates) == 1:
+            return list(candidates)
+        avoid = set(avoid)
+        ordered = [
+            target for _, target in sorted(
+                enumerate(candidates),
+                key=lambda item: (item[1].key in avoid, self.score(item[1], call_site), item[0])
+            )
+        ]
+        if self.explore and self.rng.random() < self.explore:
+            fresh = [target for target in ordered if target.key not in avoid]
+            if fresh:
+                chosen = self.rng.choice(fresh)
+                ordered.remove(chosen)
+                ordered.insert(0, chosen)
+        return ordered
+
+    def has_alternative(self, call_site: str, avoid: Iterable[str]) -> bool:
+        """是否还有本次请求未尝试过的候选"""
+        avoid = set(avoid)
+        return any(target.key not in avoid for target in self.candidates(call_site))
+
+    def record_success(self, target: RouteTarget, call_site: str, latency: float) -> None:
+        target.requests += 1
+        previous = target.latency.get(call_site)
+        target.latency[call_site] = latency if previous is None else (
+            previous + self.ewma_alpha * (latency - previous)
+        )
+        target.error_rate -= self.ewma_alpha * target.error_rate
+
+    def record_failure(self, target: RouteTarget) -> None:
+        target.requests += 1
+        target.failures += 1
+        target.error_rate += self.ewma_alpha * (1.0 - target.error_rate)
+
+    def client_for(self, provider: str, http_client: httpx.AsyncClient) -> AsyncOpenAI:
+        """额外服务的客户端，共享调度器的连接池；默认服务的客户端由AIClient管理"""
+        client = self._clients.get(provider)
+        if client is None:
+            config = self.providers[provider]
+            client = AsyncOpenAI(
+                api_key=config.api_key or settings.OPENAI_API_KEY or "",
+                base_url=config.base_url,
+                http_client=http_client,
+                max_retries=0
+            )
+            self._clients[provider] = client
+        return client
+
+    def set_client(self, provider: str, client: Any) -> None:
+        """指定服务使用的客户端（测试或自定义传输）"""
+        self._clients[provider] = client
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取路由统计"""
+        return {
+            "routes": {
+                call_site: [target.key for target in targets] for call_site, targets in self.routes.items()
+            },
+            "targets": {
+                key: {
+                    "latency_ewma": {site: round(value, 4) for site, value in target.latency.items()},
+                    "error_rate": round(target.error_rate, 4),
+                    "requests": target.requests,
+                    "failures": target.failures
+                }
+                for key, target in self.targets.items()
+            }
+        }
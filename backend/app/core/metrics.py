@@ -0,0 +1,492 @@
+"""
+监控指标模块
+进程内的Prometheus风格指标（计数器、仪表盘、直方图），由 /metrics 以文本格式导出。
+
+记录指标只有一次字典查找和几次加法，不加锁，只应在事件循环线程中更新；
+已有模块自带的统计（缓存命中、调度器并发等）通过回调在抓取时读取，热路径上没有额外开销。
+"""
+import asyncio
+import contextvars
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .circuit_breaker import STATE_VALUES
+
+# 文本响应会自动追加 charset=utf-8
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 模型调用耗时通常在秒级
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class _Timer:
+    """记录代码块耗时的上下文管理器"""
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self.child = child
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Metric:
+    """带标签的指标，labels() 返回对应标签组合的子指标"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        # 无标签的指标在没有数据时也导出0
+        if not self.labelnames:
+            self.labels()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def clear(self) -> None:
+        self._children.clear()
+        if not self.labelnames:
+            self.labels()
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """产出 (样本名, 标签文本, 值)"""
+        for values, child in sorted(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, values), child.value
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """可增可减的仪表盘"""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    """分桶直方图，桶上界为闭区间（le）"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(float(b) for b in buckets if not math.isinf(b)))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), values + (_format_value(bound),))
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, cumulative
+
+
+class CallbackMetric(Metric):
+    """
+    抓取时通过回调取值的指标
+
+    回调返回单个数值（无标签），或 {标签值元组: 数值} 字典。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        if kind not in ("counter", "gauge"):
+            raise ValueError(f"不支持的回调指标类型: {kind}")
+        self.kind = kind
+        self.callback = callback
+
+    def _new_child(self) -> None:
+        return None
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, label_values), float(value)
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """注册指标，同名指标重复注册时替换旧的（回调指标需要指向新的实例）"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+        labelnames: Sequence[str] = ()
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, callback, labelnames))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """以Prometheus文本格式导出全部指标，单个回调出错不影响其他指标"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表和应用指标
+registry = MetricsRegistry()
+
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "进行中的HTTP请求数"
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP请求耗时（秒），流式响应计到响应结束",
+    ("method", "endpoint", "status")
+)
+llm_request_duration = registry.histogram(
+    "llm_request_duration_seconds", "单次模型请求耗时（秒，不含排队），按调用位置统计",
+    ("call_site", "model", "outcome"), buckets=LLM_BUCKETS
+)
+llm_time_to_first_token = registry.histogram(
+    "llm_time_to_first_token_seconds", "流式模型请求的首个片段耗时（秒）",
+    ("call_site", "model"), buckets=LLM_BUCKETS
+)
+llm_retries = registry.counter(
+    "llm_retries_total", "模型请求重试次数，按触发重试的错误类别统计", ("call_site", "reason")
+)
+llm_hedges = registry.counter(
+    "llm_hedges_total", "对冲请求结果（hedge_won / primary_won / failed / budget_exhausted）",
+    ("call_site", "outcome")
+)
+llm_router_failovers = registry.counter(
+    "llm_router_failovers_total", "模型请求失败后切换到其他候选的次数", ("call_site",)
+)
+llm_circuit_rejections = registry.counter(
+    "llm_circuit_rejections_total", "熔断期间直接拒绝的模型请求数", ("call_site", "model")
+)
+llm_queue_wait = registry.histogram(
+    "llm_queue_wait_seconds", "模型请求在调度器中的排队时间（秒）", ("model",)
+)
+batch_rate_limit_wait = registry.histogram(
+    "batch_rate_limit_wait_seconds", "批量优化等待RPM/TPM配额的时间（秒）"
+)
+pipeline_stage_duration = registry.histogram(
+    "pipeline_stage_duration_seconds", "优化流程各阶段耗时（秒）", ("stage",)
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "数据库语句耗时（秒），后台任务的endpoint为background",
+    ("endpoint",)
+)
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟（秒）"
+)
+event_loop_lag_last = registry.gauge(
+    "event_loop_lag_last_seconds", "最近一次测得的事件循环调度延迟（秒）"
+)
+
+
+# 当前HTTP请求的ASGI scope，用于给数据库耗时标注接口
+_current_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("metrics_scope", default=None)
+_route_paths: Dict[Any, str] = {}
+
+
+def route_label(scope: dict) -> str:
+    """请求对应的路由模板（如 /api/v1/optimizer/history/{optimization_id}），避免标签基数膨胀"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        for route in getattr(app, "routes", ()):
+            route_endpoint = getattr(route, "endpoint", None)
+            if route_endpoint is not None:
+                _route_paths.setdefault(route_endpoint, route.path)
+        path = _route_paths.setdefault(endpoint, getattr(endpoint, "__name__", "unknown"))
+    return path
+
+
+def current_endpoint() -> str:
+    """当前上下文所属的接口"""
+    scope = _current_scope.get()
+    return route_label(scope) if scope is not None else "background"
+
+
+class MetricsMiddleware:
+    """记录HTTP请求耗时和进行中请求数的ASGI中间件（不包装响应体，对流式响应无影响）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.labels(
+                scope["method"], route_label(scope), str(status_code)
+            ).observe(time.perf_counter() - start)
+            _current_scope.reset(token)
+
+
+def instrument_engine(engine) -> None:
+    """
+    按接口记录数据库语句耗时
+
+    开始时间保存在语句的执行上下文上，语句执行失败时随上下文一起丢弃，不会在连接上残留。
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            db_query_duration.labels(current_endpoint()).observe(time.perf_counter() - start)
+
+
+def register_ai_client_metrics(client) -> None:
+    """导出AI客户端已有的缓存、合并和调度统计"""
+
+    def cache_counts(field: str) -> Dict[LabelValues, float]:
+        counts = {}
+        if client.cache is not None:
+            counts[("response",)] = getattr(client.cache, field)
+        if client.semantic_cache is not None:
+            counts[("semantic",)] = getattr(client.semantic_cache, field)
+        return counts
+
+    registry.callback("cache_hits_total", "缓存命中次数", "counter",
+                      lambda: cache_counts("hits"), ("cache",))
+    registry.callback("cache_misses_total", "缓存未命中次数", "counter",
+                      lambda: cache_counts("misses"), ("cache",))
+    registry.callback("singleflight_collapsed_total", "被合并到进行中调用的请求数", "counter",
+                      lambda: client.singleflight.collapsed)
+    registry.callback("llm_requests_in_flight", "占用调度器名额的模型请求数", "gauge",
+                      lambda: client.dispatcher.get_stats()["in_flight"])
+    registry.callback("llm_queue_depth", "在调度器中排队的模型请求数", "gauge",
+                      lambda: client.dispatcher.get_stats()["queue_depth"])
+    registry.callback("llm_router_latency_ewma_seconds", "路由统计的近期请求耗时（秒）", "gauge",
+                      lambda: {
+                          (key, call_site): value
+                          for key, target in client.router.targets.items()
+                          for call_site, value in target.latency.items()
+                      },
+                      ("target", "call_site"))
+    registry.callback("llm_router_error_rate", "路由统计的近期错误率", "gauge",
+                      lambda: {(key,): target.error_rate for key, target in client.router.targets.items()},
+                      ("target",))
+    registry.callback("llm_circuit_state", "模型熔断器状态（0关闭，1半开，2打开）", "gauge",
+                      lambda: {(key,): STATE_VALUES[breaker.state] for key, breaker in client.breakers.items()},
+                      ("target",))
+
+
+class EventLoopLagMonitor:
+    """定期测量事件循环的调度延迟：sleep 实际醒来的时间比预期晚多少"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            event_loop_lag.observe(lag)
+            event_loop_lag_last.set(lag)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
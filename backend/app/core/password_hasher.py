@@ -0,0 +1,89 @@
+"""
+密码哈希执行模块
+bcrypt 计算放到专用线程池中执行，避免阻塞事件循环
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+from .security import get_password_hash, verify_password
+
+
+class PasswordHasher:
+    """
+    异步密码哈希器
+
+    bcrypt 扩展在计算时释放GIL，线程池即可与事件循环并行；线程数决定
+    同时进行的哈希计算数，其余请求在线程池队列中按先后顺序等待。
+    排队数达到 max_pending 时直接拒绝（503），避免登录风暴无限堆积。
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 256):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_queue_time = 0.0
+        self.total_run_time = 0.0
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.workers + self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="认证请求过多，请稍后重试",
+                headers={"Retry-After": "1"}
+            )
+
+        def timed() -> Tuple[Any, float, float]:
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started, time.perf_counter()
+
+        submitted = time.perf_counter()
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.pending -= 1
+        # 统计在事件循环中更新，避免多个工作线程同时修改
+        self.completed += 1
+        self.total_queue_time += started - submitted
+        self.total_run_time += finished - started
+        return result
+
+    async def hash(self, password: str) -> str:
+        """计算密码哈希"""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """验证密码"""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        """关闭线程池，丢弃尚未开始的任务"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行统计"""
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_queue_time": self.total_queue_time / self.completed if self.completed else 0.0,
+            "avg_run_time": self.total_run_time / self.completed if self.completed else 0.0
+        }
+
+
+# 全局密码哈希器实例
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
@@ -0,0 +1,221 @@
+"""
+词表匹配引擎
+把多组词表编译为一个正则，一次扫描文本得到所有分组的命中次数和命中词
+"""
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+# 批量扫描时拼接文本用的分隔符，不会与任何词组相邻形成单词
+_SEPARATOR = "\x00"
+
+
+def _trie_regex(phrases: Iterable[str]) -> str:
+    """
+    将词组编译为前缀树形式的正则
+
+    公共前缀只匹配一次，同一位置优先匹配更长的词组。
+    """
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            return ("(?:" + body + ")?") if len(branches) > 1 or len(body) > 1 else body + "?"
+        return body
+
+    return build(trie)
+
+
+def _first_chars(phrases: Iterable[str]) -> str:
+    """匹配词组首字符的前瞻，用于快速跳过不可能匹配的位置"""
+    return "(?=[" + "".join(re.escape(char) for char in sorted({phrase[0] for phrase in phrases})) + "])"
+
+
+def _is_bounded(phrase: str) -> bool:
+    """是否按整词匹配：纯ASCII词组按整词匹配，含中文等字符的词组没有单词边界"""
+    return phrase.isascii()
+
+
+def _is_prefix(prefix: str, phrase: str) -> bool:
+    """prefix 是否为 phrase 在词边界处的前缀"""
+    if not phrase.startswith(prefix) or len(prefix) >= len(phrase):
+        return False
+    return not _is_bounded(prefix) or phrase[len(prefix)] == " "
+
+
+@dataclass
+class ScanResult:
+    """一次扫描的结果"""
+    counts: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    # 各分组按首次出现顺序记录的命中词
+    hits: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
+
+    def has(self, group: str) -> bool:
+        return self.counts.get(group, 0) > 0
+
+
+class BatchScanResult:
+    """
+    批量扫描的结果
+
+    counts 为 (文本数, 分组数) 的命中次数矩阵，列顺序与 groups 一致。
+    """
+
+    def __init__(self, engine: "PatternEngine", size: int, text_ids: np.ndarray,
+                 group_ids: np.ndarray, phrase_ids: np.ndarray, ordinals: np.ndarray):
+        self.engine = engine
+        self.size = size
+        self.groups = engine.groups
+        self._text_ids = text_ids
+        self._group_ids = group_ids
+        self._phrase_ids = phrase_ids
+        self._ordinals = ordinals
+        group_count = len(self.groups)
+        self.counts = np.bincount(
+            text_ids * group_count + group_ids, minlength=size * group_count
+        ).reshape(size, group_count)
+
+    def column(self, group: str) -> np.ndarray:
+        """单个分组的命中次数列"""
+        return self.counts[:, self.engine.group_index[group]]
+
+    def hits(self, groups: Sequence[str]) -> List[List[str]]:
+        """
+        每个文本在给定分组中的命中词，去重后先按分组顺序、再按首次出现顺序排列
+        （与依次拼接 ScanResult.hits 中这些分组的结果一致）
+        """
+        rank = np.full(len(self.groups), -1)
+        rank[[self.engine.group_index[group] for group in groups]] = np.arange(len(groups))
+        ranks = rank[self._group_ids]
+        selected = ranks >= 0
+        text_ids = self._text_ids[selected]
+        phrase_ids = self._phrase_ids[selected]
+        order = np.lexsort((self._ordinals[selected], ranks[selected], text_ids))
+        text_ids, phrase_ids = text_ids[order], phrase_ids[order]
+
+        # 同一文本中重复的词只保留第一次
+        _, first = np.unique(text_ids * len(self.engine.phrases) + phrase_ids, return_index=True)
+        first.sort()
+        text_ids, phrase_ids = text_ids[first], phrase_ids[first].tolist()
+
+        bounds = np.searchsorted(text_ids, np.arange(self.size + 1)).tolist()
+        phrases = self.engine.phrases
+        return [
+            [phrases[i] for i in phrase_ids[bounds[row]:bounds[row + 1]]]
+            for row in range(self.size)
+        ]
+
+
+class PatternEngine:
+    """
+    多词表单次扫描引擎
+
+    纯ASCII的词组按整词匹配（两端为ASCII单词边界）；含中文等字符的词组没有单词边界，
+    按子串匹配。在每个起点取最长的词组，同时计入以该起点
+    开始、作为其前缀的较短词组，例如 "for example" 同时计为 "for example" 和 "for"，
+    "不超过" 同时计为 "不超过" 和 "不超"（若在词表中）；同一起点每个分组只计一次。
+    只要同一分组内的词组互不重叠，结果与按分组分别执行 re.findall 一致。
+    """
+
+    def __init__(self, vocabularies: Mapping[str, Iterable[str]]):
+        self.vocabularies = {group: tuple(phrases) for group, phrases in vocabularies.items()}
+
+        groups_by_phrase: Dict[str, List[str]] = defaultdict(list)
+        for group, phrases in self.vocabularies.items():
+            for phrase in phrases:
+                if group not in groups_by_phrase[phrase]:
+                    groups_by_phrase[phrase].append(group)
+
+        # 每个词组命中时需要计入的 (分组, 词组)：作为其前缀的较短词组也计入各自的分组，
+        # 同一分组只取最长的一个，与按分组分别 findall 的结果一致
+        self._expansions: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        for phrase in groups_by_phrase:
+            longest: Dict[str, str] = {}
+            for prefix in sorted(groups_by_phrase, key=len, reverse=True):
+                if prefix == phrase or _is_prefix(prefix, phrase):
+                    for group in groups_by_phrase[prefix]:
+                        longest.setdefault(group, prefix)
+            self._expansions[phrase] = tuple(longest.items())
+
+        bounded = [phrase for phrase in groups_by_phrase if _is_bounded(phrase)]
+        unbounded = [phrase for phrase in groups_by_phrase if not _is_bounded(phrase)]
+        alternatives = []
+        if bounded:
+            alternatives.append(r"\b(?:" + _trie_regex(bounded) + r")\b")
+        if unbounded:
+            # 中文词组的首字各不相同，先用字符集排除不可能的位置，避免逐个尝试分支
+            alternatives.append(_first_chars(unbounded) + "(?:" + _trie_regex(unbounded) + ")")
+        # 单词边界按ASCII计算：汉字等视为非单词字符，"用python写" 这类中英混排中的英文词也能匹配
+        self.pattern = re.compile(
+            _first_chars(groups_by_phrase) + r"(?=(" + "|".join(alternatives) + r"))", re.ASCII
+        )
+
+        # 批量扫描用的数组形式：分组、词组编号和按词组展开的 (分组, 命中词组) 表
+        self.groups = list(self.vocabularies)
+        self.group_index = {group: i for i, group in enumerate(self.groups)}
+        self.phrases = list(groups_by_phrase)
+        self._phrase_index = {phrase: i for i, phrase in enumerate(self.phrases)}
+        self._phrase_index[""] = -1
+        self._expansion_lengths = np.array([len(self._expansions[p]) for p in self.phrases], dtype=np.int64)
+        self._expansion_offsets = np.concatenate(([0], np.cumsum(self._expansion_lengths)[:-1]))
+        flat = [entry for phrase in self.phrases for entry in self._expansions[phrase]]
+        self._expansion_groups = np.array([self.group_index[group] for group, _ in flat], dtype=np.int64)
+        self._expansion_phrases = np.array([self._phrase_index[phrase] for _, phrase in flat], dtype=np.int64)
+        self._batch_pattern = re.compile(self.pattern.pattern + "|" + re.escape(_SEPARATOR), re.ASCII)
+
+    def scan(self, text: str) -> ScanResult:
+        """扫描文本（调用方负责统一大小写）"""
+        result = ScanResult()
+        counts, hits = result.counts, result.hits
+        expansions = self._expansions
+        for phrase in self.pattern.findall(text):
+            for group, matched in expansions[phrase]:
+                counts[group] += 1
+                group_hits = hits[group]
+                if matched not in group_hits:
+                    group_hits.append(matched)
+        return result
+
+    def scan_many(self, texts: Sequence[str]) -> BatchScanResult:
+        """
+        批量扫描文本（调用方负责统一大小写）
+
+        所有文本拼接后只调用一次正则，命中结果用数组运算归到各文本和分组。
+        """
+        joined = _SEPARATOR.join(text.replace(_SEPARATOR, " ") for text in texts)
+        index = self._phrase_index
+        matches = self._batch_pattern.findall(joined)
+        ids = np.fromiter((index[match] for match in matches), dtype=np.int64, count=len(matches))
+
+        # 分隔符的位置确定每个命中属于哪条文本
+        separators = ids < 0
+        text_ids = np.cumsum(separators)[~separators]
+        phrase_ids = ids[~separators]
+
+        # 按展开表把每个命中展开为 (分组, 命中词组)
+        lengths = self._expansion_lengths[phrase_ids]
+        ordinals = np.repeat(np.arange(len(phrase_ids)), lengths)
+        entries = np.repeat(self._expansion_offsets[phrase_ids] - (np.cumsum(lengths) - lengths), lengths)
+        entries += np.arange(len(entries))
+
+        return BatchScanResult(
+            self,
+            len(texts),
+            text_ids[ordinals],
+            self._expansion_groups[entries],
+            self._expansion_phrases[entries],
+            ordinals
+        )
@@ -0,0 +1,89 @@
+"""
+认证主体缓存模块
+缓存已验证用户的身份信息，认证热路径不必每次查询数据库
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+
+
+class PrincipalCache:
+    """
+    进程内的用户身份快照缓存（TTL + LRU）
+
+    按用户ID缓存身份列的快照。修改用户状态或密码、删除用户时必须调用
+    invalidate()；多进程部署时其他进程的缓存最多在 ttl 秒后过期。
+    ttl 或 max_entries 为0时禁用。
+    """
+
+    def __init__(
+        self,
+        ttl: float = 30.0,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """获取身份快照的副本，不存在或已过期返回None"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= self.clock():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(entry[1])
+
+    def put(self, user_id: int, snapshot: Dict[str, Any]) -> None:
+        """写入身份快照"""
+        if not self.enabled:
+            return
+        self._entries[user_id] = (self.clock() + self.ttl, dict(snapshot))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        """用户信息变更后移除缓存"""
+        self.invalidations += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions
+        }
+
+
+# 全局认证主体缓存实例
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL, settings.PRINCIPAL_CACHE_MAX_ENTRIES)
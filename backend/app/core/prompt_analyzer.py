@@ -1,13 +1,20 @@
 """
 提示词分析器模块
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
+from itertools import islice
 import re
 import time
 
+import numpy as np
+
 from .ai_client import AIClient
+from .pattern_engine import PatternEngine, ScanResult
+from .tokenizer import TokenCounter, token_counter as shared_token_counter
+from .quality_evaluator import QualityCriterion
 
 
 class PromptType(Enum):
@@ -42,6 +49,8 @@ class PromptFeatures:
     has_constraints: bool
     has_context: bool
     readability_score: float
+    token_count: int
+    tokens_per_word: float
 
 
 @dataclass
@@ -70,49 +79,219 @@ class AnalysisResult:
     processing_time: float
 
 
+@dataclass
+class HeuristicQuality:
+    """基于本地分析结果估算的质量评分"""
+    scores: Dict[str, int]
+    overall_score: float
+    issues: List[str]
+    suggestions: List[str]
+    confidence: float
+    processing_time: float
+
+
+# 技术术语词表（按领域）
+# 中文词组没有单词边界，按子串匹配；同一分组内的中文词组应互不包含，避免重复计数
+TECHNICAL_TERMS: Dict[str, Tuple[str, ...]] = {
+    "programming": (
+        "function", "class", "method", "variable", "array", "object", "string", "integer", "boolean",
+        "python", "javascript", "java", "c++", "html", "css", "sql", "api", "json", "xml",
+        "algorithm", "data structure", "database", "framework", "library",
+        "函数", "变量", "数组", "对象", "字符串", "整数", "布尔", "代码", "接口",
+        "算法", "数据结构", "数据库", "框架",
+    ),
+    "data_analysis": (
+        "data", "dataset", "analysis", "statistics", "correlation", "regression",
+        "chart", "graph", "visualization", "metrics", "kpi", "trend",
+        "pandas", "numpy", "matplotlib", "sql", "excel", "csv",
+        "数据", "分析", "统计", "相关性", "回归", "图表", "可视化", "指标", "趋势",
+    ),
+    "writing": (
+        "article", "essay", "blog", "content", "copy", "narrative", "story",
+        "tone", "style", "audience", "voice", "structure", "format",
+        "introduction", "conclusion", "paragraph", "thesis", "argument",
+        "文章", "博客", "文案", "故事", "语气", "风格", "受众", "结构", "格式",
+        "引言", "结论", "段落", "论点",
+    ),
+    "academic": (
+        "research", "study", "theory", "hypothesis", "methodology", "analysis",
+        "citation", "reference", "literature", "review", "paper", "journal",
+        "abstract", "conclusion", "findings", "results", "discussion",
+        "研究", "理论", "方法论", "分析", "引用", "文献", "综述", "论文", "期刊",
+        "摘要", "结论", "讨论",
+    ),
+}
+
+# 结构元素指示词
+STRUCTURE_INDICATORS: Dict[str, Tuple[str, ...]] = {
+    "goal": (
+        "create", "write", "generate", "analyze", "explain", "describe", "calculate", "solve", "design", "build",
+        "创建", "写", "生成", "分析", "解释", "描述", "计算", "解决", "设计", "构建", "实现", "总结", "翻译",
+    ),
+    "context": (
+        "given", "assuming", "in the context of", "considering", "based on", "for",
+        "已知", "假设", "考虑到", "基于", "根据", "背景", "场景", "作为",
+    ),
+    "instruction": (
+        "please", "should", "must", "need to", "required", "ensure", "make sure",
+        "请", "应该", "必须", "需要", "要求", "确保", "务必",
+    ),
+    "example": (
+        "for example", "such as", "like", "including", "instance", "sample",
+        "例如", "比如", "举例", "示例", "样例", "包括",
+    ),
+    "constraint": (
+        "limit", "maximum", "minimum", "no more than", "at least", "within", "between",
+        "限制", "最多", "最少", "不超过", "至少", "以内", "之间", "不要",
+    ),
+    "format": (
+        "format", "structure", "organize", "layout", "arrange", "present as",
+        "格式", "结构", "形式", "列表", "表格", "分点", "分段", "排版",
+    ),
+}
+
+# 基础特征指示词
+FEATURE_INDICATORS: Dict[str, Tuple[str, ...]] = {
+    "imperative": (
+        "please", "write", "create", "make", "do", "generate", "analyze", "explain", "describe",
+        "请", "写", "创建", "生成", "分析", "解释", "描述", "帮我",
+    ),
+    "examples": ("example", "for instance", "such as", "like", "例如", "比如", "举例", "示例"),
+    "constraints": ("limit", "maximum", "minimum", "within", "between", "限制", "最多", "最少", "不超过", "以内", "之间"),
+    "context": ("given", "assuming", "context", "background", "scenario", "已知", "假设", "上下文", "背景", "场景"),
+    "tasks": ("and", "also", "additionally", "furthermore", "moreover", "并且", "同时", "此外", "另外", "以及", "还要"),
+}
+
+# 汉字和日文假名不以空格分词，按字计数；全角标点与空白一样只起分隔作用
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CJK_PUNCTUATION = "\u3000-\u303f\uff01-\uff0f\uff1a-\uff20\uff3b-\uff40\uff5b-\uff65"
+_CJK_RUN = re.compile(f"[{_CJK_CHARS}]+")
+_NON_CJK_WORD = re.compile(f"[^\\s{_CJK_CHARS}{_CJK_PUNCTUATION}]+")
+_SENTENCE_SPLIT = re.compile(r'[.!?。！？]+')
+
+# 中文平均词长约为两个字，按每两个字计一个词，使字数相关的阈值对中英文大致可比
+CJK_CHARS_PER_WORD = 2
+
+# 类型识别关键词（编程类按术语匹配，其余按子串匹配），按优先级排列
+CODE_TERMS = ('python', 'javascript', 'function', 'code', 'api', '函数', '代码', '接口')
+TYPE_KEYWORDS: Tuple[Tuple[PromptType, Tuple[str, ...]], ...] = (
+    (PromptType.WRITING, ('write', 'article', 'essay', 'content', 'story', '文章', '作文', '写作', '故事', '文案')),
+    (PromptType.ANALYSIS, ('analyze', 'analysis', 'data', 'statistics', 'evaluate', '分析', '数据', '统计', '评估')),
+    (PromptType.CREATIVE, ('creative', 'imagine', 'brainstorm', 'invent', 'design', '创意', '想象', '头脑风暴', '发明', '设计')),
+)
+
+# 可读性分档：(读易性下限, 评分)
+READABILITY_BANDS = ((90, 10), (80, 9), (70, 8), (60, 7), (50, 6), (30, 5))
+
+# 复杂度分档：(复杂度得分下限, 级别)
+COMPLEXITY_BANDS = (
+    (8, ComplexityLevel.VERY_COMPLEX),
+    (6, ComplexityLevel.COMPLEX),
+    (3, ComplexityLevel.MEDIUM),
+)
+
+# 所有词表编译为一个引擎，分析时只扫描一遍文本
+ANALYZER_ENGINE = PatternEngine({
+    **{f"term:{category}": terms for category, terms in TECHNICAL_TERMS.items()},
+    **{f"structure:{name}": words for name, words in STRUCTURE_INDICATORS.items()},
+    **{f"feature:{name}": words for name, words in FEATURE_INDICATORS.items()},
+})
+
+
+# analyze_many 的列定义，每行对应一条提示词
+BATCH_ANALYSIS_DTYPE = np.dtype([
+    ("word_count", np.int32),
+    ("sentence_count", np.int32),
+    ("avg_sentence_length", np.float32),
+    ("question_count", np.int32),
+    ("imperative_count", np.int32),
+    ("technical_term_count", np.int32),
+    ("has_examples", np.bool_),
+    ("has_constraints", np.bool_),
+    ("has_context", np.bool_),
+    ("readability_score", np.float32),
+    ("token_count", np.int32),
+    ("tokens_per_word", np.float32),
+    ("has_clear_goal", np.bool_),
+    ("has_instructions", np.bool_),
+    ("has_output_format", np.bool_),
+    ("structure_score", np.float32),
+    ("prompt_type", "U11"),
+    ("complexity_level", "U12"),
+])
+
+
+@dataclass
+class BatchAnalysis:
+    """批量分析结果：数值列放在结构化数组中，术语列表单独保存"""
+    columns: np.ndarray
+    technical_terms: List[List[str]]
+    processing_time: float
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+
+def _flesch(avg_sentence_length):
+    """简化版Flesch读易性（假设每个单词平均1.5个音节），标量和数组通用"""
+    return 206.835 - (1.015 * avg_sentence_length) - (84.6 * 1.5)
+
+
+def _complexity_score(word_count, avg_sentence_length, term_count, structure_score, task_count):
+    """
+    复杂度得分：长度、句长、术语数、结构完整度、多任务各0~2分
+
+    每项超过较低阈值得1分、超过较高阈值得2分，标量和数组通用
+    （sum 从整数0开始累加，布尔数组之间不会按逻辑或相加）。
+    """
+    return sum((
+        word_count > 50, word_count > 100,
+        avg_sentence_length > 15, avg_sentence_length > 20,
+        term_count > 2, term_count > 5,
+        structure_score > 6, structure_score > 8,
+        task_count > 1, task_count > 3,
+    ))
+
+
+def _segment(prompt: str) -> Tuple[int, int]:
+    """
+    按文字类型统计词数和句数
+
+    空格分隔的单词各计一个词，连续的汉字按 CJK_CHARS_PER_WORD 折算；
+    句子按中英文句末标点切分。纯ASCII文本直接按空白切分。
+    """
+    sentence_count = sum(1 for sentence in _SENTENCE_SPLIT.split(prompt) if sentence.strip())
+    if prompt.isascii():
+        return len(prompt.split()), sentence_count
+    
+    cjk_chars = sum(map(len, _CJK_RUN.findall(prompt)))
+    word_count = len(_NON_CJK_WORD.findall(prompt)) + -(-cjk_chars // CJK_CHARS_PER_WORD)
+    return word_count, sentence_count
+
+
+def _count_questions(prompt: str) -> int:
+    return prompt.count('?') + prompt.count('？')
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    """去重并保持原有顺序"""
+    return list(dict.fromkeys(items))
+
+
+def _clamp_score(value: float) -> int:
+    return int(min(10, max(1, round(value))))
+
+
 class PromptAnalyzer:
     """提示词分析器"""
     
-    def __init__(self, ai_client: Optional[AIClient] = None):
+    def __init__(self, ai_client: Optional[AIClient] = None, token_counter: Optional[TokenCounter] = None):
         self.ai_client = ai_client
-        self.technical_terms_patterns = self._load_technical_patterns()
-        self.structure_patterns = self._load_structure_patterns()
-    
-    def _load_technical_patterns(self) -> Dict[str, List[str]]:
-        """加载技术术语模式"""
-        return {
-            "programming": [
-                r"\b(function|class|method|variable|array|object|string|integer|boolean)\b",
-                r"\b(python|javascript|java|c\+\+|html|css|sql|api|json|xml)\b",
-                r"\b(algorithm|data structure|database|framework|library)\b"
-            ],
-            "data_analysis": [
-                r"\b(data|dataset|analysis|statistics|correlation|regression)\b",
-                r"\b(chart|graph|visualization|metrics|kpi|trend)\b",
-                r"\b(pandas|numpy|matplotlib|sql|excel|csv)\b"
-            ],
-            "writing": [
-                r"\b(article|essay|blog|content|copy|narrative|story)\b",
-                r"\b(tone|style|audience|voice|structure|format)\b",
-                r"\b(introduction|conclusion|paragraph|thesis|argument)\b"
-            ],
-            "academic": [
-                r"\b(research|study|theory|hypothesis|methodology|analysis)\b",
-                r"\b(citation|reference|literature|review|paper|journal)\b",
-                r"\b(abstract|conclusion|findings|results|discussion)\b"
-            ]
-        }
-    
-    def _load_structure_patterns(self) -> Dict[str, str]:
-        """加载结构模式"""
-        return {
-            "goal_indicators": r"\b(create|write|generate|analyze|explain|describe|calculate|solve|design|build)\b",
-            "context_indicators": r"\b(given|assuming|in the context of|considering|based on|for)\b",
-            "instruction_indicators": r"\b(please|should|must|need to|required|ensure|make sure)\b",
-            "example_indicators": r"\b(for example|such as|like|including|instance|sample)\b",
-            "constraint_indicators": r"\b(limit|maximum|minimum|no more than|at least|within|between)\b",
-            "format_indicators": r"\b(format|structure|organize|layout|arrange|present as)\b"
-        }
+        self.engine = ANALYZER_ENGINE
+        self.token_counter = token_counter or shared_token_counter
     
     async def analyze(self, prompt: str, use_ai: bool = True) -> AnalysisResult:
         """
@@ -127,17 +306,46 @@ class PromptAnalyzer:
         """
         start_time = time.time()
         
+        result = self.analyze_local(prompt)
+        
+        # AI深度分析（可选）
+        if use_ai and self.ai_client:
+            ai_insights = await self._ai_analysis(prompt)
+            result.strengths = _dedupe(result.strengths + ai_insights.get('strengths', []))
+            result.weaknesses = _dedupe(result.weaknesses + ai_insights.get('weaknesses', []))
+            result.suggestions = _dedupe(result.suggestions + ai_insights.get('suggestions', []))
+        
+        result.processing_time = time.time() - start_time
+        return result
+    
+    def analyze_local(self, prompt: str) -> AnalysisResult:
+        """
+        本地规则分析，不发起任何网络请求
+        
+        Args:
+            prompt: 要分析的提示词
+            
+        Returns:
+            分析结果
+        """
+        start_time = time.perf_counter()
+        
+        prompt_lower = prompt.lower()
+        scan = self.engine.scan(prompt_lower)
+        
         # 基础特征分析
-        features = self._analyze_features(prompt)
+        features = self._analyze_features(prompt, scan)
         
         # 结构分析
-        structure = self._analyze_structure(prompt)
+        structure = self._analyze_structure(scan)
         
         # 类型识别
-        prompt_type = self._identify_type(prompt, features)
+        prompt_type = self._identify_type(
+            prompt_lower, features.technical_terms, features.question_count, features.imperative_count
+        )
         
         # 复杂度评估
-        complexity_level = self._assess_complexity(prompt, features, structure)
+        complexity_level = self._assess_complexity(scan, features, structure)
         
         # 优缺点分析
         strengths, weaknesses = self._analyze_strengths_weaknesses(features, structure)
@@ -145,53 +353,200 @@ class PromptAnalyzer:
         # 改进建议
         suggestions = self._generate_suggestions(features, structure, weaknesses)
         
-        # AI深度分析（可选）
-        if use_ai and self.ai_client:
-            ai_insights = await self._ai_analysis(prompt)
-            strengths.extend(ai_insights.get('strengths', []))
-            weaknesses.extend(ai_insights.get('weaknesses', []))
-            suggestions.extend(ai_insights.get('suggestions', []))
-        
-        processing_time = time.time() - start_time
-        
         return AnalysisResult(
             prompt_type=prompt_type,
             complexity_level=complexity_level,
             features=features,
             structure=structure,
-            strengths=list(set(strengths)),  # 去重
-            weaknesses=list(set(weaknesses)),
-            suggestions=list(set(suggestions)),
-            processing_time=processing_time
+            strengths=_dedupe(strengths),
+            weaknesses=_dedupe(weaknesses),
+            suggestions=_dedupe(suggestions),
+            processing_time=time.perf_counter() - start_time
+        )
+    
+    def analyze_many(
+        self,
+        prompts: Iterable[str],
+        processes: Optional[int] = None,
+        chunk_size: int = 1000
+    ) -> BatchAnalysis:
+        """
+        批量本地分析，用于离线审计大量提示词
+        
+        只计算可以按列存放的特征，不生成优缺点和建议文本。
+        
+        Args:
+            prompts: 提示词序列，按顺序分析
+            processes: 进程数，大于1时分块交给进程池并行处理
+            chunk_size: 每个分块的提示词数
+            
+        Returns:
+            与输入顺序一致的批量分析结果
+        """
+        start_time = time.perf_counter()
+        chunks = _chunked(prompts, chunk_size)
+        
+        if processes and processes > 1:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_worker,
+                initargs=(self.token_counter,)
+            ) as executor:
+                parts = list(executor.map(_analyze_chunk, chunks))
+        else:
+            parts = [self._analyze_chunk(chunk) for chunk in chunks]
+        
+        columns = (
+            np.concatenate([part[0] for part in parts]) if parts
+            else np.empty(0, dtype=BATCH_ANALYSIS_DTYPE)
+        )
+        technical_terms = [terms for part in parts for terms in part[1]]
+        return BatchAnalysis(
+            columns=columns,
+            technical_terms=technical_terms,
+            processing_time=time.perf_counter() - start_time
+        )
+    
+    def _analyze_chunk(self, prompts: List[str]) -> Tuple[np.ndarray, List[List[str]]]:
+        """分析一个分块：整块扫描一次，各项特征按列计算"""
+        size = len(prompts)
+        lowers = [prompt.lower() for prompt in prompts]
+        scan = self.engine.scan_many(lowers)
+        technical_terms = scan.hits([f"term:{category}" for category in TECHNICAL_TERMS])
+        
+        columns = np.zeros(size, dtype=BATCH_ANALYSIS_DTYPE)
+        segments = np.array([_segment(prompt) for prompt in prompts], dtype=np.int32).reshape(size, 2)
+        word_count = segments[:, 0]
+        columns["word_count"] = word_count
+        columns["sentence_count"] = segments[:, 1]
+        avg_sentence_length = word_count / np.maximum(segments[:, 1], 1)
+        columns["avg_sentence_length"] = avg_sentence_length
+        token_count = np.array(self.token_counter.count_many(prompts), dtype=np.int32)
+        columns["token_count"] = token_count
+        columns["tokens_per_word"] = np.where(word_count > 0, token_count / np.maximum(word_count, 1), 0.0)
+        columns["question_count"] = np.fromiter((_count_questions(prompt) for prompt in prompts), dtype=np.int32, count=size)
+        columns["imperative_count"] = scan.column("feature:imperative")
+        columns["technical_term_count"] = [len(terms) for terms in technical_terms]
+        columns["has_examples"] = scan.column("feature:examples") > 0
+        columns["has_constraints"] = scan.column("feature:constraints") > 0
+        columns["has_context"] = scan.column("feature:context") > 0
+        
+        readability = _flesch(avg_sentence_length)
+        columns["readability_score"] = np.where(
+            word_count == 0, 0,
+            np.select(
+                [readability >= threshold for threshold, _ in READABILITY_BANDS],
+                [score for _, score in READABILITY_BANDS],
+                np.maximum(0, readability / 30 * 5)
+            )
+        )
+        
+        present = {name: scan.column(f"structure:{name}") > 0 for name in STRUCTURE_INDICATORS}
+        columns["has_clear_goal"] = present["goal"]
+        columns["has_instructions"] = present["instruction"]
+        columns["has_output_format"] = present["format"]
+        structure_score = sum(present.values()) / len(present) * 10
+        columns["structure_score"] = structure_score
+        
+        complexity_score = _complexity_score(
+            word_count, avg_sentence_length, columns["technical_term_count"],
+            structure_score, scan.column("feature:tasks")
+        )
+        columns["complexity_level"] = np.select(
+            [complexity_score >= threshold for threshold, _ in COMPLEXITY_BANDS],
+            [level.value for _, level in COMPLEXITY_BANDS],
+            ComplexityLevel.SIMPLE.value
+        )
+        columns["prompt_type"] = [
+            self._identify_type(prompt_lower, terms, questions, imperatives).value
+            for prompt_lower, terms, questions, imperatives in zip(
+                lowers, technical_terms, columns["question_count"].tolist(), columns["imperative_count"].tolist()
+            )
+        ]
+        return columns, technical_terms
+    
+    def estimate_quality(self, prompt: str) -> HeuristicQuality:
+        """
+        不调用模型，将本地分析结果映射为五个质量维度的评分
+        
+        置信度反映规则对这段文本的适用程度：规则词表只覆盖英文和中文，其他文字
+        占比越高置信度越低；总分越接近中间值，结论越容易被模型评估推翻，置信度也越低。
+        
+        Args:
+            prompt: 要评估的提示词
+            
+        Returns:
+            估算的质量评分
+        """
+        start_time = time.perf_counter()
+        result = self.analyze_local(prompt)
+        features, structure = result.features, result.structure
+        
+        words = features.word_count
+        length_score = min(words, 40) / 40 * 3
+        sentence_penalty = max(0.0, features.avg_sentence_length - 25) / 5
+        
+        scores = {
+            QualityCriterion.CLARITY.value: _clamp_score(
+                2 + 3 * structure.has_clear_goal + 2 * structure.has_instructions
+                + features.readability_score * 0.3 - sentence_penalty
+            ),
+            QualityCriterion.COMPLETENESS.value: _clamp_score(
+                1 + length_score + 2 * structure.has_context + 1.5 * structure.has_examples
+                + 1.5 * structure.has_output_format
+            ),
+            QualityCriterion.STRUCTURE.value: _clamp_score(1 + structure.structure_score * 0.9),
+            QualityCriterion.SPECIFICITY.value: _clamp_score(
+                1 + length_score + min(len(features.technical_terms), 4) * 0.75
+                + 1.5 * structure.has_constraints + 1.5 * features.has_examples
+            ),
+            QualityCriterion.ACTIONABILITY.value: _clamp_score(
+                2 + 3 * structure.has_clear_goal + min(features.imperative_count, 2)
+                + 1.5 * structure.has_output_format + structure.has_instructions
+            ),
+        }
+        overall_score = round(sum(scores.values()) / len(scores), 1)
+        
+        letters = sum(1 for char in prompt if char.isalpha())
+        covered = sum(1 for char in prompt if char.isalpha() and (char.isascii() or '\u4e00' <= char <= '\u9fff'))
+        coverage = covered / letters if letters else 0.0
+        decisiveness = min(1.0, abs(overall_score - 5.5) / 4.5)
+        confidence = round(coverage * (0.5 + 0.5 * decisiveness), 3)
+        
+        return HeuristicQuality(
+            scores=scores,
+            overall_score=overall_score,
+            issues=result.weaknesses,
+            suggestions=result.suggestions,
+            confidence=confidence,
+            processing_time=time.perf_counter() - start_time
         )
     
-    def _analyze_features(self, prompt: str) -> PromptFeatures:
+    def _analyze_features(self, prompt: str, scan: ScanResult) -> PromptFeatures:
         """分析提示词特征"""
         # 基础统计
-        words = prompt.split()
-        sentences = re.split(r'[.!?]+', prompt)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        word_count = len(words)
-        sentence_count = len(sentences)
+        word_count, sentence_count = _segment(prompt)
         avg_sentence_length = word_count / max(sentence_count, 1)
         
         # 问句和祈使句计数
-        question_count = len(re.findall(r'\?', prompt))
-        imperative_pattern = r'\b(please|write|create|make|do|generate|analyze|explain|describe)\b'
-        imperative_count = len(re.findall(imperative_pattern, prompt.lower()))
+        question_count = _count_questions(prompt)
+        imperative_count = scan.counts.get("feature:imperative", 0)
         
         # 技术术语识别
-        technical_terms = self._identify_technical_terms(prompt)
+        technical_terms = self._identify_technical_terms(scan)
         
         # 结构元素检测
-        has_examples = bool(re.search(r'\b(example|for instance|such as|like)\b', prompt.lower()))
-        has_constraints = bool(re.search(r'\b(limit|maximum|minimum|within|between)\b', prompt.lower()))
-        has_context = bool(re.search(r'\b(given|assuming|context|background|scenario)\b', prompt.lower()))
+        has_examples = scan.has("feature:examples")
+        has_constraints = scan.has("feature:constraints")
+        has_context = scan.has("feature:context")
         
         # 可读性评分 (简化版本)
         readability_score = self._calculate_readability(prompt, avg_sentence_length, word_count)
         
+        # Token数和每个词对应的Token数（越高说明生僻词、代码或符号越多）
+        token_count = self.token_counter.count(prompt)
+        tokens_per_word = token_count / word_count if word_count else 0.0
+        
         return PromptFeatures(
             word_count=word_count,
             sentence_count=sentence_count,
@@ -202,20 +557,20 @@ class PromptAnalyzer:
             has_examples=has_examples,
             has_constraints=has_constraints,
             has_context=has_context,
-            readability_score=readability_score
+            readability_score=readability_score,
+            token_count=token_count,
+            tokens_per_word=tokens_per_word
         )
     
-    def _analyze_structure(self, prompt: str) -> PromptStructure:
+    def _analyze_structure(self, scan: ScanResult) -> PromptStructure:
         """分析提示词结构"""
-        prompt_lower = prompt.lower()
-        
         # 检测结构元素
-        has_clear_goal = bool(re.search(self.structure_patterns["goal_indicators"], prompt_lower))
-        has_context = bool(re.search(self.structure_patterns["context_indicators"], prompt_lower))
-        has_instructions = bool(re.search(self.structure_patterns["instruction_indicators"], prompt_lower))
-        has_examples = bool(re.search(self.structure_patterns["example_indicators"], prompt_lower))
-        has_constraints = bool(re.search(self.structure_patterns["constraint_indicators"], prompt_lower))
-        has_output_format = bool(re.search(self.structure_patterns["format_indicators"], prompt_lower))
+        has_clear_goal = scan.has("structure:goal")
+        has_context = scan.has("structure:context")
+        has_instructions = scan.has("structure:instruction")
+        has_examples = scan.has("structure:example")
+        has_constraints = scan.has("structure:constraint")
+        has_output_format = scan.has("structure:format")
         
         # 计算结构评分
         structure_elements = [
@@ -250,120 +605,67 @@ class PromptAnalyzer:
             missing_elements=missing_elements
         )
     
-    def _identify_technical_terms(self, prompt: str) -> List[str]:
+    def _identify_technical_terms(self, scan: ScanResult) -> List[str]:
         """识别技术术语"""
-        prompt_lower = prompt.lower()
         technical_terms = []
+        for category in TECHNICAL_TERMS:
+            technical_terms.extend(scan.hits.get(f"term:{category}", ()))
         
-        for category, patterns in self.technical_terms_patterns.items():
-            for pattern in patterns:
-                matches = re.findall(pattern, prompt_lower)
-                technical_terms.extend(matches)
-        
-        return list(set(technical_terms))  # 去重
+        return _dedupe(technical_terms)
     
-    def _identify_type(self, prompt: str, features: PromptFeatures) -> PromptType:
+    def _identify_type(
+        self,
+        prompt_lower: str,
+        technical_terms: List[str],
+        question_count: int,
+        imperative_count: int
+    ) -> PromptType:
         """识别提示词类型"""
-        prompt_lower = prompt.lower()
-        
         # 编程相关
-        if any(term in features.technical_terms for term in ['python', 'javascript', 'function', 'code', 'api']):
+        if any(term in technical_terms for term in CODE_TERMS):
             return PromptType.CODE
         
-        # 写作相关
-        if any(word in prompt_lower for word in ['write', 'article', 'essay', 'content', 'story']):
-            return PromptType.WRITING
-        
-        # 分析相关
-        if any(word in prompt_lower for word in ['analyze', 'analysis', 'data', 'statistics', 'evaluate']):
-            return PromptType.ANALYSIS
-        
-        # 创意相关
-        if any(word in prompt_lower for word in ['creative', 'imagine', 'brainstorm', 'invent', 'design']):
-            return PromptType.CREATIVE
+        # 写作、分析、创意相关
+        for prompt_type, keywords in TYPE_KEYWORDS:
+            if any(word in prompt_lower for word in keywords):
+                return prompt_type
         
         # 问题相关
-        if features.question_count > 0:
+        if question_count > 0:
             return PromptType.QUESTION
         
         # 指令相关
-        if features.imperative_count > 0:
+        if imperative_count > 0:
             return PromptType.INSTRUCTION
         
         return PromptType.GENERAL
     
-    def _assess_complexity(self, prompt: str, features: PromptFeatures, structure: PromptStructure) -> ComplexityLevel:
+    def _assess_complexity(self, scan: ScanResult, features: PromptFeatures, structure: PromptStructure) -> ComplexityLevel:
         """评估复杂度"""
-        complexity_score = 0
-        
-        # 长度影响
-        if features.word_count > 100:
-            complexity_score += 2
-        elif features.word_count > 50:
-            complexity_score += 1
-        
-        # 句子复杂度
-        if features.avg_sentence_length > 20:
-            complexity_score += 2
-        elif features.avg_sentence_length > 15:
-            complexity_score += 1
-        
-        # 技术术语
-        if len(features.technical_terms) > 5:
-            complexity_score += 2
-        elif len(features.technical_terms) > 2:
-            complexity_score += 1
-        
-        # 结构复杂度
-        if structure.structure_score > 8:
-            complexity_score += 2
-        elif structure.structure_score > 6:
-            complexity_score += 1
-        
-        # 多任务
-        task_indicators = len(re.findall(r'\b(and|also|additionally|furthermore|moreover)\b', prompt.lower()))
-        if task_indicators > 3:
-            complexity_score += 2
-        elif task_indicators > 1:
-            complexity_score += 1
+        complexity_score = _complexity_score(
+            features.word_count,
+            features.avg_sentence_length,
+            len(features.technical_terms),
+            structure.structure_score,
+            scan.counts.get("feature:tasks", 0)
+        )
         
         # 映射到复杂度级别
-        if complexity_score >= 8:
-            return ComplexityLevel.VERY_COMPLEX
-        elif complexity_score >= 6:
-            return ComplexityLevel.COMPLEX
-        elif complexity_score >= 3:
-            return ComplexityLevel.MEDIUM
-        else:
-            return ComplexityLevel.SIMPLE
+        for threshold, level in COMPLEXITY_BANDS:
+            if complexity_score >= threshold:
+                return level
+        return ComplexityLevel.SIMPLE
     
     def _calculate_readability(self, prompt: str, avg_sentence_length: float, word_count: int) -> float:
-        """计算可读性评分（简化版Flesch读易性测试）"""
-        # 简化的可读性计算
+        """计算可读性评分（简化版Flesch读易性测试），标准化到0-10分"""
         if word_count == 0:
             return 0
         
-        # 计算平均音节数（简化：假设每个单词平均1.5个音节）
-        avg_syllables_per_word = 1.5
-        
-        # Flesch公式的简化版本
-        readability = 206.835 - (1.015 * avg_sentence_length) - (84.6 * avg_syllables_per_word)
-        
-        # 标准化到0-10分
-        if readability >= 90:
-            return 10
-        elif readability >= 80:
-            return 9
-        elif readability >= 70:
-            return 8
-        elif readability >= 60:
-            return 7
-        elif readability >= 50:
-            return 6
-        elif readability >= 30:
-            return 5
-        else:
-            return max(0, readability / 30 * 5)
+        readability = _flesch(avg_sentence_length)
+        for threshold, score in READABILITY_BANDS:
+            if readability >= threshold:
+                return score
+        return max(0, readability / 30 * 5)
     
     def _analyze_strengths_weaknesses(self, features: PromptFeatures, structure: PromptStructure) -> tuple[List[str], List[str]]:
         """分析优缺点"""
@@ -468,7 +770,7 @@ class PromptAnalyzer:
         ]
         
         try:
-            response = await self.ai_client._make_request_with_retry(messages, temperature=0.3)
+            response = await self.ai_client._make_request_with_retry(messages, temperature=0.3, call_site="deep_analysis")
             content = response.choices[0].message.content
             
             import json
@@ -493,9 +795,36 @@ class PromptAnalyzer:
 - 类型：{result.prompt_type.value}
 - 复杂度：{result.complexity_level.value}
 - 字数：{result.features.word_count}
+- Token数：{result.features.token_count}
 - 结构评分：{result.structure.structure_score:.1f}/10
 - 可读性：{result.features.readability_score:.1f}/10
 - 主要优点：{len(result.strengths)}个
 - 需改进点：{len(result.weaknesses)}个
 - 改进建议：{len(result.suggestions)}个
-""" 
\ No newline at end of file
+"""
+
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    """按固定大小切分序列"""
+    iterator = iter(items)
+    while chunk := list(islice(iterator, max(1, size))):
+        yield chunk
+
+
+# 进程池子进程内的分析器，由 _init_worker 按父进程分析器的Token计数配置构建
+_worker_analyzer: Optional[PromptAnalyzer] = None
+
+
+def _init_worker(token_counter: TokenCounter) -> None:
+    """进程池初始化函数，使子进程与单进程分析使用相同的Token计数器配置"""
+    global _worker_analyzer
+    _worker_analyzer = PromptAnalyzer(token_counter=token_counter)
+
+
+def _analyze_chunk(prompts: List[str]) -> Tuple[np.ndarray, List[List[str]]]:
+    """进程池工作函数，使用子进程内按配置构建的分析器"""
+    return _worker_analyzer._analyze_chunk(prompts)
+
+
+# 全局提示词分析器实例（仅本地规则分析）
+prompt_analyzer = PromptAnalyzer()
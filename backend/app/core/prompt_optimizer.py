@@ -264,7 +264,7 @@ class AIPromptOptimizer(PromptOptimizer):
             {"role": "user", "content": optimization_prompt}
         ]
         
-        response = await self.ai_client._make_request_with_retry(messages, temperature=0.7)
+        response = await self.ai_client._make_request_with_retry(messages, temperature=0.7, call_site="optimize")
         optimized_content = response.choices[0].message.content
         
         # 解析优化结果
@@ -204,7 +204,7 @@ class QualityEvaluator:
             }
         ]
         
-        response = await self.ai_client._make_request_with_retry(messages, temperature=0.3)
+        response = await self.ai_client._make_request_with_retry(messages, temperature=0.3, call_site="evaluate")
         content = response.choices[0].message.content
         
         return self._parse_evaluation_result(content)
@@ -225,7 +225,7 @@ class QualityEvaluator:
             }
         ]
         
-        response = await self.ai_client._make_request_with_retry(messages, temperature=0.3)
+        response = await self.ai_client._make_request_with_retry(messages, temperature=0.3, call_site="evaluate")
         content = response.choices[0].message.content
         
         result = self._parse_evaluation_result(content)
@@ -312,7 +312,7 @@ class QualityEvaluator:
         ]
         
         try:
-            response = await self.ai_client._make_request_with_retry(messages, temperature=0.3)
+            response = await self.ai_client._make_request_with_retry(messages, temperature=0.3, call_site="criterion")
             content = response.choices[0].message.content
             result = self._parse_evaluation_result(content)
             
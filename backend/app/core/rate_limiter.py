@@ -0,0 +1,101 @@
+"""
+速率限制模块
+基于令牌桶按每分钟请求数（RPM）和每分钟Token数（TPM）控制提交节奏
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    令牌按 rate_per_minute 匀速补充，最多累积 burst 个；等待者按先来先到获取。
+    单次申请超过桶容量时按桶容量处理，避免永远等不到。
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if rate_per_minute <= 0:
+            raise ValueError("速率必须大于0")
+        self.rate = rate_per_minute / 60.0
+        # 默认允许10秒的突发量
+        self.capacity = burst if burst is not None else max(1.0, rate_per_minute / 6)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = asyncio.Lock()
+        self.total_wait_time = 0.0
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    @property
+    def available(self) -> float:
+        """当前可用令牌数（欠账时为负）"""
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """获取令牌，返回等待时间（秒）"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                delay = (amount - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= amount
+        self.total_wait_time += waited
+        return waited
+
+    def adjust(self, amount: float) -> None:
+        """按实际用量修正：正数退还令牌，负数追加扣除（可欠账）"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """组合RPM和TPM两个令牌桶，值为None或0表示不限制"""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, requests: int = 1, tokens: int = 0) -> float:
+        """获取请求和Token配额，返回总等待时间（秒）"""
+        waited = 0.0
+        if self.requests is not None:
+            waited += await self.requests.acquire(requests)
+        if self.tokens is not None and tokens:
+            waited += await self.tokens.acquire(tokens)
+        return waited
+
+    def refund(self, requests: int = 0, tokens: int = 0) -> None:
+        """退还未实际使用的配额（例如命中缓存）"""
+        if self.requests is not None and requests:
+            self.requests.adjust(requests)
+        if self.tokens is not None and tokens:
+            self.tokens.adjust(tokens)
+
+    def get_stats(self) -> Dict[str, Optional[float]]:
+        """获取限速统计"""
+        return {
+            "requests_available": self.requests.available if self.requests else None,
+            "tokens_available": self.tokens.available if self.tokens else None,
+            "requests_wait_time": self.requests.total_wait_time if self.requests else 0.0,
+            "tokens_wait_time": self.tokens.total_wait_time if self.tokens else 0.0
+        }
@@ -0,0 +1,192 @@
+"""
+响应缓存模块
+按规范化提示词、模型、优化类型和模板版本精确匹配缓存AI调用结果
+"""
+import hashlib
+import json
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import settings
+
+
+class CacheBackend(ABC):
+    """缓存后端基类"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """读取缓存值"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        """写入缓存值"""
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取后端统计"""
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """进程内LRU缓存后端，按条目数和总字节数限制容量"""
+
+    def __init__(self, max_entries: int = 2000, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.total_bytes += len(value)
+
+        # 超出容量时淘汰最久未使用的条目
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        """删除条目并更新字节统计"""
+        _, value = self._entries.pop(key)
+        self.total_bytes -= len(value)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "evictions": self.evictions
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis缓存后端
+
+    过期由Redis的EX参数控制，容量上限和LRU淘汰依赖服务端的
+    maxmemory / maxmemory-policy=allkeys-lru 配置。
+    """
+
+    def __init__(self, client: Any = None, url: Optional[str] = None, prefix: str = "prompt-optimizer:cache:"):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("使用Redis缓存需要安装redis依赖: pip install redis") from e
+            client = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+
+class ResponseCache:
+    """AI响应缓存"""
+
+    def __init__(self, backend: CacheBackend, ttl: int = 3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """规范化提示词：统一全半角字符并合并空白"""
+        return " ".join(unicodedata.normalize("NFKC", prompt).split())
+
+    def make_key(
+        self,
+        kind: str,
+        prompt: str,
+        model: str,
+        optimization_type: str = "",
+        template_version: str = ""
+    ) -> str:
+        """生成缓存键"""
+        parts = [kind, model, str(optimization_type), template_version, self.normalize_prompt(prompt)]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，后端异常按未命中处理"""
+        try:
+            value = await self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """写入缓存，后端异常不影响调用方"""
+        try:
+            await self.backend.set(key, json.dumps(value, ensure_ascii=False), self.ttl)
+        except Exception:
+            self.errors += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            **self.backend.get_stats()
+        }
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """根据配置创建响应缓存，RESPONSE_CACHE_BACKEND=none 时禁用"""
+    backend_name = settings.RESPONSE_CACHE_BACKEND.lower()
+
+    if backend_name == "none":
+        return None
+    if backend_name == "redis":
+        backend: CacheBackend = RedisCacheBackend(url=settings.REDIS_URL)
+    elif backend_name == "memory":
+        backend = MemoryCacheBackend(
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES
+        )
+    else:
+        raise ValueError(f"不支持的缓存后端: {settings.RESPONSE_CACHE_BACKEND}")
+
+    return ResponseCache(backend, ttl=settings.RESPONSE_CACHE_TTL)
@@ -0,0 +1,271 @@
+"""
+优化结果解析模块
+按块增量解析模型返回的"优化后的提示词 / 改进说明"文本，流式和非流式路径共用
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# 章节标题及其常见变体
+PROMPT_HEADERS = ("优化后的提示词", "优化后提示词", "优化提示词")
+IMPROVEMENT_HEADERS = ("改进说明", "改进点", "优化说明")
+
+DEFAULT_IMPROVEMENTS = [
+    {"type": "整体优化", "description": "提升了提示词的清晰度和可执行性"}
+]
+
+_DECORATION_CHARS = " \t#*_>【】[]"
+_DECORATION = r"[\s#*_>【】\[\]]*"
+_NUMBERING = r"(?:[0-9一二三四五六七八九十]+[.、)）]\s*)?"
+
+# 标题行：可选的markdown修饰和编号、不超过8个字的引导语、标题词、可选的冒号及同行内容
+HEADER_PATTERN = re.compile(
+    rf"^{_DECORATION}{_NUMBERING}(?P<lead>[^\n:：]{{0,8}}?)"
+    rf"(?P<name>{'|'.join(PROMPT_HEADERS + IMPROVEMENT_HEADERS)})"
+    rf"{_DECORATION}(?:[:：]{_DECORATION}(?P<rest>.*))?$"
+)
+
+# 列表项：任意数字编号、中文编号、括号编号或项目符号
+ITEM_PATTERN = re.compile(
+    r"^(?P<indent>\s*)(?:\d+(?:[.、)）](?!\d))|[(（]\d+[)）]|[一二三四五六七八九十]+、|[-•·]|[*+](?=\s))\s*(?P<body>.*)$"
+)
+
+_COLON_PATTERN = re.compile(r"[:：]")
+_WORD_PATTERN = re.compile(r"\w")
+
+# 未完成的行在去除修饰后达到此长度且不含标题词时，才能确定不是标题
+_HEADER_DECIDE_LENGTH = 24
+
+
+def parse_improvement(text: str) -> Dict[str, str]:
+    """将列表项正文解析为改进说明，"类型：描述" 形式拆分为两部分"""
+    parts = _COLON_PATTERN.split(text, 1)
+    if len(parts) == 2 and parts[0].strip(" *_"):
+        return {"type": parts[0].strip(" *_"), "description": parts[1].strip(" *_")}
+    return {"type": "改进", "description": text.strip(" *_")}
+
+
+def match_header(line: str) -> Optional[Tuple[str, str]]:
+    """识别章节标题，返回 (章节, 同行内容)"""
+    # 绝大多数行不含标题词，先用子串检查跳过完整匹配
+    if "优化" not in line and "改进" not in line:
+        return None
+    match = HEADER_PATTERN.match(line)
+    if match is None:
+        return None
+    section = "prompt" if match.group("name") in PROMPT_HEADERS else "improvements"
+    return section, (match.group("rest") or "").strip(" *_")
+
+
+def _may_become_header(head: str) -> bool:
+    """未完成的行是否仍可能是标题"""
+    stripped = head.lstrip(_DECORATION_CHARS)
+    for name in PROMPT_HEADERS + IMPROVEMENT_HEADERS:
+        index = stripped.find(name, 0, _HEADER_DECIDE_LENGTH)
+        if index != -1:
+            # 标题词之后只能是修饰符或冒号
+            after = stripped[index + len(name):].lstrip(_DECORATION_CHARS)
+            if not after or after[0] in ":：":
+                return True
+    return len(stripped) < _HEADER_DECIDE_LENGTH
+
+
+class IncrementalResultParser:
+    """
+    增量优化结果解析器
+
+    feed() 接收模型输出片段，返回可以立即推送的事件：
+    ("delta", 文本)         优化后提示词的新增内容，拼接后即完整提示词；
+    ("prompt", 文本)        提示词部分结束时的完整内容；
+    ("improvement", {...})  一条完整的改进说明（下一条开始或输入结束时产出）。
+    finish() 在输入结束时返回剩余事件，close() 返回最终的
+    (优化后提示词, 改进说明列表)，以此为准。
+    """
+
+    def __init__(self):
+        self.section: Optional[str] = None
+        self.prompt_lines: List[str] = []
+        self.improvements: List[Dict[str, str]] = []
+        self.prompt_done = False
+
+        self._raw: List[str] = []
+        # 当前未完成行的片段
+        self._line_parts: List[str] = []
+        # 当前行已确定为提示词内容（可以边收边推）
+        self._line_streaming = False
+        # 当前行已推送的内容和暂缓推送的行尾空白
+        self._line_streamed: List[str] = []
+        self._held_space = ""
+        self._blank_before = False
+
+        # 正在累积的改进说明：(缩进, 正文片段)
+        self._item: Optional[Tuple[int, List[str]]] = None
+        self._finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        """输入一段模型输出"""
+        self._raw.append(chunk)
+        events: List[Tuple[str, object]] = []
+
+        start = 0
+        while True:
+            newline = chunk.find("\n", start)
+            if newline == -1:
+                self._feed_partial(chunk[start:], events)
+                break
+            self._line_parts.append(chunk[start:newline])
+            self._finish_line(events)
+            start = newline + 1
+
+        return events
+
+    def finish(self) -> List[Tuple[str, object]]:
+        """输入结束，处理最后一行并返回剩余事件"""
+        events: List[Tuple[str, object]] = []
+        if self._finished:
+            return events
+        self._finished = True
+        if self._line_parts or self._line_streaming:
+            self._finish_line(events)
+        self._flush_item(events)
+        self._end_prompt(events)
+        return events
+
+    def close(self) -> Tuple[str, List[Dict[str, str]]]:
+        """返回最终解析结果"""
+        self.finish()
+
+        optimized_prompt = "\n".join(self.prompt_lines)
+        # 如果解析失败，使用整个内容作为优化结果
+        if not optimized_prompt:
+            optimized_prompt = "".join(self._raw).strip()
+
+        return optimized_prompt, list(self.improvements) or [dict(item) for item in DEFAULT_IMPROVEMENTS]
+
+    @property
+    def _collecting_prompt(self) -> bool:
+        return self.section == "prompt" and not self.prompt_done
+
+    def _feed_partial(self, text: str, events: List[Tuple[str, object]]) -> None:
+        """处理未以换行结尾的片段，能确定属于提示词时立即推送"""
+        if not text:
+            return
+        self._line_parts.append(text)
+        if not self._collecting_prompt:
+            return
+
+        if not self._line_streaming:
+            head = "".join(self._line_parts)
+            self._line_parts = [head]
+            if not head.strip() or _may_become_header(head):
+                return
+            self._line_streaming = True
+            self._line_parts = []
+            self._emit_line_start(events)
+            text = head
+
+        self._line_parts = []
+        self._stream_text(text, events)
+
+    def _stream_text(self, text: str, events: List[Tuple[str, object]]) -> None:
+        """推送当前行的新增内容，行尾空白暂缓到确认后推送"""
+        body = text.rstrip()
+        if body:
+            chunk = self._held_space + body
+            events.append(("delta", chunk))
+            self._line_streamed.append(chunk)
+            self._held_space = text[len(body):]
+        else:
+            self._held_space += text
+
+    def _emit_line_start(self, events: List[Tuple[str, object]]) -> None:
+        """新的提示词行开始时补上换行，保留段落间的空行"""
+        if self.prompt_lines:
+            if self._blank_before:
+                self.prompt_lines.append("")
+                events.append(("delta", "\n"))
+            events.append(("delta", "\n"))
+        self._blank_before = False
+
+    def _finish_line(self, events: List[Tuple[str, object]]) -> None:
+        """处理一整行"""
+        line = "".join(self._line_parts)
+        self._line_parts = []
+
+        if self._line_streaming:
+            # 已按提示词内容推送，补齐剩余部分
+            self._line_streaming = False
+            self._stream_text(line, events)
+            self.prompt_lines.append("".join(self._line_streamed).rstrip())
+            self._line_streamed = []
+            self._held_space = ""
+            return
+
+        self._process_line(line, events)
+
+    def _process_line(self, line: str, events: List[Tuple[str, object]]) -> None:
+        """按当前章节处理一个完整行"""
+        header = match_header(line)
+        if header is not None:
+            section, rest = header
+            self._flush_item(events)
+            if section == "improvements":
+                self._end_prompt(events)
+            self.section = section
+            if section == "prompt" and not self.prompt_done:
+                self.prompt_lines = []
+                self._blank_before = False
+            if rest:
+                self._process_line(rest, events)
+            return
+
+        if self._collecting_prompt:
+            content = line.rstrip()
+            if not content.strip():
+                self._blank_before = bool(self.prompt_lines)
+                return
+            self._emit_line_start(events)
+            events.append(("delta", content))
+            self.prompt_lines.append(content)
+        elif self.section == "improvements":
+            self._process_improvement_line(line, events)
+
+    def _process_improvement_line(self, line: str, events: List[Tuple[str, object]]) -> None:
+        """处理改进说明章节中的一行"""
+        match = ITEM_PATTERN.match(line)
+        if match is not None:
+            indent = len(match.group("indent").expandtabs(4))
+            # 缩进更深的子项并入当前改进说明
+            if self._item is not None and indent > self._item[0]:
+                self._item[1].append(match.group("body").strip())
+                return
+            self._flush_item(events)
+            self._item = (indent, [match.group("body").strip()])
+        elif line.strip() and self._item is not None and line[:1].isspace():
+            # 缩进的续行
+            self._item[1].append(line.strip())
+
+    def _flush_item(self, events: List[Tuple[str, object]]) -> None:
+        """产出正在累积的改进说明"""
+        if self._item is None:
+            return
+        text = " ".join(part for part in self._item[1] if part)
+        self._item = None
+        # 跳过分隔线等没有实际内容的项
+        if _WORD_PATTERN.search(text):
+            improvement = parse_improvement(text)
+            self.improvements.append(improvement)
+            events.append(("improvement", improvement))
+
+    def _end_prompt(self, events: List[Tuple[str, object]]) -> None:
+        """提示词部分结束"""
+        if self.section == "prompt" and not self.prompt_done and self.prompt_lines:
+            self.prompt_done = True
+            events.append(("prompt", "\n".join(self.prompt_lines)))
+
+
+def parse_optimization_result(content: str) -> Tuple[str, List[Dict[str, str]]]:
+    """一次性解析完整的优化结果文本"""
+    parser = IncrementalResultParser()
+    parser.feed(content)
+    return parser.close()
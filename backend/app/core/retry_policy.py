@@ -0,0 +1,143 @@
+"""
+重试策略模块
+按错误类型决定是否重试，遵循上游返回的 Retry-After，退避时间使用去相关抖动（decorrelated jitter）
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import openai
+
+from ..utils.exceptions import CircuitOpenException
+
+# 错误类别
+RATE_LIMIT = "rate_limit"    # 429，上游要求降速
+SERVER = "server"            # 5xx
+TIMEOUT = "timeout"          # 请求超时
+CONNECTION = "connection"    # 连接失败
+CLIENT = "client"            # 400/401/403/404/422 等，重试也不会成功
+CIRCUIT_OPEN = "circuit_open"  # 本地熔断，未请求上游
+UNKNOWN = "unknown"          # 非API错误（解析、编程错误等）
+
+# 可以重试的错误类别
+RETRYABLE = frozenset({RATE_LIMIT, SERVER, TIMEOUT, CONNECTION})
+# 说明上游不可用、计入熔断的错误类别；429说明上游正常工作，只是需要降速
+BREAKER_FAILURES = frozenset({SERVER, TIMEOUT, CONNECTION})
+
+# 虽是4xx但属于瞬时问题的状态码
+_RETRYABLE_STATUS = {408, 409}
+
+
+def classify_error(error: BaseException) -> str:
+    """将模型请求异常归类"""
+    if isinstance(error, CircuitOpenException):
+        return CIRCUIT_OPEN
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMIT
+    if isinstance(error, openai.APITimeoutError):
+        return TIMEOUT
+    if isinstance(error, openai.APIConnectionError):
+        return CONNECTION
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code >= 500:
+            return SERVER
+        if error.status_code in _RETRYABLE_STATUS:
+            return TIMEOUT if error.status_code == 408 else SERVER
+        return CLIENT
+    if isinstance(error, asyncio.TimeoutError):
+        return TIMEOUT
+    return UNKNOWN
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    是否为稍后重试可能成功的错误（熔断、429、5xx、超时、连接失败）
+
+    沿 __cause__ 查找，AIClient 重试耗尽后抛出的 AIServiceException 以上游异常为原因。
+    """
+    while error is not None:
+        category = classify_error(error)
+        if category in RETRYABLE or category == CIRCUIT_OPEN:
+            return True
+        error = error.__cause__
+    return False
+
+
+def transient_retry_after(error: BaseException) -> Optional[float]:
+    """沿异常链查找上游或熔断器建议的等待时间（秒）"""
+    while error is not None:
+        if isinstance(error, CircuitOpenException):
+            return error.details.get("retry_after")
+        retry_after = parse_retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        error = error.__cause__
+    return None
+
+
+def parse_retry_after(error: BaseException) -> Optional[float]:
+    """
+    从错误响应头读取建议的等待时间（秒）
+
+    支持 retry-after-ms、retry-after 的秒数和HTTP日期两种格式，没有或无法解析时返回None。
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    重试退避策略
+
+    每次等待时间在 [base_delay, 上次等待 * 3] 之间随机取值，并以 max_delay 为上限。
+    相比固定的指数退避，同时失败的请求不会在同一时刻一起重试。
+    上游给出 Retry-After 时按其等待；要求的等待超过 max_delay 时不再重试，尽快失败。
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        rng: Optional[random.Random] = None
+    ):
+        if base_delay < 0 or max_delay < base_delay:
+            raise ValueError("退避时间配置无效")
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def next_delay(self, previous: Optional[float] = None, retry_after: Optional[float] = None) -> Optional[float]:
+        """计算下一次重试前的等待时间，返回None表示不应再重试"""
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        upper = max(self.base_delay, (previous or self.base_delay) * 3)
+        return min(self.max_delay, self.rng.uniform(self.base_delay, upper))
+
+    def delay_for(self, error: BaseException, category: str, previous: Optional[float] = None) -> Optional[float]:
+        """根据错误决定等待时间，不可重试的错误返回None"""
+        if category not in RETRYABLE:
+            return None
+        return self.next_delay(previous, parse_retry_after(error))
@@ -0,0 +1,252 @@
+"""
+语义近似缓存模块
+使用本地计算的字符n-gram哈希向量查找近似重复的提示词，命中时直接复用历史优化结果
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+
+
+# 向量化前去除空白和标点，使仅在这些字符上不同的提示词得到相同向量
+_NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+# n-gram滚动哈希使用的乘数
+_HASH_MULTIPLIER = np.uint64(1000003)
+
+
+class SemanticCache:
+    """基于余弦相似度的近似重复缓存"""
+
+    def __init__(
+        self,
+        dim: int = 1024,
+        threshold: float = 0.95,
+        max_entries: int = 5000,
+        ttl: int = 7 * 24 * 3600,
+        path: Optional[str] = None,
+        flush_every: int = 50,
+        ngram_sizes: Tuple[int, ...] = (2, 3)
+    ):
+        if max_entries < 1:
+            raise ValueError("语义缓存容量必须大于0")
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.flush_every = flush_every
+        self.ngram_sizes = ngram_sizes
+
+        # 预分配的向量矩阵，前 size 行有效
+        self.size = 0
+        self.vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self.namespace_ids = np.zeros(max_entries, dtype=np.int32)
+        self.created_at = np.zeros(max_entries, dtype=np.float64)
+        self.last_access = np.zeros(max_entries, dtype=np.float64)
+        self.payloads: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self.namespaces: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saves = 0
+        self._pending_writes = 0
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def embed(self, text: str) -> np.ndarray:
+        """计算文本的n-gram哈希向量（L2归一化）"""
+        normalized = _NON_WORD_PATTERN.sub("", unicodedata.normalize("NFKC", text).lower())
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        vector = np.zeros(self.dim, dtype=np.float32)
+
+        for n in self.ngram_sizes:
+            if len(codes) < n:
+                continue
+            # 向量化计算所有n-gram的滚动哈希
+            hashes = codes[: len(codes) - n + 1].copy()
+            for offset in range(1, n):
+                hashes = hashes * _HASH_MULTIPLIER + codes[offset: len(codes) - n + 1 + offset]
+            hashes ^= hashes >> np.uint64(29)
+            buckets = (hashes % np.uint64(self.dim)).astype(np.int64)
+            signs = np.where((hashes >> np.uint64(40)) & np.uint64(1), 1.0, -1.0)
+            vector += np.bincount(buckets, weights=signs, minlength=self.dim).astype(np.float32)
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _namespace_id(self, namespace: str) -> int:
+        """获取命名空间编号"""
+        if namespace not in self.namespaces:
+            self.namespaces[namespace] = len(self.namespaces) + 1
+        return self.namespaces[namespace]
+
+    def lookup(self, namespace: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """查找相似度超过阈值的缓存结果"""
+        namespace_id = self.namespaces.get(namespace)
+        if namespace_id is None or self.size == 0:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        query = self.embed(prompt)
+        similarities = self.vectors[: self.size] @ query
+        invalid = (self.namespace_ids[: self.size] != namespace_id) | (
+            self.created_at[: self.size] + self.ttl <= now
+        )
+        similarities[invalid] = -1.0
+
+        index = int(np.argmax(similarities))
+        if similarities[index] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.last_access[index] = now
+        return dict(self.payloads[index])
+
+    def put(self, namespace: str, prompt: str, payload: Dict[str, Any]) -> None:
+        """写入缓存，容量已满时淘汰过期或最久未使用的条目"""
+        now = time.time()
+        if self.size >= self.max_entries:
+            self._purge_expired(now)
+        if self.size >= self.max_entries:
+            self._remove(int(np.argmin(self.last_access[: self.size])))
+            self.evictions += 1
+
+        index = self.size
+        self.vectors[index] = self.embed(prompt)
+        self.namespace_ids[index] = self._namespace_id(namespace)
+        self.created_at[index] = now
+        self.last_access[index] = now
+        self.payloads[index] = payload
+        self.size += 1
+        self._pending_writes += 1
+
+    def _remove(self, index: int) -> None:
+        """用最后一行覆盖被删除的行，保持矩阵紧凑"""
+        last = self.size - 1
+        if index != last:
+            self.vectors[index] = self.vectors[last]
+            self.namespace_ids[index] = self.namespace_ids[last]
+            self.created_at[index] = self.created_at[last]
+            self.last_access[index] = self.last_access[last]
+            self.payloads[index] = self.payloads[last]
+        self.payloads[last] = None
+        self.size -= 1
+
+    def _purge_expired(self, now: float) -> None:
+        """清理过期条目"""
+        expired = np.nonzero(self.created_at[: self.size] + self.ttl <= now)[0]
+        for index in sorted(expired.tolist(), reverse=True):
+            self._remove(index)
+
+    @property
+    def needs_flush(self) -> bool:
+        """是否累积了足够多的未持久化写入"""
+        return bool(self.path) and self._pending_writes >= self.flush_every
+
+    def _snapshot(self) -> Dict[str, np.ndarray]:
+        """复制当前索引状态，供后台线程写盘"""
+        return {
+            "vectors": self.vectors[: self.size].copy(),
+            "namespace_ids": self.namespace_ids[: self.size].copy(),
+            "created_at": self.created_at[: self.size].copy(),
+            "last_access": self.last_access[: self.size].copy(),
+            "payloads": np.array(json.dumps(self.payloads[: self.size], ensure_ascii=False)),
+            "namespaces": np.array(json.dumps(self.namespaces, ensure_ascii=False)),
+            "dim": np.array(self.dim)
+        }
+
+    @staticmethod
+    def _write(path: str, snapshot: Dict[str, np.ndarray]) -> None:
+        """原子写入索引文件"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **snapshot)
+        os.replace(tmp_path, path)
+
+    def save(self) -> None:
+        """同步保存索引"""
+        if not self.path:
+            return
+        self._write(self.path, self._snapshot())
+        self._pending_writes = 0
+        self.saves += 1
+
+    async def flush(self) -> None:
+        """在后台线程中保存索引，不阻塞事件循环"""
+        if not self.path or self._pending_writes == 0:
+            return
+        snapshot = self._snapshot()
+        self._pending_writes = 0
+        await asyncio.to_thread(self._write, self.path, snapshot)
+        self.saves += 1
+
+    def load(self, path: str) -> None:
+        """从文件加载索引，文件损坏或维度不一致时忽略"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["dim"]) != self.dim:
+                    return
+                vectors = data["vectors"]
+                namespace_ids = data["namespace_ids"]
+                created_at = data["created_at"]
+                last_access = data["last_access"]
+                payloads = json.loads(str(data["payloads"]))
+                namespaces = json.loads(str(data["namespaces"]))
+        except Exception:
+            return
+
+        # 超出容量时保留最近使用的条目
+        keep = np.argsort(-last_access)[: self.max_entries]
+        count = len(keep)
+        self.vectors[:count] = vectors[keep]
+        self.namespace_ids[:count] = namespace_ids[keep]
+        self.created_at[:count] = created_at[keep]
+        self.last_access[:count] = last_access[keep]
+        for position, index in enumerate(keep.tolist()):
+            self.payloads[position] = payloads[index]
+        self.namespaces = namespaces
+        self.size = count
+        self._purge_expired(time.time())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "saves": self.saves
+        }
+
+
+def create_semantic_cache() -> Optional[SemanticCache]:
+    """根据配置创建语义缓存，未启用或容量为0时返回None"""
+    if not settings.SEMANTIC_CACHE_ENABLED or settings.SEMANTIC_CACHE_MAX_ENTRIES <= 0:
+        return None
+
+    return SemanticCache(
+        dim=settings.SEMANTIC_CACHE_DIM,
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl=settings.SEMANTIC_CACHE_TTL,
+        path=settings.SEMANTIC_CACHE_PATH or None,
+        flush_every=settings.SEMANTIC_CACHE_FLUSH_EVERY
+    )
@@ -0,0 +1,77 @@
+"""
+单飞请求合并模块
+相同键的并发调用只执行一次，其余调用方等待同一个结果
+"""
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Flight:
+    """一次进行中的调用"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """进程内的请求合并器"""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行或加入相同键的调用
+
+        返回 (结果, 是否复用了其他调用方的结果)。复用的结果是深拷贝，
+        调用方可以自由修改。异常会传递给所有等待者；只有当所有等待者
+        都取消时才取消底层调用，单个调用方断开不影响其他人。
+        """
+        self.calls += 1
+        flight = self._flights.get(key)
+        shared = flight is not None
+
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            self.executions += 1
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.collapsed += 1
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self.cancelled += 1
+
+        return (copy.deepcopy(result) if shared else result), shared
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        """调用结束后移除记录，之后的调用重新执行"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    @property
+    def in_flight(self) -> int:
+        """进行中的调用数量"""
+        return len(self._flights)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "cancelled": self.cancelled,
+            "in_flight": self.in_flight
+        }
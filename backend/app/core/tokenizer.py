@@ -0,0 +1,196 @@
+"""
+Token计数模块
+进程内共享的tiktoken编码器，启动时加载一次，不依赖AI客户端；重复文本的计数结果缓存复用
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import tiktoken
+
+from ..config import settings
+
+
+# 超过此长度的文本不缓存计数结果，避免缓存持有大量长文本
+MAX_CACHED_TEXT_LENGTH = 8192
+
+# 批量编码时少于此数量的未命中文本逐条编码，避免线程池开销
+_BATCH_THRESHOLD = 8
+
+
+def encoding_name_for_model(model: str) -> str:
+    """模型对应的编码名称，tiktoken不认识的模型（如qwen）使用通用编码"""
+    try:
+        return tiktoken.encoding_for_model(model).name
+    except Exception:
+        return "cl100k_base"
+
+
+def estimate_tokens(text: str) -> int:
+    """编码器不可用时的估算：汉字按1个token计，其余约4个字符计1个token"""
+    if text.isascii():
+        return len(text) // 4
+    cjk = sum(1 for char in text if "\u4e00" <= char <= "\u9fff")
+    return cjk + (len(text) - cjk) // 4
+
+
+class TokenCounter:
+    """
+    Token计数服务
+
+    编码器在第一次使用（或启动时调用 load()）时加载一次；加载失败后使用
+    estimate_tokens 估算，不会在每次计数时重试，可以再次调用 load() 重新加载。
+    也可以直接传入编码器对象（需提供 encode 方法），用于测试或离线估算。
+    """
+
+    def __init__(
+        self,
+        encoding_name: Optional[str] = None,
+        encoding: Any = None,
+        cache_size: int = 4096
+    ):
+        self.encoding_name = encoding_name or getattr(encoding, "name", None) or "cl100k_base"
+        self.cache_size = cache_size
+        self.load_error: Optional[str] = None
+        self._encoding = encoding
+        self._injected = encoding is not None
+        self._loaded = encoding is not None
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.estimated = 0
+
+    def __reduce__(self):
+        """跨进程传递时只携带配置（编码名称、缓存大小和直接传入的编码器），子进程按同样方式重新构建"""
+        encoding = self._encoding if self._injected else None
+        return TokenCounter, (self.encoding_name, encoding, self.cache_size)
+
+    def load(self) -> bool:
+        """加载编码器，返回是否可用（首次加载可能需要下载编码文件）"""
+        with self._load_lock:
+            self._load()
+        return self._encoding is not None
+
+    def _load(self) -> None:
+        try:
+            self._encoding = tiktoken.get_encoding(self.encoding_name)
+            self.load_error = None
+        except Exception as e:
+            self._encoding = None
+            self.load_error = str(e)
+        self._loaded = True
+        self.clear()
+
+    @property
+    def available(self) -> bool:
+        """编码器是否可用（否则为估算值）"""
+        return self._ensure_loaded() is not None
+
+    def _ensure_loaded(self) -> Any:
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._load()
+        return self._encoding
+
+    def _encode_count(self, encoding: Any, text: str) -> int:
+        # 用户文本中的特殊标记按普通文本计数
+        encode = getattr(encoding, "encode_ordinary", None) or encoding.encode
+        return len(encode(text))
+
+    def _remember(self, text: str, count: int) -> None:
+        if len(text) > MAX_CACHED_TEXT_LENGTH or self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[text] = count
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, text: str) -> Optional[int]:
+        with self._cache_lock:
+            count = self._cache.get(text)
+            if count is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+            return count
+
+    def count(self, text: str) -> int:
+        """计算单个文本的token数"""
+        if not text:
+            return 0
+        count = self._lookup(text)
+        if count is not None:
+            return count
+
+        self.misses += 1
+        encoding = self._ensure_loaded()
+        if encoding is None:
+            self.estimated += 1
+            count = estimate_tokens(text)
+        else:
+            count = self._encode_count(encoding, text)
+        self._remember(text, count)
+        return count
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        """批量计算token数，结果与输入顺序一致；未缓存的文本去重后批量编码"""
+        texts = list(texts)
+        counts: List[Optional[int]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        for index, text in enumerate(texts):
+            if not text:
+                counts[index] = 0
+                continue
+            count = self._lookup(text)
+            if count is not None:
+                counts[index] = count
+            else:
+                pending.setdefault(text, []).append(index)
+
+        if pending:
+            missing = list(pending)
+            self.misses += len(missing)
+            encoding = self._ensure_loaded()
+            if encoding is None:
+                self.estimated += len(missing)
+                results = [estimate_tokens(text) for text in missing]
+            elif len(missing) >= _BATCH_THRESHOLD and hasattr(encoding, "encode_ordinary_batch"):
+                results = [len(tokens) for tokens in encoding.encode_ordinary_batch(missing)]
+            else:
+                results = [self._encode_count(encoding, text) for text in missing]
+
+            for text, count in zip(missing, results):
+                self._remember(text, count)
+                for index in pending[text]:
+                    counts[index] = count
+
+        return counts
+
+    def clear(self) -> None:
+        """清空计数缓存"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取计数统计"""
+        lookups = self.hits + self.misses
+        return {
+            "encoding": self.encoding_name,
+            "loaded": self._loaded,
+            "available": self._encoding is not None,
+            "load_error": self.load_error,
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "estimated": self.estimated
+        }
+
+
+# 全局Token计数实例
+token_counter = TokenCounter(
+    settings.TOKENIZER_ENCODING or encoding_name_for_model(settings.OPENAI_MODEL),
+    cache_size=settings.TOKEN_COUNT_CACHE_SIZE
+)
@@ -2,13 +2,31 @@
 FastAPI主应用
 """
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 from app.api.v1.router import api_router
 from app.config import settings
-from app.database import create_tables
+from app.database import create_tables, engine
+from app.core.ai_client import ai_client
+from app.core.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    EventLoopLagMonitor,
+    MetricsMiddleware,
+    instrument_engine,
+    register_ai_client_metrics,
+    registry as metrics_registry
+)
+from app.core.password_hasher import password_hasher
+from app.core.tokenizer import token_counter
+from app.services.batch_job_service import batch_job_worker
+from app.services.login_history_buffer import login_history_buffer
+
+event_loop_lag_monitor = EventLoopLagMonitor(settings.EVENT_LOOP_LAG_INTERVAL)
 
 
 @asynccontextmanager
@@ -21,9 +39,34 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     await create_tables()
     print("✅ 数据库表创建完成")
     
+    # 加载Token编码器（首次可能需要下载编码文件），失败时使用估算值
+    if await asyncio.to_thread(token_counter.load):
+        print(f"✅ Token编码器已加载（{token_counter.encoding_name}）")
+    else:
+        print(f"⚠️ Token编码器加载失败，Token数将使用估算值: {token_counter.load_error}")
+    
+    # 启动批量优化任务worker，继续处理上次未完成的任务项
+    if settings.BATCH_JOB_WORKER_ENABLED:
+        await batch_job_worker.start()
+        print(f"✅ 批量任务worker已启动（恢复 {batch_job_worker.recovered} 个中断的任务项）")
+    
+    # 启动登录历史写缓冲
+    if settings.LOGIN_HISTORY_BUFFER_ENABLED:
+        await login_history_buffer.start()
+        print("✅ 登录历史写缓冲已启动")
+    
+    # 采样事件循环延迟
+    if settings.METRICS_ENABLED and settings.EVENT_LOOP_LAG_INTERVAL > 0:
+        event_loop_lag_monitor.start()
+    
     yield
     
     # 关闭时执行
+    await event_loop_lag_monitor.stop()
+    await login_history_buffer.stop()
+    await batch_job_worker.stop()
+    await ai_client.aclose()
+    password_hasher.shutdown()
     print("🛑 AI提示词优化器后端服务已关闭")
 
 
@@ -46,6 +89,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 记录请求耗时、进行中请求数和各接口的数据库耗时
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+    register_ai_client_metrics(ai_client)
+
 # 注册API路由
 app.include_router(api_router, prefix="/api/v1")
 
@@ -67,6 +116,13 @@ async def simple_health_check():
     return {"status": "healthy"}
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["监控"], include_in_schema=False)
+    async def metrics():
+        """Prometheus文本格式的监控指标"""
+        return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -6,6 +6,7 @@
 from .base import BaseModel, TimestampMixin
 from .user import User, LoginHistory
 from .optimization import Optimization, OptimizationImprovement, OptimizationExample, OptimizationTemplate
+from .batch_job import BatchJob, BatchJobItem
 
 __all__ = [
     "BaseModel",
@@ -15,5 +16,7 @@ __all__ = [
     "Optimization",
     "OptimizationImprovement", 
     "OptimizationExample",
-    "OptimizationTemplate"
+    "OptimizationTemplate",
+    "BatchJob",
+    "BatchJobItem"
 ] 
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+批量优化任务相关的数据库模型
+"""
+
+from sqlalchemy import String, Integer, Text, ForeignKey, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+from typing import List, Optional, TYPE_CHECKING
+
+from .base import BaseModel
+
+if TYPE_CHECKING:
+    from .optimization import Optimization
+
+
+class BatchJobStatus:
+    """任务状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+
+class BatchJobItemStatus:
+    """任务项状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class BatchJob(BaseModel):
+    """批量优化任务模型"""
+    __tablename__ = "batch_jobs"
+    
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # 任务参数
+    optimization_type: Mapped[str] = mapped_column(String(50), default="general", nullable=False)
+    optimization_mode: Mapped[str] = mapped_column(String(20), default="standard", nullable=False)
+    
+    # 进度
+    status: Mapped[str] = mapped_column(String(20), default=BatchJobStatus.PENDING, nullable=False)
+    total_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    succeeded_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    # 关系
+    items: Mapped[List["BatchJobItem"]] = relationship(
+        "BatchJobItem", back_populates="job", cascade="all, delete-orphan", lazy="noload"
+    )
+
+
+class BatchJobItem(BaseModel):
+    """批量优化任务项模型，每个提示词一行，持久化处理状态以便重启后继续"""
+    __tablename__ = "batch_job_items"
+    __table_args__ = (
+        # 领取待处理项和按完成顺序分页查询结果
+        Index("ix_batch_job_items_status_id", "status", "id"),
+        Index("ix_batch_job_items_job_finished_seq", "job_id", "finished_seq"),
+    )
+    
+    job_id: Mapped[int] = mapped_column(Integer, ForeignKey("batch_jobs.id"), nullable=False)
+    position: Mapped[int] = mapped_column(Integer, nullable=False)  # 在提交列表中的序号
+    prompt: Mapped[str] = mapped_column(Text, nullable=False)
+    
+    # 处理状态
+    status: Mapped[str] = mapped_column(String(20), default=BatchJobItemStatus.PENDING, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # 重新排队后最早的领取时间
+    claimed_by: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)  # 领取该项的worker
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # 领取租约到期时间
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_seq: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # 在任务内的完成序号，按提交顺序从1递增
+    
+    # 成功时关联生成的优化记录
+    optimization_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("optimizations.id"), nullable=True)
+    
+    # 关系
+    job: Mapped["BatchJob"] = relationship("BatchJob", back_populates="items")
+    optimization: Mapped[Optional["Optimization"]] = relationship("Optimization")
@@ -2,7 +2,7 @@
 提示词优化相关的数据库模型
 """
 
-from sqlalchemy import String, Integer, Float, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import String, Integer, Float, Text, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -17,6 +17,11 @@ if TYPE_CHECKING:
 class Optimization(BaseModel):
     """优化记录模型"""
     __tablename__ = "optimizations"
+    __table_args__ = (
+        # 历史记录按创建时间或评分排序的游标分页
+        Index("ix_optimizations_user_created", "user_id", "created_at", "id"),
+        Index("ix_optimizations_user_quality", "user_id", "quality_score_after", "id"),
+    )
     
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
     
@@ -48,7 +53,7 @@ class OptimizationImprovement(BaseModel):
     """优化改进点模型"""
     __tablename__ = "optimization_improvements"
     
-    optimization_id: Mapped[int] = mapped_column(Integer, ForeignKey("optimizations.id"), nullable=False)
+    optimization_id: Mapped[int] = mapped_column(Integer, ForeignKey("optimizations.id"), nullable=False, index=True)
     
     # 改进信息
     improvement_type: Mapped[str] = mapped_column(String(100), nullable=False)  # 结构性改进、清晰度改进等
@@ -88,16 +88,17 @@ class User(BaseModel):
     )
     
     # 关系映射
+    # 历史数据可能很多，不随用户自动加载；需要时用 selectinload 显式加载或单独分页查询
     optimizations: Mapped[List["Optimization"]] = relationship(
         "Optimization",
         back_populates="user", 
         cascade="all, delete-orphan",
-        lazy="selectin"
+        lazy="raise"
     )
     login_history: Mapped[List["LoginHistory"]] = relationship(
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        lazy="raise"
     )
     
     def __repr__(self) -> str:
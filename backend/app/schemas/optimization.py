@@ -7,6 +7,8 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
 
+from app.config import settings
+
 
 class OptimizationType(str, Enum):
     """优化类型枚举"""
@@ -16,10 +18,24 @@ class OptimizationType(str, Enum):
     ANALYSIS = "analysis"
 
 
+class OptimizationMode(str, Enum):
+    """优化模式枚举"""
+    STANDARD = "standard"  # 分析、优化、再分析三次调用
+    FUSED = "fused"        # 单次结构化调用
+
+
+class EvaluationMode(str, Enum):
+    """评估模式枚举"""
+    LLM = "llm"    # 模型评估
+    FAST = "fast"  # 本地规则评估，不调用模型
+    AUTO = "auto"  # 先本地评估，置信度不足时再调用模型
+
+
 class OptimizationRequest(BaseModel):
     """优化请求"""
     original_prompt: str = Field(..., min_length=1, max_length=10000, description="原始提示词")
     optimization_type: OptimizationType = Field(default=OptimizationType.GENERAL, description="优化类型")
+    optimization_mode: OptimizationMode = Field(default=OptimizationMode.STANDARD, description="优化模式")
     user_context: Optional[str] = Field(None, max_length=1000, description="用户上下文")
     
     @validator('original_prompt')
@@ -32,6 +48,7 @@ class OptimizationRequest(BaseModel):
 class QualityEvaluationRequest(BaseModel):
     """质量评估请求"""
     prompt: str = Field(..., min_length=1, max_length=10000, description="要评估的提示词")
+    mode: EvaluationMode = Field(default=EvaluationMode.LLM, description="评估模式")
     
     @validator('prompt')
     def validate_prompt_content(cls, v):
@@ -44,12 +61,31 @@ class BatchOptimizationRequest(BaseModel):
     """批量优化请求"""
     prompts: List[str] = Field(..., min_items=1, max_items=10, description="提示词列表")
     optimization_type: OptimizationType = Field(default=OptimizationType.GENERAL, description="优化类型")
+    optimization_mode: OptimizationMode = Field(default=OptimizationMode.STANDARD, description="优化模式")
+    
+    @validator('prompts')
+    def validate_prompts(cls, v):
+        for prompt in v:
+            if not prompt.strip():
+                raise ValueError('提示词不能为空')
+        return [prompt.strip() for prompt in v]
+
+
+class BatchJobCreateRequest(BaseModel):
+    """批量优化任务提交请求"""
+    prompts: List[str] = Field(..., min_items=1, description="提示词列表")
+    optimization_type: OptimizationType = Field(default=OptimizationType.GENERAL, description="优化类型")
+    optimization_mode: OptimizationMode = Field(default=OptimizationMode.STANDARD, description="优化模式")
     
     @validator('prompts')
     def validate_prompts(cls, v):
+        if len(v) > settings.BATCH_JOB_MAX_PROMPTS:
+            raise ValueError(f'单个任务最多包含{settings.BATCH_JOB_MAX_PROMPTS}个提示词')
         for prompt in v:
             if not prompt.strip():
                 raise ValueError('提示词不能为空')
+            if len(prompt) > 10000:
+                raise ValueError('提示词长度不能超过10000个字符')
         return [prompt.strip() for prompt in v]
 
 
@@ -100,6 +136,8 @@ class QualityEvaluationResponse(BaseModel):
     issues: List[str] = Field(..., description="问题列表")
     suggestions: List[str] = Field(..., description="建议列表")
     processing_time: float = Field(..., description="处理时间（秒）")
+    source: str = Field(default="llm", description="评估来源：llm 或 heuristic")
+    confidence: Optional[float] = Field(None, description="本地评估的置信度（0-1）")
 
 
 class OptimizationSuggestionResponse(BaseModel):
@@ -107,14 +145,56 @@ class OptimizationSuggestionResponse(BaseModel):
     suggestions: List[str] = Field(..., description="建议列表")
 
 
+class BatchOptimizationFailure(BaseModel):
+    """批量优化中失败的提示词"""
+    index: int = Field(..., description="在提交列表中的序号")
+    original_prompt: str = Field(..., description="原始提示词")
+    error: str = Field(..., description="错误信息")
+
+
 class BatchOptimizationResponse(BaseModel):
     """批量优化响应"""
-    results: List[OptimizationResponse] = Field(..., description="优化结果列表")
+    results: List[OptimizationResponse] = Field(..., description="成功的优化结果列表")
+    failures: List[BatchOptimizationFailure] = Field(default_factory=list, description="失败的提示词")
     total_count: int = Field(..., description="总数")
     success_count: int = Field(..., description="成功数")
+    failed_count: int = Field(0, description="失败数")
     total_processing_time: float = Field(..., description="总处理时间（秒）")
 
 
+class BatchJobResponse(BaseModel):
+    """批量优化任务状态响应"""
+    id: int = Field(..., description="任务ID")
+    status: str = Field(..., description="任务状态：pending / running / completed")
+    optimization_type: str = Field(..., description="优化类型")
+    optimization_mode: str = Field(..., description="优化模式")
+    total_count: int = Field(..., description="总数")
+    succeeded_count: int = Field(..., description="成功数")
+    failed_count: int = Field(..., description="失败数")
+    progress: float = Field(..., ge=0, le=1, description="完成进度")
+    created_at: datetime = Field(..., description="创建时间")
+    started_at: Optional[datetime] = Field(None, description="开始处理时间")
+    finished_at: Optional[datetime] = Field(None, description="完成时间")
+
+
+class BatchJobResultItem(BaseModel):
+    """批量优化任务项结果"""
+    position: int = Field(..., description="在提交列表中的序号")
+    original_prompt: str = Field(..., description="原始提示词")
+    status: str = Field(..., description="状态：succeeded / failed")
+    error: Optional[str] = Field(None, description="失败原因")
+    result: Optional[OptimizationResponse] = Field(None, description="优化结果")
+
+
+class BatchJobResultsResponse(BaseModel):
+    """批量优化任务结果分页响应"""
+    items: List[BatchJobResultItem] = Field(..., description="已完成的任务项（按完成顺序）")
+    total: int = Field(..., description="当前已完成的总数")
+    skip: int = Field(..., description="跳过数量")
+    limit: int = Field(..., description="返回数量")
+    has_more: bool = Field(..., description="是否还有更多已完成的结果")
+
+
 class OptimizationHistoryQuery(BaseModel):
     """历史记录查询参数"""
     skip: int = Field(default=0, ge=0, description="跳过数量")
@@ -7,20 +7,40 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
+from sqlalchemy.orm import load_only, make_transient_to_detached
 from fastapi import HTTPException, status
 from app.models.user import User, LoginHistory
 from app.schemas.auth import UserRegister, UserLogin, Token, UserResponse
+from app.core.password_hasher import password_hasher
 from app.core.security import (
-    verify_password, 
-    get_password_hash, 
     create_access_token, 
     create_refresh_token,
     verify_refresh_token
 )
+from app.core.principal_cache import principal_cache
+from app.services.login_history_buffer import login_history_buffer
 from app.config import settings
 import json
 
 
+# 用户不存在时用于校验的哈希，使其和真实用户的登录耗时一致
+_DUMMY_PASSWORD_HASH = "$2b$12$dwXHip4Mc2IB/ZMmz13pp.KLOaBDmp/puIka1o05HCRNtIlZDIwT."
+
+# 认证依赖加载的用户列，足够构造 UserResponse 和做权限判断
+AUTH_USER_COLUMNS = (
+    User.id,
+    User.username,
+    User.email,
+    User.full_name,
+    User.is_active,
+    User.is_superuser,
+    User.is_admin,
+    User.email_verified,
+    User.created_at,
+    User.updated_at,
+)
+
+
 class AuthService:
     """认证服务类"""
     
@@ -59,7 +79,7 @@ class AuthService:
             )
         
         # 创建新用户
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         db_user = User(
             username=user_data.username,
             email=user_data.email,
@@ -90,7 +110,7 @@ class AuthService:
             用户响应对象
         """
         # 创建新用户
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         db_user = User(
             username=user_data.username,
             email=user_data.email,
@@ -140,25 +160,33 @@ class AuthService:
         result = await self.db.execute(stmt)
         user = result.scalar_one_or_none()
         
-        success = False
-        if user and verify_password(login_data.password, user.hashed_password):
-            if user.is_active:
-                success = True
-                # 更新登录信息
-                user.last_login = datetime.utcnow()
-                user.login_count += 1
-                await self.db.commit()
-        
-        # 记录登录历史
-        if user:
-            login_record = LoginHistory(
-                user_id=user.id,
-                login_time=datetime.utcnow(),
-                ip_address=ip_address,
-                user_agent=user_agent,
-                success=success
-            )
-            self.db.add(login_record)
+        # 用户不存在或已停用时同样完成一次bcrypt校验，响应时间不暴露账号状态
+        if not user:
+            await password_hasher.verify(login_data.password, _DUMMY_PASSWORD_HASH)
+            return None
+        
+        password_ok = await password_hasher.verify(login_data.password, user.hashed_password)
+        success = password_ok and bool(user.is_active)
+        if success:
+            # 更新登录信息
+            user.last_login = datetime.utcnow()
+            user.login_count += 1
+        
+        # 记录登录历史：开启写缓冲时批量异步写入，否则和登录信息在同一事务中提交
+        login_record = dict(
+            user_id=user.id,
+            login_time=datetime.utcnow(),
+            ip_address=ip_address,
+            user_agent=user_agent,
+            success=success
+        )
+        buffered = login_history_buffer.running
+        if buffered:
+            login_history_buffer.add(**login_record)
+        else:
+            self.db.add(LoginHistory(**login_record))
+        
+        if success or not buffered:
             await self.db.commit()
         
         return user if success else None
@@ -230,6 +258,33 @@ class AuthService:
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
     
+    async def get_auth_user(self, user_id: int) -> Optional[User]:
+        """
+        获取认证用的用户对象
+        
+        只加载身份相关的列，密码哈希、偏好设置等其他列在访问时报错而不是隐式查询。
+        同一会话中之后用完整查询获取该用户时，未加载的列会被补齐。
+        命中认证主体缓存时不查询数据库，返回的是不属于任何会话的对象。
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            用户对象或None
+        """
+        snapshot = principal_cache.get(user_id)
+        if snapshot is not None:
+            user = User(**snapshot)
+            make_transient_to_detached(user)
+            return user
+        
+        stmt = select(User).options(load_only(*AUTH_USER_COLUMNS, raiseload=True)).where(User.id == user_id)
+        result = await self.db.execute(stmt)
+        user = result.scalar_one_or_none()
+        if user is not None:
+            principal_cache.put(user_id, {column.key: getattr(user, column.key) for column in AUTH_USER_COLUMNS})
+        return user
+    
     async def get_user_by_username(self, username: str) -> Optional[User]:
         """
         根据用户名获取用户
@@ -300,6 +355,7 @@ class AuthService:
             stmt = update(User).where(User.id == user_id).values(is_active=False)
             result = await self.db.execute(stmt)
             await self.db.commit()
+            principal_cache.invalidate(user_id)
             return result.rowcount > 0
         except Exception:
             await self.db.rollback()
@@ -323,15 +379,16 @@ class AuthService:
             return False
         
         # 验证当前密码
-        if not verify_password(current_password, user.hashed_password):
+        if not await password_hasher.verify(current_password, user.hashed_password):
             return False
         
         # 更新密码
         try:
-            new_hashed_password = get_password_hash(new_password)
+            new_hashed_password = await password_hasher.hash(new_password)
             stmt = update(User).where(User.id == user_id).values(hashed_password=new_hashed_password)
             await self.db.execute(stmt)
             await self.db.commit()
+            principal_cache.invalidate(user_id)
             return True
         except Exception:
             await self.db.rollback()
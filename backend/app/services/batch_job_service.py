@@ -0,0 +1,447 @@
+"""
+批量优化任务服务
+任务和任务项持久化在数据库中，worker按有限并发领取待处理项，重启后从未完成的项继续
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.core.ai_client import AIClient, OptimizationResult, ai_client
+from app.core.retry_policy import is_transient_error, transient_retry_after
+from app.database import async_session_maker
+from app.models.batch_job import BatchJob, BatchJobItem, BatchJobItemStatus, BatchJobStatus
+from app.models.optimization import Optimization
+from app.services.optimization_service import OptimizationService
+
+
+class BatchJobService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create_job(
+        self,
+        user_id: int,
+        prompts: List[str],
+        optimization_type: str = "general",
+        optimization_mode: str = "standard"
+    ) -> BatchJob:
+        """创建任务并批量写入任务项"""
+        job = BatchJob(
+            user_id=user_id,
+            optimization_type=getattr(optimization_type, "value", optimization_type),
+            optimization_mode=getattr(optimization_mode, "value", optimization_mode),
+            status=BatchJobStatus.PENDING,
+            total_count=len(prompts),
+            succeeded_count=0,
+            failed_count=0
+        )
+        self.db.add(job)
+        await self.db.flush()
+        
+        await self.db.execute(
+            insert(BatchJobItem),
+            [
+                {
+                    "job_id": job.id,
+                    "position": position,
+                    "prompt": prompt,
+                    "status": BatchJobItemStatus.PENDING,
+                    "attempts": 0
+                }
+                for position, prompt in enumerate(prompts)
+            ]
+        )
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+    
+    async def get_job(self, job_id: int, user_id: Optional[int] = None) -> Optional[BatchJob]:
+        """根据ID获取任务，指定user_id时只返回该用户的任务"""
+        query = select(BatchJob).where(BatchJob.id == job_id)
+        if user_id is not None:
+            query = query.where(BatchJob.user_id == user_id)
+        result = await self.db.execute(query)
+        return result.scalar_one_or_none()
+    
+    async def get_results(
+        self,
+        job_id: int,
+        skip: int = 0,
+        limit: int = 50,
+        user_id: Optional[int] = None
+    ) -> List[BatchJobItem]:
+        """
+        按完成顺序分页获取已完成的任务项；指定user_id时只查该用户的任务
+        
+        完成序号在任务计数所在的事务中分配，按提交顺序连续递增，已完成的项总是构成 1..n 的前缀，
+        新完成的项只会追加在末尾，跳过前 skip 项即按序号定位。
+        """
+        query = (
+            select(BatchJobItem)
+            .where(BatchJobItem.job_id == job_id, BatchJobItem.finished_seq > skip)
+            .options(selectinload(BatchJobItem.optimization).selectinload(Optimization.improvements))
+            .order_by(BatchJobItem.finished_seq)
+            .limit(limit)
+        )
+        if user_id is not None:
+            query = query.join(BatchJob, BatchJob.id == BatchJobItem.job_id).where(BatchJob.user_id == user_id)
+        result = await self.db.execute(query)
+        return result.scalars().all()
+
+
+class BatchJobWorker:
+    """
+    批量优化任务worker
+    
+    以数据库作为队列：通过一条 UPDATE ... RETURNING 原子地领取待处理项，
+    处理结果与任务计数在同一事务中提交。默认随应用进程启动。
+    
+    领取时记录worker标识和租约到期时间，处理期间定期续约；只有租约过期的 running 项
+    （所属进程已退出）才会被重置或被其他worker重新领取，多个进程同时运行时不会重复处理。
+    
+    上游暂时不可用（熔断、429、5xx、超时）或保存结果失败时，任务项按指数退避重新排队，
+    尝试 max_attempts 次后才标记为失败；其他错误直接标记为失败。
+    """
+    
+    def __init__(
+        self,
+        session_maker: async_sessionmaker = async_session_maker,
+        client: AIClient = ai_client,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        lease_seconds: Optional[float] = None
+    ):
+        self.session_maker = session_maker
+        self.client = client
+        self.concurrency = concurrency or settings.BATCH_JOB_CONCURRENCY
+        self.poll_interval = poll_interval or settings.BATCH_JOB_POLL_INTERVAL
+        self.max_attempts = max_attempts or settings.BATCH_JOB_MAX_ATTEMPTS
+        self.retry_delay = settings.BATCH_JOB_RETRY_DELAY if retry_delay is None else retry_delay
+        self.lease_seconds = lease_seconds or settings.BATCH_JOB_LEASE_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._lease_renewed_at = 0.0
+        
+        self.succeeded = 0
+        self.failed = 0
+        self.recovered = 0
+        self.retried = 0
+    
+    async def start(self) -> None:
+        """恢复中断的任务项并启动worker"""
+        if self._task is not None:
+            return
+        self.recovered += await self.recover()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止worker，处理中的任务项放回队列"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+    
+    def notify(self) -> None:
+        """有新任务提交时唤醒worker"""
+        self._wakeup.set()
+    
+    def _lease_expired(self, now: datetime):
+        """running 且租约已过期（或没有租约）的任务项"""
+        return and_(
+            BatchJobItem.status == BatchJobItemStatus.RUNNING,
+            or_(BatchJobItem.lease_expires_at.is_(None), BatchJobItem.lease_expires_at < now)
+        )
+    
+    def _owned(self):
+        """本worker领取且仍在处理中的任务项"""
+        return and_(BatchJobItem.status == BatchJobItemStatus.RUNNING, BatchJobItem.claimed_by == self.worker_id)
+    
+    async def recover(self) -> int:
+        """将租约已过期的处理中任务项重置为待处理，其他进程仍在处理的项不受影响"""
+        async with self.session_maker() as db:
+            result = await db.execute(
+                update(BatchJobItem)
+                .where(self._lease_expired(datetime.utcnow()))
+                .values(status=BatchJobItemStatus.PENDING, claimed_by=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return result.rowcount or 0
+    
+    async def renew_leases(self) -> int:
+        """为本worker处理中的任务项续约"""
+        async with self.session_maker() as db:
+            result = await db.execute(
+                update(BatchJobItem)
+                .where(self._owned())
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return result.rowcount or 0
+    
+    async def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """原子地领取最多limit个待处理项，租约过期的处理中项也可以被领取"""
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(
+                BatchJobItem.status == BatchJobItemStatus.PENDING,
+                or_(BatchJobItem.next_attempt_at.is_(None), BatchJobItem.next_attempt_at <= now)
+            ),
+            self._lease_expired(now)
+        )
+        async with self.session_maker() as db:
+            pending_ids = (
+                select(BatchJobItem.id)
+                .where(claimable)
+                .order_by(BatchJobItem.id)
+                .limit(limit)
+                .scalar_subquery()
+            )
+            result = await db.execute(
+                update(BatchJobItem)
+                .where(BatchJobItem.id.in_(pending_ids), claimable)
+                .values(
+                    status=BatchJobItemStatus.RUNNING,
+                    attempts=BatchJobItem.attempts + 1,
+                    claimed_by=self.worker_id,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds)
+                )
+                .returning(BatchJobItem.id, BatchJobItem.job_id, BatchJobItem.prompt, BatchJobItem.attempts)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            if not rows:
+                await db.rollback()
+                return []
+            
+            job_ids = {row.job_id for row in rows}
+            await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id.in_(job_ids), BatchJob.status == BatchJobStatus.PENDING)
+                .values(status=BatchJobStatus.RUNNING, started_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            jobs = {
+                job.id: job
+                for job in (
+                    await db.execute(
+                        select(BatchJob.id, BatchJob.user_id, BatchJob.optimization_type, BatchJob.optimization_mode)
+                        .where(BatchJob.id.in_(job_ids))
+                    )
+                ).all()
+            }
+            await db.commit()
+        
+        return [
+            {
+                "item_id": row.id,
+                "job_id": row.job_id,
+                "prompt": row.prompt,
+                "attempts": row.attempts,
+                "user_id": jobs[row.job_id].user_id,
+                "optimization_type": jobs[row.job_id].optimization_type,
+                "optimization_mode": jobs[row.job_id].optimization_mode
+            }
+            for row in rows
+        ]
+    
+    async def _run(self) -> None:
+        """主循环：有空闲名额时领取任务项，否则等待唤醒"""
+        while not self._stopping:
+            self._wakeup.clear()
+            if self._running and time.monotonic() - self._lease_renewed_at >= self.lease_seconds / 3:
+                try:
+                    await self.renew_leases()
+                    self._lease_renewed_at = time.monotonic()
+                except Exception as e:
+                    print(f"⚠️ 批量任务续约失败: {e}")
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    claimed = await self.claim(free)
+                except Exception as e:
+                    print(f"⚠️ 批量任务领取失败: {e}")
+                    claimed = []
+                for item in claimed:
+                    task = asyncio.create_task(self._process(item))
+                    self._running.add(task)
+                    task.add_done_callback(self._on_done)
+            
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _on_done(self, task: asyncio.Task) -> None:
+        """任务项处理结束，唤醒主循环领取下一批"""
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # 连重新排队都失败时，任务项保持running，租约过期后被重新领取
+            print(f"⚠️ 批量任务项处理异常: {task.exception()}")
+        self._wakeup.set()
+    
+    async def _process(self, item: Dict[str, Any]) -> None:
+        """处理单个任务项"""
+        try:
+            result = await self.client.optimize_prompt(
+                item["prompt"], item["optimization_type"], mode=item["optimization_mode"]
+            )
+        except asyncio.CancelledError:
+            await asyncio.shield(self._requeue(item["item_id"]))
+            raise
+        except Exception as e:
+            if is_transient_error(e) and item["attempts"] < self.max_attempts:
+                await self._retry_later(item, transient_retry_after(e))
+                return
+            outcome = {"error": str(e)}
+        else:
+            outcome = {"result": result}
+        
+        try:
+            await self._finish(item, **outcome)
+        except Exception as e:
+            print(f"⚠️ 批量任务项保存失败: {e}")
+            if item["attempts"] < self.max_attempts:
+                await self._retry_later(item)
+            else:
+                await self._finish(item, error=f"保存结果失败: {e}")
+    
+    def _backoff(self, attempts: int, retry_after: Optional[float] = None) -> float:
+        """第n次尝试失败后的等待时间：按次数翻倍，不短于上游建议的等待"""
+        delay = self.retry_delay * 2 ** max(0, attempts - 1)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return min(delay, settings.BATCH_JOB_RETRY_MAX_DELAY)
+    
+    async def _retry_later(self, item: Dict[str, Any], retry_after: Optional[float] = None) -> None:
+        """按退避时间重新排队"""
+        await self._requeue(item["item_id"], delay=self._backoff(item["attempts"], retry_after))
+        self.retried += 1
+    
+    async def _requeue(self, item_id: int, delay: float = 0.0) -> None:
+        """将任务项放回队列，delay秒后才能再次领取"""
+        next_attempt_at = datetime.utcnow() + timedelta(seconds=delay) if delay > 0 else None
+        async with self.session_maker() as db:
+            await db.execute(
+                update(BatchJobItem)
+                .where(BatchJobItem.id == item_id, self._owned())
+                .values(
+                    status=BatchJobItemStatus.PENDING,
+                    next_attempt_at=next_attempt_at,
+                    claimed_by=None,
+                    lease_expires_at=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+    
+    async def _finish(
+        self,
+        item: Dict[str, Any],
+        result: Optional[OptimizationResult] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        在同一事务中保存结果、更新任务项状态和任务进度
+        
+        任务项已不由本worker持有（已完成，或租约过期后被其他worker接手）时回滚，不保存结果也不计数。
+        """
+        succeeded = result is not None
+        now = datetime.utcnow()
+        
+        async with self.session_maker() as db:
+            optimization_id = None
+            if succeeded:
+                optimization, _ = await OptimizationService(db).save_result(
+                    user_id=item["user_id"],
+                    original_prompt=item["prompt"],
+                    optimization_type=item["optimization_type"],
+                    result=result,
+                    ai_model_used=self.client.model,
+                    commit=False
+                )
+                optimization_id = optimization.id
+            
+            # 更新任务计数时锁住任务行，同一任务的完成序号按提交顺序分配
+            counter = BatchJob.succeeded_count if succeeded else BatchJob.failed_count
+            finished_seq = (await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == item["job_id"])
+                .values({counter: counter + 1})
+                .returning(BatchJob.succeeded_count + BatchJob.failed_count)
+                .execution_options(synchronize_session=False)
+            )).scalar_one()
+            
+            # 只完成本worker仍持有的running任务项，重复处理时不会重复保存结果和计数
+            updated = await db.execute(
+                update(BatchJobItem)
+                .where(BatchJobItem.id == item["item_id"], self._owned())
+                .values(
+                    status=BatchJobItemStatus.SUCCEEDED if succeeded else BatchJobItemStatus.FAILED,
+                    error=error,
+                    finished_at=now,
+                    finished_seq=finished_seq,
+                    optimization_id=optimization_id,
+                    lease_expires_at=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if updated.rowcount != 1:
+                await db.rollback()
+                return
+            
+            await db.execute(
+                update(BatchJob)
+                .where(
+                    BatchJob.id == item["job_id"],
+                    BatchJob.succeeded_count + BatchJob.failed_count >= BatchJob.total_count
+                )
+                .values(status=BatchJobStatus.COMPLETED, finished_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        
+        if succeeded:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取worker统计"""
+        return {
+            "running": self._task is not None,
+            "in_flight": len(self._running),
+            "concurrency": self.concurrency,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "recovered": self.recovered
+        }
+
+
+# 创建全局worker实例
+batch_job_worker = BatchJobWorker()
@@ -0,0 +1,134 @@
+"""
+登录历史写缓冲
+登录请求只把记录放入内存缓冲区，后台任务定期批量写入数据库，关闭时保证写完
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models.user import LoginHistory
+
+
+class LoginHistoryBuffer:
+    """
+    登录历史批量写入器
+    
+    缓冲的记录达到 batch_size 或距上次写入超过 flush_interval 秒时写入一次。
+    写入失败的记录放回缓冲区等待下次重试，缓冲区超过 max_buffered 条时丢弃最早的记录。
+    进程异常退出时未写入的记录会丢失，登录历史只用于审计展示，可以接受。
+    """
+    
+    def __init__(
+        self,
+        session_maker: async_sessionmaker = async_session_maker,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_buffered: int = 100000
+    ):
+        self.session_maker = session_maker
+        self.flush_interval = flush_interval or settings.LOGIN_HISTORY_FLUSH_INTERVAL
+        self.batch_size = batch_size or settings.LOGIN_HISTORY_BATCH_SIZE
+        self.max_buffered = max_buffered
+        
+        self._rows: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        
+        self.buffered = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    async def start(self) -> None:
+        """启动后台写入任务"""
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止后台任务并写入剩余记录"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self.flush()
+    
+    def add(self, **row: Any) -> None:
+        """缓冲一条登录记录"""
+        self._rows.append(row)
+        self.buffered += 1
+        self._trim()
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+    
+    def _trim(self) -> int:
+        """缓冲区超过 max_buffered 条时丢弃最早的记录，返回丢弃条数"""
+        overflow = len(self._rows) - self.max_buffered
+        if overflow <= 0:
+            return 0
+        del self._rows[:overflow]
+        self.dropped += overflow
+        return overflow
+    
+    async def flush(self) -> int:
+        """将缓冲区中的记录批量写入数据库，返回写入条数"""
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                async with self.session_maker() as db:
+                    await db.execute(insert(LoginHistory), rows)
+                    await db.commit()
+            except Exception as e:
+                self.failures += 1
+                self._rows[:0] = rows
+                dropped = self._trim()
+                print(f"⚠️ 登录历史写入失败，{len(rows)} 条记录等待重试: {e}")
+                if dropped:
+                    print(f"⚠️ 登录历史缓冲区已满，丢弃最早的 {dropped} 条记录")
+                return 0
+            self.flushes += 1
+            self.written += len(rows)
+            return len(rows)
+    
+    async def _run(self) -> None:
+        """定期写入，缓冲区满时提前写入"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓冲统计"""
+        return {
+            "running": self.running,
+            "pending": len(self._rows),
+            "buffered": self.buffered,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped
+        }
+
+
+# 全局登录历史写缓冲实例
+login_history_buffer = LoginHistoryBuffer()
@@ -0,0 +1,317 @@
+"""
+优化记录服务
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from sqlalchemy import asc, desc, func, literal, select, tuple_, union_all
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.ai_client import OptimizationResult
+from app.models.optimization import Optimization, OptimizationImprovement
+
+
+# 历史记录可用的排序字段
+HISTORY_SORT_COLUMNS = {
+    "created_at": Optimization.created_at,
+    "quality_score": Optimization.quality_score_after,
+}
+
+# SQLite CURRENT_TIMESTAMP 的时间格式
+_SQLITE_SECONDS_FORMAT = "%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+
+# 摘要视图中提示词预览的最大字符数
+SUMMARY_PREVIEW_LENGTH = 200
+
+
+def _normalize_sort(sort_by: Optional[str], sort_order: Optional[str]) -> Tuple[str, str]:
+    return (sort_by if sort_by in HISTORY_SORT_COLUMNS else "created_at"), ("asc" if sort_order == "asc" else "desc")
+
+
+def _bind_type(column, value: Any):
+    """
+    游标排序值的绑定类型
+    
+    SQLite 以字符串保存时间，CURRENT_TIMESTAMP 默认值不带小数秒，而默认绑定格式总带6位小数，
+    同一时间按字符串比较会不相等，因此没有小数秒的值按不带小数的格式绑定。
+    """
+    if isinstance(value, datetime) and not value.microsecond:
+        return column.type.with_variant(sqlite.DATETIME(storage_format=_SQLITE_SECONDS_FORMAT), "sqlite")
+    return column.type
+
+
+def _cursor_value(value: Any, sort_by: str) -> Any:
+    """排序值在游标中的JSON表示"""
+    if value is None:
+        return None
+    return value.isoformat() if sort_by == "created_at" else float(value)
+
+
+def encode_history_cursor(
+    record: Mapping[str, Any],
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = None
+) -> str:
+    """生成指向某条记录之后的分页游标，游标中保存该记录的排序值和id"""
+    sort_by, sort_order = _normalize_sort(sort_by, sort_order)
+    value = _cursor_value(record[HISTORY_SORT_COLUMNS[sort_by].key], sort_by)
+    payload = json.dumps(
+        {"id": record["id"], "value": value, "sort": sort_by, "order": sort_order}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(
+    cursor: str,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = None
+) -> Tuple[Any, int]:
+    """
+    解析分页游标，返回上一页最后一条记录的 (排序值, id)
+    
+    游标无效或排序方式不一致时抛出 ValueError。
+    """
+    sort_by, sort_order = _normalize_sort(sort_by, sort_order)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        last_id = int(payload["id"])
+        value = payload["value"]
+        cursor_sort = (payload["sort"], payload["order"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("无效的分页游标")
+    if cursor_sort != (sort_by, sort_order):
+        raise ValueError("分页游标与排序方式不一致")
+    if value is not None:
+        try:
+            value = datetime.fromisoformat(value) if sort_by == "created_at" else float(value)
+        except (ValueError, TypeError):
+            raise ValueError("无效的分页游标")
+    return value, last_id
+
+
+class OptimizationService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    @staticmethod
+    def _history_conditions(user_id: int, category: Optional[str]) -> list:
+        """历史记录的筛选条件，列表查询和计数共用"""
+        conditions = [Optimization.user_id == user_id]
+        if category:
+            conditions.append(Optimization.optimization_type == category)
+        return conditions
+    
+    @staticmethod
+    def _history_order(sort_by: Optional[str], sort_order: Optional[str]) -> list:
+        """
+        历史记录排序，默认按创建时间倒序，id 作为次序保证分页稳定
+        
+        可为空的排序列，空值记录不论升序降序都排在最后。
+        """
+        sort_by, sort_order = _normalize_sort(sort_by, sort_order)
+        column = HISTORY_SORT_COLUMNS[sort_by]
+        direction = asc if sort_order == "asc" else desc
+        sort_key = direction(column).nulls_last() if column.nullable else direction(column)
+        return [sort_key, direction(Optimization.id)]
+    
+    @staticmethod
+    def _cursor_page(
+        conditions: list,
+        limit: int,
+        after: Tuple[Any, int],
+        sort_by: Optional[str],
+        sort_order: Optional[str]
+    ):
+        """
+        游标之后一页记录id的查询
+        
+        排序值和id直接取自游标，不依赖游标记录仍然存在。非空排序值用 (排序列, id) 的范围条件，
+        和索引 (user_id, 排序列, id) 对应，页码再深也只是一次索引定位。
+        可为空的排序列，非空区间读完后接着按id读空值记录：两段各自定位后合并取前 limit 条，
+        不在同一条件中用 OR 连接，否则数据库只能按 user_id 定位。
+        """
+        sort_by, sort_order = _normalize_sort(sort_by, sort_order)
+        column = HISTORY_SORT_COLUMNS[sort_by]
+        value, after_id = after
+        ascending = sort_order == "asc"
+        direction = asc if ascending else desc
+        
+        nulls = select(Optimization.id).where(*conditions, column.is_(None)).order_by(direction(Optimization.id))
+        if value is None:
+            # 游标已在空值区间内
+            after_id_condition = Optimization.id > after_id if ascending else Optimization.id < after_id
+            return nulls.where(after_id_condition).limit(limit)
+        
+        key = tuple_(column, Optimization.id)
+        bound = tuple_(literal(value, _bind_type(column, value)), after_id)
+        ranged = (
+            select(Optimization.id)
+            .where(*conditions, key > bound if ascending else key < bound)
+            .order_by(direction(column), direction(Optimization.id))
+            .limit(limit)
+        )
+        if not column.nullable:
+            return ranged
+        
+        head = ranged.add_columns(literal(0).label("phase"), column.label("sort_value")).subquery()
+        tail = nulls.add_columns(literal(1).label("phase"), column.label("sort_value")).limit(limit).subquery()
+        merged = union_all(select(head), select(tail)).subquery()
+        return (
+            select(merged.c.id)
+            .order_by(merged.c.phase, direction(merged.c.sort_value), direction(merged.c.id))
+            .limit(limit)
+        )
+    
+    def _history_page(
+        self,
+        user_id: int,
+        skip: int,
+        limit: int,
+        category: Optional[str],
+        sort_by: Optional[str],
+        sort_order: Optional[str],
+        after: Optional[Tuple[Any, int]] = None
+    ):
+        """
+        当前页记录id的子查询
+        
+        先只按排序列取出一页id，再回表读取这些行的其他列，
+        避免数据库把全部匹配行的长文本带进排序。
+        指定 after 时按游标分页，忽略 skip。
+        """
+        conditions = self._history_conditions(user_id, category)
+        if after is not None:
+            return self._cursor_page(conditions, limit, after, sort_by, sort_order).subquery()
+        return (
+            select(Optimization.id)
+            .where(*conditions)
+            .order_by(*self._history_order(sort_by, sort_order))
+            .offset(skip)
+            .limit(limit)
+            .subquery()
+        )
+    
+    async def count_history(self, user_id: int, category: Optional[str] = None) -> int:
+        """统计历史记录数量"""
+        query = select(func.count()).select_from(Optimization).where(
+            *self._history_conditions(user_id, category)
+        )
+        return (await self.db.execute(query)).scalar_one()
+    
+    async def list_history(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 20,
+        category: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        after: Optional[Tuple[Any, int]] = None
+    ) -> List[Optimization]:
+        """分页获取历史记录，改进说明通过一次 IN 查询批量加载"""
+        page = self._history_page(user_id, skip, limit, category, sort_by, sort_order, after)
+        query = (
+            select(Optimization)
+            .join(page, page.c.id == Optimization.id)
+            .order_by(*self._history_order(sort_by, sort_order))
+            .options(selectinload(Optimization.improvements))
+        )
+        return list((await self.db.execute(query)).scalars().all())
+    
+    async def list_history_summaries(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 20,
+        category: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = None,
+        preview_length: int = SUMMARY_PREVIEW_LENGTH,
+        after: Optional[Tuple[Any, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        分页获取历史记录摘要
+        
+        只查询列表展示需要的列，提示词在数据库端截取为预览，
+        改进说明只返回数量，不加载完整文本。
+        """
+        page = self._history_page(user_id, skip, limit, category, sort_by, sort_order, after)
+        improvement_count = (
+            select(func.count(OptimizationImprovement.id))
+            .where(OptimizationImprovement.optimization_id == Optimization.id)
+            .correlate(Optimization)
+            .scalar_subquery()
+        )
+        query = (
+            select(
+                Optimization.id,
+                func.substr(Optimization.original_prompt, 1, preview_length).label("original_prompt"),
+                func.substr(Optimization.optimized_prompt, 1, preview_length).label("optimized_prompt"),
+                func.length(Optimization.original_prompt).label("original_length"),
+                Optimization.quality_score_before,
+                Optimization.quality_score_after,
+                Optimization.optimization_type,
+                Optimization.created_at,
+                Optimization.processing_time,
+                improvement_count.label("improvement_count")
+            )
+            .join(page, page.c.id == Optimization.id)
+            .order_by(*self._history_order(sort_by, sort_order))
+        )
+        return [dict(row) for row in (await self.db.execute(query)).mappings()]
+    
+    async def get_with_improvements(self, optimization_id: int, user_id: int) -> Optional[Optimization]:
+        """获取单条优化记录及其改进说明"""
+        query = (
+            select(Optimization)
+            .where(Optimization.id == optimization_id, Optimization.user_id == user_id)
+            .options(selectinload(Optimization.improvements))
+        )
+        return (await self.db.execute(query)).scalar_one_or_none()
+    
+    async def save_result(
+        self,
+        user_id: int,
+        original_prompt: str,
+        optimization_type: str,
+        result: OptimizationResult,
+        ai_model_used: str,
+        commit: bool = True
+    ) -> Tuple[Optimization, List[OptimizationImprovement]]:
+        """保存优化结果及改进说明"""
+        optimization = Optimization(
+            user_id=user_id,
+            original_prompt=original_prompt,
+            optimized_prompt=result.optimized_prompt,
+            quality_score_before=result.quality_score_before,
+            quality_score_after=result.quality_score_after,
+            optimization_type=getattr(optimization_type, "value", optimization_type),
+            ai_model_used=ai_model_used,
+            processing_time=result.processing_time,
+            prompt_tokens=result.usage_stats.prompt_tokens,
+            completion_tokens=result.usage_stats.completion_tokens,
+            total_tokens=result.usage_stats.total_tokens,
+            cost_estimate=result.usage_stats.cost_estimate
+        )
+        
+        self.db.add(optimization)
+        await self.db.flush()  # 获取生成的ID
+        
+        # 保存改进说明
+        improvements = []
+        for improvement_data in result.improvements:
+            improvement = OptimizationImprovement(
+                optimization_id=optimization.id,
+                improvement_type=improvement_data["type"],
+                description=improvement_data["description"]
+            )
+            self.db.add(improvement)
+            improvements.append(improvement)
+        
+        if commit:
+            await self.db.commit()
+        return optimization, improvements
@@ -1,10 +1,17 @@
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy import delete, or_, select, update
 from datetime import datetime
 
 from app.models.user import User, LoginHistory
+from app.models.batch_job import BatchJob, BatchJobItem
+from app.models.optimization import (
+    Optimization,
+    OptimizationExample,
+    OptimizationImprovement,
+    OptimizationTemplate
+)
+from app.core.principal_cache import principal_cache
 from app.schemas.auth import UserUpdate
 
 
@@ -55,6 +62,7 @@ class UserService:
             )
             result = await self.db.execute(stmt)
             await self.db.commit()
+            principal_cache.invalidate(user_id)
             return result.scalar_one()
         
         return user
@@ -69,6 +77,7 @@ class UserService:
         )
         result = await self.db.execute(stmt)
         await self.db.commit()
+        principal_cache.invalidate(user_id)
         
         if result.rowcount == 0:
             return None
@@ -76,13 +85,38 @@ class UserService:
         return result.scalar_one()
     
     async def delete_user(self, user_id: int) -> bool:
-        """删除用户"""
-        user = await self.get_user_by_id(user_id)
-        if not user:
+        """
+        删除用户及其历史数据
+        
+        按外键依赖顺序逐表批量删除，不把历史数据加载到会话中。
+        """
+        job_ids = select(BatchJob.id).where(BatchJob.user_id == user_id)
+        optimization_ids = select(Optimization.id).where(Optimization.user_id == user_id)
+        statements = [
+            delete(BatchJobItem).where(or_(
+                BatchJobItem.job_id.in_(job_ids),
+                BatchJobItem.optimization_id.in_(optimization_ids)
+            )),
+            delete(BatchJob).where(BatchJob.user_id == user_id),
+            delete(OptimizationImprovement).where(OptimizationImprovement.optimization_id.in_(optimization_ids)),
+            delete(Optimization).where(Optimization.user_id == user_id),
+            delete(LoginHistory).where(LoginHistory.user_id == user_id),
+            # 共享的示例和模板保留，只解除创建者关联
+            update(OptimizationExample).where(OptimizationExample.created_by == user_id).values(created_by=None),
+            update(OptimizationTemplate).where(OptimizationTemplate.created_by == user_id).values(created_by=None)
+        ]
+        for stmt in statements:
+            await self.db.execute(stmt.execution_options(synchronize_session=False))
+        
+        result = await self.db.execute(
+            delete(User).where(User.id == user_id).execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            await self.db.rollback()
             return False
         
-        await self.db.delete(user)
         await self.db.commit()
+        principal_cache.invalidate(user_id)
         return True
     
     async def get_login_history(
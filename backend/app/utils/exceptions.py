@@ -53,6 +53,16 @@ class AIServiceException(PromptOptimizerException):
         )
 
 
+class CircuitOpenException(AIServiceException):
+    """AI服务熔断异常，熔断期间不请求上游直接失败"""
+    
+    def __init__(self, message: str, service: Optional[str] = None, retry_after: Optional[float] = None):
+        super().__init__(message=message, service=service)
+        self.error_code = "AI_SERVICE_CIRCUIT_OPEN"
+        if retry_after is not None:
+            self.details["retry_after"] = round(retry_after, 3)
+
+
 class OptimizationException(PromptOptimizerException):
     """提示词优化异常"""
     
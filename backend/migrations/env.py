@@ -26,6 +26,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from app.models.base import Base
 from app.models.user import User, LoginHistory
 from app.models.optimization import Optimization, OptimizationImprovement, OptimizationExample, OptimizationTemplate
+from app.models.batch_job import BatchJob, BatchJobItem
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,46 @@
+"""Page batch job results by completion sequence
+
+Revision ID: a9b6c7d8e1f2
+Revises: f8a5b6c7d0e1
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9b6c7d8e1f2'
+down_revision: Union[str, None] = 'f8a5b6c7d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('batch_job_items', sa.Column('finished_seq', sa.Integer(), nullable=True))
+    # 已完成的项按原来的 (finished_at, id) 顺序编号
+    op.execute(
+        """
+        UPDATE batch_job_items SET finished_seq = (
+            SELECT COUNT(*) FROM batch_job_items AS done
+            WHERE done.job_id = batch_job_items.job_id
+              AND done.status IN ('succeeded', 'failed')
+              AND done.finished_at IS NOT NULL
+              AND (done.finished_at < batch_job_items.finished_at
+                   OR (done.finished_at = batch_job_items.finished_at AND done.id <= batch_job_items.id))
+        )
+        WHERE status IN ('succeeded', 'failed') AND finished_at IS NOT NULL
+        """
+    )
+    op.drop_index('ix_batch_job_items_job_finished', table_name='batch_job_items')
+    op.create_index('ix_batch_job_items_job_finished_seq', 'batch_job_items', ['job_id', 'finished_seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_batch_job_items_job_finished_seq', table_name='batch_job_items')
+    op.create_index(
+        'ix_batch_job_items_job_finished', 'batch_job_items', ['job_id', 'finished_at', 'id'], unique=False
+    )
+    op.drop_column('batch_job_items', 'finished_seq')
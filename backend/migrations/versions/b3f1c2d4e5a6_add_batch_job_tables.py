@@ -0,0 +1,68 @@
+"""Add batch job tables
+
+Revision ID: b3f1c2d4e5a6
+Revises: 96970d6591dc
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1c2d4e5a6'
+down_revision: Union[str, None] = '96970d6591dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('batch_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('optimization_type', sa.String(length=50), nullable=False),
+    sa.Column('optimization_mode', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.Column('succeeded_count', sa.Integer(), nullable=False),
+    sa.Column('failed_count', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_batch_jobs_id'), 'batch_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_batch_jobs_user_id'), 'batch_jobs', ['user_id'], unique=False)
+    op.create_table('batch_job_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('prompt', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('optimization_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['batch_jobs.id'], ),
+    sa.ForeignKeyConstraint(['optimization_id'], ['optimizations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_batch_job_items_id'), 'batch_job_items', ['id'], unique=False)
+    op.create_index('ix_batch_job_items_status_id', 'batch_job_items', ['status', 'id'], unique=False)
+    op.create_index('ix_batch_job_items_job_finished', 'batch_job_items', ['job_id', 'finished_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_batch_job_items_job_finished', table_name='batch_job_items')
+    op.drop_index('ix_batch_job_items_status_id', table_name='batch_job_items')
+    op.drop_index(op.f('ix_batch_job_items_id'), table_name='batch_job_items')
+    op.drop_table('batch_job_items')
+    op.drop_index(op.f('ix_batch_jobs_user_id'), table_name='batch_jobs')
+    op.drop_index(op.f('ix_batch_jobs_id'), table_name='batch_jobs')
+    op.drop_table('batch_jobs')
@@ -0,0 +1,26 @@
+"""Index optimization_improvements.optimization_id
+
+Revision ID: c5d2e3f4a7b8
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e3f4a7b8'
+down_revision: Union[str, None] = 'b3f1c2d4e5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_optimization_improvements_optimization_id'), 'optimization_improvements', ['optimization_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_optimization_improvements_optimization_id'), table_name='optimization_improvements')
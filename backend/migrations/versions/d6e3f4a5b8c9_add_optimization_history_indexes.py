@@ -0,0 +1,28 @@
+"""Add optimization history sort indexes
+
+Revision ID: d6e3f4a5b8c9
+Revises: c5d2e3f4a7b8
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6e3f4a5b8c9'
+down_revision: Union[str, None] = 'c5d2e3f4a7b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_optimizations_user_created', 'optimizations', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_optimizations_user_quality', 'optimizations', ['user_id', 'quality_score_after', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_optimizations_user_quality', table_name='optimizations')
+    op.drop_index('ix_optimizations_user_created', table_name='optimizations')
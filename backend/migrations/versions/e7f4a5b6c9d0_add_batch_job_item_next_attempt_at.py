@@ -0,0 +1,26 @@
+"""Add batch job item retry time
+
+Revision ID: e7f4a5b6c9d0
+Revises: d6e3f4a5b8c9
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f4a5b6c9d0'
+down_revision: Union[str, None] = 'd6e3f4a5b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('batch_job_items', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('batch_job_items', 'next_attempt_at')
@@ -0,0 +1,28 @@
+"""Add batch job item claim lease
+
+Revision ID: f8a5b6c7d0e1
+Revises: e7f4a5b6c9d0
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8a5b6c7d0e1'
+down_revision: Union[str, None] = 'e7f4a5b6c9d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('batch_job_items', sa.Column('claimed_by', sa.String(length=100), nullable=True))
+    op.add_column('batch_job_items', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('batch_job_items', 'lease_expires_at')
+    op.drop_column('batch_job_items', 'claimed_by')
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+批量提示词分析吞吐测试
+对比逐条 await analyze(use_ai=False) 与 analyze_many（单进程 / 进程池）的每秒处理条数
+
+    python scripts/bench_analyze_many.py --prompts 20000 --processes 4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.prompt_analyzer import PromptAnalyzer
+from bench_prompt_analyzer import build_prompt
+
+
+def measure(func, repeat: int) -> float:
+    """返回多次运行的中位耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="批量提示词分析吞吐测试")
+    parser.add_argument("--prompts", type=int, default=20000, help="提示词条数")
+    parser.add_argument("--size", type=int, default=600, help="单条提示词平均大小（字符）")
+    parser.add_argument("--corpus", default="en", choices=["en", "zh", "mixed"], help="语料类型")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="进程池大小")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每个分块的提示词数")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    prompts = [build_prompt(rng.randint(args.size // 4, args.size * 7 // 4), rng, args.corpus) for _ in range(args.prompts)]
+    analyzer = PromptAnalyzer()
+
+    async def analyze_each():
+        for prompt in prompts:
+            await analyzer.analyze(prompt, use_ai=False)
+
+    rows = [
+        ("逐条 analyze(use_ai=False)", lambda: asyncio.run(analyze_each())),
+        ("analyze_many（单进程）", lambda: analyzer.analyze_many(prompts, chunk_size=args.chunk_size)),
+    ]
+    if args.processes > 1:
+        rows.append((
+            f"analyze_many（{args.processes} 进程）",
+            lambda: analyzer.analyze_many(prompts, processes=args.processes, chunk_size=args.chunk_size)
+        ))
+
+    print(f"🚀 {args.prompts} 条{args.corpus}提示词，平均约 {args.size} 字符，CPU核数 {os.cpu_count()}")
+    print("=" * 60)
+    for name, func in rows:
+        elapsed = measure(func, args.repeat)
+        print(f"{name:<30}{elapsed:>8.2f} s{args.prompts / elapsed:>12.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
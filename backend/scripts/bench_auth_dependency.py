@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+认证依赖基准测试
+为单个用户生成大量优化记录和登录历史，对比 get_current_user 在
+旧的 lazy="selectin" 加载方式与只加载身份列的加载方式下的耗时
+
+    python scripts/bench_auth_dependency.py --rows 50000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from app.core.dependencies import get_current_user
+from app.core.security import create_access_token
+from app.database import Base
+from app.models.optimization import Optimization
+from app.models.user import LoginHistory, User
+
+USER_ID = 1
+SEED_BATCH = 5000
+
+
+async def seed(engine, rows: int) -> None:
+    """批量写入测试数据"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": USER_ID, "username": "bench", "email": "bench@example.com", "hashed_password": "x"}
+        ])
+        for start in range(0, rows, SEED_BATCH):
+            count = min(SEED_BATCH, rows - start)
+            await conn.execute(insert(Optimization), [
+                {
+                    "user_id": USER_ID,
+                    "original_prompt": "请总结这篇文章的要点" * 10,
+                    "optimized_prompt": "请用三条要点总结这篇文章，每条不超过30字" * 10,
+                    "optimization_type": "general",
+                }
+                for _ in range(count)
+            ])
+            await conn.execute(insert(LoginHistory), [
+                {"user_id": USER_ID, "ip_address": "127.0.0.1", "user_agent": "bench", "success": True}
+                for _ in range(count)
+            ])
+
+
+async def legacy_current_user(credentials, db: AsyncSession) -> User:
+    """旧版认证依赖：User 的两个关系为 lazy="selectin"，每次都随用户一起加载"""
+    stmt = select(User).where(User.id == USER_ID).options(
+        selectinload(User.optimizations),
+        selectinload(User.login_history)
+    )
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def measure(engine, func, credentials, repeat: int):
+    """返回 (中位耗时毫秒, SQL语句数)"""
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    timings = []
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            async with AsyncSession(engine) as db:
+                start = time.perf_counter()
+                await func(credentials, db)
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+    return statistics.median(timings), len(statements)
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="认证依赖基准测试")
+    parser.add_argument("--rows", type=int, default=50000, help="优化记录和登录历史各自的条数")
+    parser.add_argument("--repeat", type=int, default=10, help="每项重复次数")
+    args = parser.parse_args()
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(subject=USER_ID))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        print(f"🚀 生成 {args.rows} 条优化记录和 {args.rows} 条登录历史...")
+        await seed(engine, args.rows)
+        print("=" * 60)
+        print(f"{'实现':<24}{'耗时(ms)':>12}{'SQL语句数':>12}")
+
+        for name, func in (
+            ("旧实现（selectin）", legacy_current_user),
+            ("get_current_user", get_current_user),
+        ):
+            elapsed, queries = await measure(engine, func, credentials, args.repeat)
+            print(f"{name:<24}{elapsed:>12.2f}{queries:>12}")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+融合优化模式基准测试脚本
+对比 standard（三次调用）与 fused（单次调用）两种优化模式的延迟和Token成本
+
+使用模拟的模型服务，不产生真实API费用：
+    python scripts/bench_fused_optimization.py --runs 50 --latency 1.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.ai_client import AIClient
+from app.core.tokenizer import TokenCounter
+
+
+ANALYSIS_REPLY = json.dumps({
+    "scores": {"clarity": 6, "completeness": 5, "structure": 5, "specificity": 4, "actionability": 6},
+    "overall_score": 5,
+    "issues": ["缺少输入输出说明", "缺少编程语言要求"],
+    "suggestions": ["明确编程语言", "说明输入输出格式"]
+}, ensure_ascii=False)
+
+OPTIMIZATION_REPLY = """优化后的提示词：
+请使用Python编写一个函数 add(a, b)，计算两个数的和。
+要求：支持整数和浮点数输入，包含类型注解和文档字符串，并给出调用示例。
+
+改进说明：
+1. 明确语言：指定使用Python实现
+2. 输入输出：说明支持的参数类型和返回值
+3. 代码规范：要求类型注解、文档字符串和示例
+"""
+
+FUSED_REPLY = json.dumps({
+    "analysis_before": {
+        "scores": {"clarity": 6, "completeness": 5, "structure": 5, "specificity": 4, "actionability": 6},
+        "overall_score": 5,
+        "issues": ["缺少输入输出说明", "缺少编程语言要求"]
+    },
+    "optimized_prompt": "请使用Python编写一个函数 add(a, b)，计算两个数的和。\n要求：支持整数和浮点数输入，包含类型注解和文档字符串，并给出调用示例。",
+    "improvements": [
+        {"type": "明确语言", "description": "指定使用Python实现"},
+        {"type": "输入输出", "description": "说明支持的参数类型和返回值"},
+        {"type": "代码规范", "description": "要求类型注解、文档字符串和示例"}
+    ],
+    "analysis_after": {
+        "scores": {"clarity": 9, "completeness": 8, "structure": 8, "specificity": 9, "actionability": 9},
+        "overall_score": 8.6
+    }
+}, ensure_ascii=False)
+
+
+class SimulatedCompletions:
+    """模拟的chat.completions接口，按输出长度模拟生成耗时并记录Token用量"""
+
+    def __init__(self, client: AIClient, base_latency: float, tokens_per_second: float):
+        self.client = client
+        self.base_latency = base_latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def create(self, model, messages, **kwargs):
+        system_prompt = messages[0]["content"]
+        if "质量评估专家" in system_prompt and "JSON" in system_prompt and "优化专家" not in system_prompt:
+            content = ANALYSIS_REPLY
+        elif "JSON" in system_prompt:
+            content = FUSED_REPLY
+        else:
+            content = OPTIMIZATION_REPLY
+
+        prompt_tokens = sum(self.client.count_tokens(m["content"]) for m in messages)
+        completion_tokens = self.client.count_tokens(content)
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+        jitter = random.uniform(0.8, 1.2)
+        await asyncio.sleep((self.base_latency + completion_tokens / self.tokens_per_second) * jitter)
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        )
+
+
+class ApproximateEncoding:
+    """离线估算用编码器：中文按字计、其余约4个字符计1个token"""
+
+    def encode(self, text):
+        cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+        return [0] * (cjk + (len(text) - cjk) // 4)
+
+
+def percentile(values, pct):
+    """计算百分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(mode: str, runs: int, base_latency: float, tokens_per_second: float) -> dict:
+    """运行指定模式的基准测试"""
+    client = AIClient()
+    client.cache = None  # 每次都走真实调用路径
+    client.semantic_cache = None
+    completions = SimulatedCompletions(client, base_latency, tokens_per_second)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.token_counter = TokenCounter(encoding=ApproximateEncoding())
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await client.optimize_prompt("写一个函数计算两个数的和", "code", mode=mode)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "mode": mode,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 95),
+        "calls_per_run": completions.calls / runs,
+        "prompt_tokens_per_run": completions.prompt_tokens / runs,
+        "completion_tokens_per_run": completions.completion_tokens / runs,
+        "cost_per_run": client.estimate_cost(completions.prompt_tokens, completions.completion_tokens) / runs
+    }
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="融合优化模式基准测试")
+    parser.add_argument("--runs", type=int, default=20, help="每种模式运行次数")
+    parser.add_argument("--latency", type=float, default=0.8, help="模拟的首Token延迟（秒）")
+    parser.add_argument("--tps", type=float, default=60.0, help="模拟的生成速度（tokens/秒）")
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"🚀 基准测试: 每种模式 {args.runs} 次, 首Token延迟 {args.latency}s, 生成速度 {args.tps} tokens/s")
+    print("=" * 72)
+    print(f"{'模式':<10}{'p50(s)':>10}{'p95(s)':>10}{'调用数':>8}{'输入tokens':>12}{'输出tokens':>12}{'成本($)':>10}")
+
+    for mode in ("standard", "fused"):
+        stats = await run_mode(mode, args.runs, args.latency, args.tps)
+        print(
+            f"{stats['mode']:<10}{stats['p50']:>10.3f}{stats['p95']:>10.3f}"
+            f"{stats['calls_per_run']:>8.1f}{stats['prompt_tokens_per_run']:>12.0f}"
+            f"{stats['completion_tokens_per_run']:>12.0f}{stats['cost_per_run']:>10.5f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+优化历史分页基准测试
+对比偏移分页（OFFSET）与游标分页在不同页码下的查询耗时，
+游标分页的耗时应与页码无关
+
+    python scripts/bench_history_pagination.py --rows 100000 --limit 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.services.optimization_service import (
+    OptimizationService,
+    decode_history_cursor,
+    encode_history_cursor
+)
+from bench_history_query import USER_ID, seed
+
+
+async def measure(engine, func, repeat: int) -> float:
+    """返回多次运行的中位耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        async with AsyncSession(engine) as db:
+            start = time.perf_counter()
+            await func(OptimizationService(db))
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="优化历史分页基准测试")
+    parser.add_argument("--rows", type=int, default=100000, help="历史记录条数")
+    parser.add_argument("--limit", type=int, default=20, help="每页条数")
+    parser.add_argument("--sort-by", default="created_at", choices=["created_at", "quality_score"], help="排序字段")
+    parser.add_argument("--sort-order", default="desc", choices=["asc", "desc"], help="排序方向")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--drop-indexes", action="store_true", help="删除排序索引，对照迁移之前的情况")
+    args = parser.parse_args()
+
+    last_page = args.rows // args.limit
+    pages = sorted({p for p in (1, 10, 100, 1000, last_page // 2, last_page) if 1 <= p <= last_page})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        print(f"🚀 生成 {args.rows} 条历史记录...")
+        await seed(engine, args.rows, 1)
+        if args.drop_indexes:
+            async with engine.begin() as conn:
+                await conn.execute(text("DROP INDEX ix_optimizations_user_created"))
+                await conn.execute(text("DROP INDEX ix_optimizations_user_quality"))
+
+        # 预先取得每个页码对应的游标（上一页最后一条记录的排序值和id），不计入耗时
+        anchors = {}
+        async with AsyncSession(engine) as db:
+            service = OptimizationService(db)
+            for page in pages:
+                if page > 1:
+                    rows = await service.list_history_summaries(
+                        USER_ID, (page - 1) * args.limit - 1, 1, sort_by=args.sort_by, sort_order=args.sort_order
+                    )
+                    anchors[page] = decode_history_cursor(
+                        encode_history_cursor(rows[0], args.sort_by, args.sort_order), args.sort_by, args.sort_order
+                    )
+
+        print("=" * 60)
+        print(f"{'页码':<10}{'OFFSET(ms)':>14}{'游标(ms)':>14}")
+        for page in pages:
+            skip = (page - 1) * args.limit
+
+            async def by_offset(service):
+                return await service.list_history(
+                    USER_ID, skip, args.limit, sort_by=args.sort_by, sort_order=args.sort_order
+                )
+
+            async def by_cursor(service):
+                return await service.list_history(
+                    USER_ID, 0, args.limit, sort_by=args.sort_by, sort_order=args.sort_order, after=anchors.get(page)
+                )
+
+            offset_ms = await measure(engine, by_offset, args.repeat)
+            cursor_ms = await measure(engine, by_cursor, args.repeat)
+            print(f"{page:<10}{offset_ms:>14.2f}{cursor_ms:>14.2f}")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
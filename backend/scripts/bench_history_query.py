@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+优化历史查询基准测试
+在临时SQLite数据库中为单个用户生成大量历史记录，对比旧的历史查询
+（取全部行计数 + 每条记录单独查询改进说明）与 OptimizationService 的实现
+
+    python scripts/bench_history_query.py --rows 100000 --limit 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import desc, event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.database import Base
+from app.models.optimization import Optimization, OptimizationImprovement
+from app.models.user import User
+from app.services.optimization_service import OptimizationService
+
+USER_ID = 1
+SEED_BATCH = 5000
+SEED_START = datetime(2024, 1, 1)
+PROMPT_TEXT = "请根据输入的销售数据按月份汇总收入和成本，计算毛利率，并以Markdown表格输出结果。" * 8
+
+
+async def seed(engine, rows: int, improvements_per_row: int) -> None:
+    """批量写入测试数据"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": USER_ID, "username": "bench", "email": "bench@example.com", "hashed_password": "x"}
+        ])
+        for start in range(0, rows, SEED_BATCH):
+            ids = range(start + 1, min(start + SEED_BATCH, rows) + 1)
+            await conn.execute(insert(Optimization), [
+                {
+                    "id": i,
+                    "user_id": USER_ID,
+                    "original_prompt": PROMPT_TEXT,
+                    "optimized_prompt": PROMPT_TEXT + "要求：保留两位小数。",
+                    "quality_score_before": 4,
+                    "quality_score_after": i % 10,
+                    "optimization_type": "general",
+                    "created_at": SEED_START + timedelta(minutes=i),
+                }
+                for i in ids
+            ])
+            await conn.execute(insert(OptimizationImprovement), [
+                {"optimization_id": i, "improvement_type": f"改进{j}", "description": "补充了输出格式要求"}
+                for i in ids for j in range(improvements_per_row)
+            ])
+
+
+async def legacy_history(db: AsyncSession, skip: int, limit: int):
+    """旧版 /optimizer/history 的查询方式，作为对照"""
+    query = select(Optimization).where(Optimization.user_id == USER_ID).order_by(desc(Optimization.created_at))
+    total_result = await db.execute(select(Optimization).where(Optimization.user_id == USER_ID))
+    total = len(total_result.fetchall())
+
+    result = await db.execute(query.offset(skip).limit(limit))
+    records = []
+    for opt in result.scalars().all():
+        improvements_result = await db.execute(
+            select(OptimizationImprovement).where(OptimizationImprovement.optimization_id == opt.id)
+        )
+        records.append((opt, improvements_result.scalars().all()))
+    return total, records
+
+
+async def service_history(db: AsyncSession, skip: int, limit: int):
+    service = OptimizationService(db)
+    return await service.count_history(USER_ID), await service.list_history(USER_ID, skip, limit)
+
+
+async def service_summaries(db: AsyncSession, skip: int, limit: int):
+    service = OptimizationService(db)
+    return await service.count_history(USER_ID), await service.list_history_summaries(USER_ID, skip, limit)
+
+
+async def measure(engine, func, skip: int, limit: int, repeat: int):
+    """返回 (中位耗时毫秒, 每次请求的SQL语句数)"""
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    timings = []
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            async with AsyncSession(engine) as db:
+                start = time.perf_counter()
+                await func(db, skip, limit)
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+    return statistics.median(timings), len(statements)
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="优化历史查询基准测试")
+    parser.add_argument("--rows", type=int, default=100000, help="历史记录条数")
+    parser.add_argument("--improvements", type=int, default=3, help="每条记录的改进说明数")
+    parser.add_argument("--limit", type=int, default=20, help="每页条数")
+    parser.add_argument("--skip", type=int, default=0, help="跳过条数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        print(f"🚀 生成 {args.rows} 条历史记录（每条 {args.improvements} 条改进说明）...")
+        start = time.perf_counter()
+        await seed(engine, args.rows, args.improvements)
+        print(f"   耗时 {time.perf_counter() - start:.1f}s")
+        print("=" * 60)
+        print(f"{'实现':<20}{'耗时(ms)':>12}{'SQL语句数':>12}")
+
+        for name, func in (
+            ("旧实现", legacy_history),
+            ("完整视图", service_history),
+            ("摘要视图", service_summaries),
+        ):
+            elapsed, queries = await measure(engine, func, args.skip, args.limit, args.repeat)
+            print(f"{name:<20}{elapsed:>12.2f}{queries:>12}")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+监控指标开销微基准测试
+测量直方图记录和HTTP指标中间件在热路径上的单次开销
+
+    python scripts/bench_metrics.py --iterations 200000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.metrics import MetricsMiddleware, MetricsRegistry
+
+
+async def plain_app(scope, receive, send):
+    """最简单的ASGI应用"""
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def measure_sync(func, iterations: int, repeat: int) -> float:
+    """返回单次调用的中位耗时（纳秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        timings.append((time.perf_counter() - start) / iterations * 1e9)
+    return statistics.median(timings)
+
+
+async def measure_asgi(app, iterations: int, repeat: int) -> float:
+    """返回单个请求的中位耗时（纳秒）"""
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await app(dict(scope), receive, send)
+        timings.append((time.perf_counter() - start) / iterations * 1e9)
+    return statistics.median(timings)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="监控指标开销微基准测试")
+    parser.add_argument("--iterations", type=int, default=200000, help="每轮调用次数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复轮数")
+    args = parser.parse_args()
+
+    metrics = MetricsRegistry()
+    histogram = metrics.histogram("bench_seconds", "基准", ("call_site", "model", "outcome"))
+    child = histogram.labels("optimize", "model", "success")
+    counter = metrics.counter("bench_total", "基准", ("call_site",))
+
+    print(f"🚀 每轮 {args.iterations} 次，重复 {args.repeat} 轮")
+    print("=" * 60)
+    rows = [
+        ("空函数（对照）", lambda: None),
+        ("counter.labels().inc()", lambda: counter.labels("optimize").inc()),
+        ("child.observe()", lambda: child.observe(0.42)),
+        ("histogram.labels().observe()", lambda: histogram.labels("optimize", "model", "success").observe(0.42)),
+    ]
+    for name, func in rows:
+        print(f"{name:<32}{measure_sync(func, args.iterations, args.repeat):>10.0f} ns")
+
+    asgi_iterations = max(1, args.iterations // 10)
+    plain = asyncio.run(measure_asgi(plain_app, asgi_iterations, args.repeat))
+    wrapped = asyncio.run(measure_asgi(MetricsMiddleware(plain_app), asgi_iterations, args.repeat))
+    print(f"{'ASGI请求（无中间件）':<32}{plain:>10.0f} ns")
+    print(f"{'ASGI请求（MetricsMiddleware）':<32}{wrapped:>10.0f} ns")
+    print(f"📊 中间件每个请求增加 {(wrapped - plain) / 1000:.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+提示词分析器微基准测试
+对比旧的逐个正则扫描实现与单次扫描词表引擎在长提示词上的单条耗时，并在英文语料上校验两者结果一致；
+中文和中英混排语料只统计新实现的耗时（旧实现不识别中文）
+
+    python scripts/bench_prompt_analyzer.py --size 10240 --prompts 50 --corpus en zh mixed
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.prompt_analyzer import (
+    FEATURE_INDICATORS, STRUCTURE_INDICATORS, TECHNICAL_TERMS, PromptAnalyzer
+)
+
+
+def _legacy_pattern(words) -> str:
+    return r"\b(" + "|".join(re.escape(word) for word in words) + r")\b"
+
+
+# 旧版按领域拆分的术语正则（每个领域3条）
+LEGACY_TERM_PATTERNS = [
+    _legacy_pattern(terms[i * len(terms) // 3:(i + 1) * len(terms) // 3])
+    for terms in TECHNICAL_TERMS.values()
+    for i in range(3)
+]
+LEGACY_STRUCTURE_PATTERNS = {name: _legacy_pattern(words) for name, words in STRUCTURE_INDICATORS.items()}
+LEGACY_FEATURE_PATTERNS = {name: _legacy_pattern(words) for name, words in FEATURE_INDICATORS.items()}
+
+
+def legacy_scan(prompt: str):
+    """旧版实现的扫描部分：每个词表单独调用 re.findall / re.search，反复计算 lower()"""
+    terms = []
+    for pattern in LEGACY_TERM_PATTERNS:
+        terms.extend(re.findall(pattern, prompt.lower()))
+    structure = {
+        name: bool(re.search(pattern, prompt.lower()))
+        for name, pattern in LEGACY_STRUCTURE_PATTERNS.items()
+    }
+    features = {
+        "imperative": len(re.findall(LEGACY_FEATURE_PATTERNS["imperative"], prompt.lower())),
+        "examples": bool(re.search(LEGACY_FEATURE_PATTERNS["examples"], prompt.lower())),
+        "constraints": bool(re.search(LEGACY_FEATURE_PATTERNS["constraints"], prompt.lower())),
+        "context": bool(re.search(LEGACY_FEATURE_PATTERNS["context"], prompt.lower())),
+        "tasks": len(re.findall(LEGACY_FEATURE_PATTERNS["tasks"], prompt.lower())),
+    }
+    return set(terms), structure, features
+
+
+def engine_scan(analyzer: PromptAnalyzer, prompt: str):
+    """新引擎的扫描部分，整理成与旧版相同的形式"""
+    scan = analyzer.engine.scan(prompt.lower())
+    structure = {name: scan.has(f"structure:{name}") for name in STRUCTURE_INDICATORS}
+    features = {
+        "imperative": scan.counts.get("feature:imperative", 0),
+        "examples": scan.has("feature:examples"),
+        "constraints": scan.has("feature:constraints"),
+        "context": scan.has("feature:context"),
+        "tasks": scan.counts.get("feature:tasks", 0),
+    }
+    return set(analyzer._identify_technical_terms(scan)), structure, features
+
+
+def _vocabulary(ascii_only: bool):
+    words = [
+        word
+        for vocabularies in (TECHNICAL_TERMS, STRUCTURE_INDICATORS, FEATURE_INDICATORS)
+        for phrases in vocabularies.values()
+        for word in phrases
+    ]
+    return [word for word in words if word.isascii() == ascii_only]
+
+
+ENGLISH_VOCABULARY = _vocabulary(ascii_only=True)
+CHINESE_VOCABULARY = _vocabulary(ascii_only=False)
+ENGLISH_FILLER = ("the", "a", "of", "to", "user", "report", "quarterly", "customer", "team", "result",
+                  "value", "likely", "formatting", "forum", "database-driven", "andrew")
+CHINESE_FILLER = ("的", "一个", "是", "在", "我们", "用户", "报告", "季度", "客户", "团队",
+                  "结果", "数值", "可能", "论坛", "安卓", "了")
+
+
+def _english_sentence(rng: random.Random) -> str:
+    words = [
+        rng.choice(ENGLISH_VOCABULARY) if rng.random() < 0.15 else rng.choice(ENGLISH_FILLER)
+        for _ in range(rng.randint(6, 20))
+    ]
+    words = [word.capitalize() if rng.random() < 0.1 else word for word in words]
+    return " ".join(words) + rng.choice(".?!,")
+
+
+def _chinese_sentence(rng: random.Random) -> str:
+    words = [
+        rng.choice(CHINESE_VOCABULARY) if rng.random() < 0.15 else rng.choice(CHINESE_FILLER)
+        for _ in range(rng.randint(6, 20))
+    ]
+    return "".join(words) + rng.choice("。？！，")
+
+
+def build_prompt(size: int, rng: random.Random, corpus: str = "en") -> str:
+    """构造约 size 个字符的提示词：en 英文，zh 中文，mixed 中英文句子交替"""
+    sentences, length = [], 0
+    while length < size:
+        chinese = corpus == "zh" or (corpus == "mixed" and rng.random() < 0.5)
+        sentence = _chinese_sentence(rng) if chinese else _english_sentence(rng)
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def measure(func, prompts, repeat: int) -> float:
+    """返回多次运行中单条提示词的中位耗时（微秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for prompt in prompts:
+            func(prompt)
+        timings.append((time.perf_counter() - start) / len(prompts) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="提示词分析器微基准测试")
+    parser.add_argument("--size", type=int, default=10240, help="单条提示词大小（字符）")
+    parser.add_argument("--prompts", type=int, default=50, help="提示词条数")
+    parser.add_argument("--corpus", nargs="+", default=["en", "zh", "mixed"], choices=["en", "zh", "mixed"],
+                        help="语料类型：en 英文，zh 中文，mixed 中英混排")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    analyzer = PromptAnalyzer()
+    print(f"🚀 每种语料 {args.prompts} 条提示词，每条约 {args.size} 字符")
+
+    for corpus in args.corpus:
+        rng = random.Random(args.seed)
+        prompts = [build_prompt(args.size, rng, corpus) for _ in range(args.prompts)]
+        sample = analyzer.analyze_local(prompts[0]).features
+
+        print("=" * 60)
+        print(f"📚 语料 {corpus}：首条 {sample.word_count} 词 / {sample.sentence_count} 句，"
+              f"平均句长 {sample.avg_sentence_length:.1f}")
+        rows = [
+            ("单次扫描引擎", lambda prompt: engine_scan(analyzer, prompt)),
+            ("analyze_local（完整本地分析）", analyzer.analyze_local),
+        ]
+        if corpus == "en":
+            mismatches = sum(legacy_scan(prompt) != engine_scan(analyzer, prompt) for prompt in prompts)
+            print(f"🔍 与旧实现的一致性：{args.prompts - mismatches}/{args.prompts} 条一致")
+            rows.insert(0, ("旧实现（逐个正则扫描）", lambda prompt: legacy_scan(prompt)))
+
+        for name, func in rows:
+            print(f"{name:<28}{measure(func, prompts, args.repeat):>10.0f} µs/条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+优化结果解析器微基准测试
+对比旧的整段切分扫描实现与增量解析器在大段模型输出上的耗时
+
+    python scripts/bench_result_parser.py --lines 5000 --chunk 4
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.result_parser import IncrementalResultParser, parse_optimization_result
+
+
+def legacy_parse(content: str):
+    """旧版 _parse_optimization_result 的实现，作为对照"""
+    lines = content.strip().split('\n')
+    optimized_prompt = ""
+    improvements = []
+    current_section = None
+    current_content = []
+
+    for line in lines:
+        line = line.strip()
+        if "优化后的提示词" in line:
+            current_section = "prompt"
+            current_content = []
+        elif "改进说明" in line:
+            if current_section == "prompt":
+                optimized_prompt = '\n'.join(current_content).strip()
+            current_section = "improvements"
+            current_content = []
+        elif line.startswith(('1.', '2.', '3.', '4.', '5.', '-', '•')):
+            if current_section == "improvements":
+                improvement_text = line.lstrip('1234567890.-• ').strip()
+                if ':' in improvement_text:
+                    type_part, desc_part = improvement_text.split(':', 1)
+                    improvements.append({"type": type_part.strip(), "description": desc_part.strip()})
+                else:
+                    improvements.append({"type": "改进", "description": improvement_text})
+        elif line and current_section:
+            current_content.append(line)
+
+    if current_section == "prompt" and not optimized_prompt:
+        optimized_prompt = '\n'.join(current_content).strip()
+    if not optimized_prompt:
+        optimized_prompt = content.strip()
+    return optimized_prompt, improvements
+
+
+def build_completion(lines: int) -> str:
+    """构造包含长提示词和大量改进说明的模型输出"""
+    prompt_lines = [
+        f"第{i}步：请根据输入数据计算指标并说明计算口径，输出保留两位小数。" if i % 5 else f"{i}. 检查异常值"
+        for i in range(lines)
+    ]
+    improvement_lines = [f"{i + 1}. 改进{i}：补充了第{i}步的约束条件与输出格式" for i in range(lines // 5)]
+    return "\n".join(["## 优化后的提示词", *prompt_lines, "", "## 改进说明：", *improvement_lines]) + "\n"
+
+
+def measure(func, repeat: int) -> float:
+    """返回多次运行的中位耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="优化结果解析器微基准测试")
+    parser.add_argument("--lines", type=int, default=5000, help="提示词部分的行数")
+    parser.add_argument("--chunk", type=int, default=4, help="流式输入的片段长度（字符）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    args = parser.parse_args()
+
+    content = build_completion(args.lines)
+    chunks = [content[i:i + args.chunk] for i in range(0, len(content), args.chunk)]
+
+    def feed_chunks():
+        incremental = IncrementalResultParser()
+        for chunk in chunks:
+            incremental.feed(chunk)
+        incremental.finish()
+        return incremental.close()
+
+    def legacy_rescan():
+        # 旧实现只能在每个片段到达后重新解析已收到的全部内容
+        received = ""
+        for index, chunk in enumerate(chunks):
+            received += chunk
+            if index % 64 == 0:
+                legacy_parse(received)
+        return legacy_parse(received)
+
+    print(f"🚀 输出大小 {len(content) / 1024:.0f}KB, {len(chunks)} 个片段（每片 {args.chunk} 字符）")
+    print("=" * 60)
+    rows = [
+        ("旧实现（整段）", lambda: legacy_parse(content)),
+        ("增量解析（整段）", lambda: parse_optimization_result(content)),
+        ("增量解析（逐片段）", feed_chunks),
+    ]
+    # 逐片段重扫是平方复杂度，只在较小输入上运行
+    if len(chunks) <= 20000:
+        rows.append(("旧实现（每64片段重扫）", legacy_rescan))
+
+    for name, func in rows:
+        print(f"{name:<24}{measure(func, args.repeat):>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+模拟的OpenAI兼容模型服务
+实现 /v1/chat/completions（含SSE流式响应），用于在不产生API费用的情况下压测
+AIClient 和优化接口。延迟、首字耗时、生成速度和错误注入均可配置，并且是确定的：
+相同种子下同一请求（按消息内容和出现次数区分）总是得到相同的延迟、错误和回复，
+与并发请求的到达顺序无关。
+
+    python scripts/fake_openai_server.py --port 9100 --ttft lognormal:0.4,0.5 --tps 60
+    python scripts/fake_openai_server.py --port 9100 --rate-429 0.05 --rate-5xx 0.02
+    python scripts/fake_openai_server.py --port 9100 --responses replies.json
+
+--responses 文件为JSON数组，按顺序匹配，命中第一条：
+    [{"match": "翻译", "content": "free-form 文本"}, {"match": "JSON", "json": {...}}]
+match 在全部消息内容中做子串匹配，省略时匹配所有请求。
+GET /stats 返回请求计数和Token用量，POST /stats/reset 清零。
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core.tokenizer import estimate_tokens
+
+
+# 覆盖应用中所有评估类调用所需字段：analyze_prompt_quality、质量评估（全面/快速/单项）和深度分析
+EVALUATION_REPLY = json.dumps({
+    "scores": {"clarity": 6, "completeness": 5, "structure": 5, "specificity": 4, "actionability": 6},
+    "overall_score": 5,
+    "issues": ["缺少输入输出说明", "缺少编程语言要求"],
+    "suggestions": ["明确编程语言", "说明输入输出格式"],
+    "strengths": ["任务目标明确"],
+    "weaknesses": ["缺少约束条件"],
+    "score": 6,
+    "reasoning": "目标明确，但缺少具体要求"
+}, ensure_ascii=False)
+
+OPTIMIZATION_REPLY = """优化后的提示词：
+请使用Python编写一个函数 add(a, b)，计算两个数的和。
+要求：支持整数和浮点数输入，包含类型注解和文档字符串，并给出调用示例。
+
+改进说明：
+1. 明确语言：指定使用Python实现
+2. 输入输出：说明支持的参数类型和返回值
+3. 代码规范：要求类型注解、文档字符串和示例
+"""
+
+FUSED_REPLY = json.dumps({
+    "analysis_before": {
+        "scores": {"clarity": 6, "completeness": 5, "structure": 5, "specificity": 4, "actionability": 6},
+        "overall_score": 5,
+        "issues": ["缺少输入输出说明", "缺少编程语言要求"]
+    },
+    "optimized_prompt": "请使用Python编写一个函数 add(a, b)，计算两个数的和。\n要求：支持整数和浮点数输入，包含类型注解和文档字符串，并给出调用示例。",
+    "improvements": [
+        {"type": "明确语言", "description": "指定使用Python实现"},
+        {"type": "输入输出", "description": "说明支持的参数类型和返回值"},
+        {"type": "代码规范", "description": "要求类型注解、文档字符串和示例"}
+    ],
+    "analysis_after": {
+        "scores": {"clarity": 9, "completeness": 8, "structure": 8, "specificity": 9, "actionability": 9},
+        "overall_score": 8.6
+    }
+}, ensure_ascii=False)
+
+_FREE_FORM_WORDS = (
+    "the", "model", "returns", "a", "concise", "answer", "with", "clear", "steps",
+    "and", "examples", "for", "each", "requirement", "of", "prompt", "output"
+)
+
+
+@dataclass
+class Distribution:
+    """
+    延迟分布（秒）
+
+    支持 fixed:v、uniform:lo,hi、normal:mean,std、lognormal:median,sigma、exp:mean，
+    采样结果不小于0。
+    """
+    kind: str
+    params: Tuple[float, ...]
+
+    @classmethod
+    def parse(cls, spec: str) -> "Distribution":
+        kind, _, args = spec.partition(":")
+        kind = kind.strip().lower()
+        try:
+            params = tuple(float(value) for value in args.split(",") if value.strip())
+        except ValueError:
+            raise ValueError(f"无效的分布参数: {spec}")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+        if kind not in expected:
+            raise ValueError(f"不支持的分布类型: {kind}")
+        if len(params) != expected[kind]:
+            raise ValueError(f"{kind} 分布需要 {expected[kind]} 个参数: {spec}")
+        return cls(kind, params)
+
+    @classmethod
+    def fixed(cls, value: float) -> "Distribution":
+        return cls("fixed", (value,))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            value = median * math.exp(rng.gauss(0.0, sigma)) if median > 0 else 0.0
+        else:
+            value = rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+@dataclass
+class CannedResponse:
+    """预设回复，match 为空时匹配所有请求"""
+    content: str
+    match: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CannedResponse":
+        if "json" in data:
+            content = json.dumps(data["json"], ensure_ascii=False)
+        elif "content" in data:
+            content = str(data["content"])
+        else:
+            raise ValueError("预设回复需要 content 或 json 字段")
+        return cls(content=content, match=str(data.get("match", "")))
+
+
+@dataclass
+class FakeServerConfig:
+    """模拟服务配置"""
+    seed: int = 0
+    ttft: Distribution = field(default_factory=lambda: Distribution.fixed(0.3))
+    tokens_per_second: float = 50.0         # 生成速度，0表示瞬间生成
+    rate_429: float = 0.0                    # 返回429的概率
+    rate_5xx: float = 0.0                    # 返回500/502/503的概率
+    retry_after: float = 1.0                 # 429响应的Retry-After（秒）
+    stream_chunk_chars: int = 8              # 流式响应每个片段的字符数
+    free_form_tokens: int = 200              # 未命中任何规则时生成的自由文本长度
+    responses: List[CannedResponse] = field(default_factory=list)
+
+
+def load_responses(path: str) -> List[CannedResponse]:
+    """读取预设回复文件"""
+    with open(path, encoding="utf-8") as f:
+        return [CannedResponse.from_dict(item) for item in json.load(f)]
+
+
+class FakeOpenAIServer:
+    """模拟的chat completions服务"""
+
+    def __init__(self, config: Optional[FakeServerConfig] = None):
+        self.config = config or FakeServerConfig()
+        self.app = self._create_app()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self._occurrences: Counter = Counter()
+        self.requests = 0
+        self.streamed = 0
+        self.status_counts: Counter = Counter()
+        self.reply_counts: Counter = Counter()
+        self.model_counts: Counter = Counter()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "streamed": self.streamed,
+            "status": {str(code): count for code, count in sorted(self.status_counts.items())},
+            "replies": dict(self.reply_counts),
+            "models": dict(self.model_counts),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight
+        }
+
+    def _request_rng(self, messages: List[Dict[str, Any]]) -> random.Random:
+        """按消息内容和出现次数派生随机数生成器，使结果与到达顺序无关"""
+        digest = hashlib.sha1(
+            json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        occurrence = self._occurrences[digest]
+        self._occurrences[digest] += 1
+        return random.Random(f"{self.config.seed}:{digest}:{occurrence}")
+
+    def select_reply(self, messages: List[Dict[str, Any]], rng: random.Random) -> Tuple[str, str]:
+        """选择回复，返回 (规则名称, 内容)"""
+        text = "\n".join(str(message.get("content", "")) for message in messages)
+        for index, canned in enumerate(self.config.responses):
+            if canned.match in text:
+                return f"custom:{index}", canned.content
+
+        system = next(
+            (str(m.get("content", "")) for m in messages if m.get("role") == "system"), ""
+        )
+        if "优化专家" in system:
+            return ("fused", FUSED_REPLY) if "JSON" in system else ("optimization", OPTIMIZATION_REPLY)
+        if "评估专家" in system or "分析专家" in system:
+            return "evaluation", EVALUATION_REPLY
+
+        words = [rng.choice(_FREE_FORM_WORDS) for _ in range(self.config.free_form_tokens)]
+        return "free_form", " ".join(words).capitalize() + "."
+
+    def _generation_time(self, tokens: int) -> float:
+        if self.config.tokens_per_second <= 0:
+            return 0.0
+        return tokens / self.config.tokens_per_second
+
+    def _error_response(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        self.status_counts[status_code] += 1
+        error_type = "rate_limit_error" if status_code == 429 else "server_error"
+        return JSONResponse(
+            status_code=status_code,
+            content={"error": {"message": message, "type": error_type, "code": status_code}},
+            headers=headers
+        )
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        model = body.get("model", "fake-model")
+        stream = bool(body.get("stream"))
+
+        self.requests += 1
+        self.model_counts[model] += 1
+        rng = self._request_rng(messages)
+        # 每个请求固定的采样顺序，保证同一请求在不同配置下的可比性
+        ttft = self.config.ttft.sample(rng)
+        error_draw = rng.random()
+
+        if error_draw < self.config.rate_429:
+            return self._error_response(
+                429, "Rate limit reached (injected)",
+                headers={"retry-after": f"{self.config.retry_after:g}"}
+            )
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        streaming = False
+        try:
+            await asyncio.sleep(ttft)
+            if error_draw < self.config.rate_429 + self.config.rate_5xx:
+                return self._error_response(rng.choice((500, 502, 503)), "Upstream error (injected)")
+
+            reply_name, content = self.select_reply(messages, rng)
+            prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+            completion_tokens = estimate_tokens(content)
+            self.reply_counts[reply_name] += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.status_counts[200] += 1
+            completion_id = f"chatcmpl-fake-{self.requests}"
+
+            if stream:
+                self.streamed += 1
+                # 流式响应结束时才离开进行中状态
+                streaming = True
+                return StreamingResponse(
+                    self._stream(completion_id, model, content),
+                    media_type="text/event-stream"
+                )
+
+            await asyncio.sleep(self._generation_time(completion_tokens))
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            })
+        finally:
+            if not streaming:
+                self.in_flight -= 1
+
+    async def _stream(self, completion_id: str, model: str, content: str) -> AsyncIterator[str]:
+        """按生成速度逐片段推送SSE"""
+        created = int(time.time())
+
+        def chunk(delta: Dict[str, str], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        try:
+            yield chunk({"role": "assistant", "content": ""})
+            size = max(1, self.config.stream_chunk_chars)
+            for start in range(0, len(content), size):
+                piece = content[start:start + size]
+                delay = self._generation_time(estimate_tokens(piece))
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk({"content": piece})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+        finally:
+            self.in_flight -= 1
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI(title="Fake OpenAI API")
+        app.add_api_route("/v1/chat/completions", self.chat_completions, methods=["POST"])
+
+        @app.get("/v1/models")
+        async def list_models():
+            return {"object": "list", "data": [{"id": "fake-model", "object": "model", "owned_by": "fake"}]}
+
+        @app.get("/stats")
+        async def stats():
+            return self.get_stats()
+
+        @app.post("/stats/reset")
+        async def reset():
+            self.reset_stats()
+            return {"status": "ok"}
+
+        return app
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """注册模拟服务的命令行参数，负载测试脚本复用"""
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--ttft", default="fixed:0.3", help="首字耗时分布，如 lognormal:0.4,0.5")
+    parser.add_argument("--tps", type=float, default=50.0, help="每秒生成Token数，0表示瞬间生成")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回429的概率")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="返回5xx的概率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429响应的Retry-After（秒）")
+    parser.add_argument("--stream-chunk-chars", type=int, default=8, help="流式片段字符数")
+    parser.add_argument("--free-form-tokens", type=int, default=200, help="自由文本回复长度（词）")
+    parser.add_argument("--responses", help="预设回复JSON文件")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeServerConfig:
+    return FakeServerConfig(
+        seed=args.seed,
+        ttft=Distribution.parse(args.ttft),
+        tokens_per_second=args.tps,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        stream_chunk_chars=args.stream_chunk_chars,
+        free_form_tokens=args.free_form_tokens,
+        responses=load_responses(args.responses) if args.responses else []
+    )
+
+
+def server_arguments(args: argparse.Namespace) -> List[str]:
+    """把已解析的参数还原为命令行，用于启动子进程"""
+    argv = [
+        "--seed", str(args.seed), "--ttft", args.ttft, "--tps", str(args.tps),
+        "--rate-429", str(args.rate_429), "--rate-5xx", str(args.rate_5xx),
+        "--retry-after", str(args.retry_after),
+        "--stream-chunk-chars", str(args.stream_chunk_chars),
+        "--free-form-tokens", str(args.free_form_tokens)
+    ]
+    if args.responses:
+        argv += ["--responses", args.responses]
+    return argv
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="模拟的OpenAI兼容模型服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=9100, help="监听端口")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = config_from_args(args)
+    server = FakeOpenAIServer(config)
+    print(
+        f"🚀 模拟模型服务 http://{args.host}:{args.port}/v1  "
+        f"TTFT {config.ttft}，{config.tokens_per_second:g} tokens/s，"
+        f"429 {config.rate_429:.0%}，5xx {config.rate_5xx:.0%}"
+    )
+    uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
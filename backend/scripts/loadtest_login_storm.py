@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+登录风暴负载测试
+在进程内启动应用（临时SQLite数据库），并发发起大量登录请求，同时按固定间隔
+探测与认证无关的接口，统计探测请求的延迟分位数
+
+    python scripts/loadtest_login_storm.py --logins 40 --workers 2
+    python scripts/loadtest_login_storm.py --logins 40 --inline   # 对照：在事件循环中直接计算bcrypt
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_tmp_dir, 'loadtest.db')}")
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("BATCH_JOB_WORKER_ENABLED", "false")
+
+import httpx
+
+from app.core import password_hasher as password_hasher_module
+from app.core.password_hasher import PasswordHasher
+from app.database import create_tables
+from app.main import app
+
+PROBE_PATH = "/api/v1/optimizer/runtime-stats"
+USERNAME = "stormuser"
+PASSWORD = "Storm12345"
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float):
+    """
+    持续探测无关接口，返回每次请求的延迟（毫秒）
+
+    延迟从计划发出的时刻算起，事件循环被阻塞导致的推迟也计入其中。
+    """
+    latencies = []
+    while not stop.is_set():
+        intended = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        response = await client.get(PROBE_PATH)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - intended) * 1000)
+    return latencies
+
+
+def summarize(name: str, latencies) -> None:
+    print(
+        f"{name:<16}{len(latencies):>8}"
+        f"{statistics.median(latencies):>12.1f}{percentile(latencies, 0.99):>12.1f}{max(latencies):>12.1f}"
+    )
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="登录风暴负载测试")
+    parser.add_argument("--logins", type=int, default=40, help="并发登录请求数")
+    parser.add_argument("--workers", type=int, default=2, help="密码哈希线程数")
+    parser.add_argument("--interval", type=float, default=0.01, help="探测间隔（秒）")
+    parser.add_argument("--baseline", type=float, default=1.0, help="无负载时的探测时长（秒）")
+    parser.add_argument("--inline", action="store_true", help="在事件循环中直接计算bcrypt（旧行为）")
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.logins)
+    if args.inline:
+        async def run_inline(func, *func_args):
+            return func(*func_args)
+        hasher._run = run_inline
+    # AuthService 在调用时读取模块级实例
+    import app.services.auth_service as auth_service_module
+    auth_service_module.password_hasher = hasher
+    password_hasher_module.password_hasher = hasher
+
+    await create_tables()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        response = await client.post("/api/v1/auth/register", json={
+            "username": USERNAME, "email": "storm@example.com", "password": PASSWORD
+        })
+        response.raise_for_status()
+
+        print(f"🚀 并发登录 {args.logins} 次，bcrypt {'在事件循环中执行' if args.inline else f'在 {args.workers} 个线程中执行'}")
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, args.interval))
+        await asyncio.sleep(args.baseline)
+        stop.set()
+        baseline = await probe_task
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, args.interval))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/auth/login", json={"username": USERNAME, "password": PASSWORD})
+            for _ in range(args.logins)
+        ))
+        storm_time = time.perf_counter() - start
+        stop.set()
+        storm = await probe_task
+
+    succeeded = sum(1 for r in responses if r.status_code == 200)
+    print(f"✅ 登录成功 {succeeded}/{args.logins}，耗时 {storm_time:.2f}s")
+    print("=" * 60)
+    print(f"{'探测阶段':<16}{'请求数':>8}{'p50(ms)':>12}{'p99(ms)':>12}{'max(ms)':>12}")
+    summarize("无负载", baseline)
+    summarize("登录风暴中", storm)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
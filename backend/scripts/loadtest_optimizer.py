@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+优化接口端到端负载测试
+按目标RPS以开环方式（不等待前一个请求完成）向优化接口发送请求，统计吞吐、
+延迟分位数、错误和Token成本。模型服务默认由 fake_openai_server.py 在子进程中
+模拟，应用在进程内启动（临时SQLite数据库），不产生任何API费用。
+
+    python scripts/loadtest_optimizer.py --scenario optimize --rps 5 --duration 20
+    python scripts/loadtest_optimizer.py --scenario fused --rps 10 --ttft lognormal:0.4,0.6
+    python scripts/loadtest_optimizer.py --scenario stream --rate-429 0.05 --output result.json
+    python scripts/loadtest_optimizer.py --scenario batch --batch-size 5 --rps 1
+    python scripts/loadtest_optimizer.py --target http://127.0.0.1:8000 --upstream http://127.0.0.1:9100
+
+延迟从计划发出的时刻算起，应用排队造成的推迟也计入其中。进程内运行时流式响应
+会整体返回，首字延迟只在 --target 指向独立部署的服务时有意义。响应缓存默认
+开启，提示词默认互不相同；语义缓存默认关闭，可通过环境变量覆盖。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_tmp_dir, 'loadtest.db')}")
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("BATCH_JOB_WORKER_ENABLED", "false")
+os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+os.environ.setdefault("SEMANTIC_CACHE_PATH", os.path.join(_tmp_dir, "semantic_cache.npz"))
+os.environ.setdefault("OPENAI_API_KEY", "loadtest-key")
+
+import httpx
+
+from app.config import settings
+from fake_openai_server import add_server_arguments, server_arguments
+
+API_PREFIX = "/api/v1"
+USERNAME = "loaduser"
+PASSWORD = "Load12345"
+
+TOPICS = ("数据清洗", "接口设计", "单元测试", "营销文案", "论文摘要", "SQL查询", "日志分析", "产品说明")
+TASKS = ("写一个Python函数", "列出实施步骤", "给出三个示例", "写一段说明", "设计评估指标")
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def build_prompt(index: int, distinct: int) -> str:
+    """生成确定的提示词，distinct>0 时只有 distinct 种不同内容"""
+    key = index % distinct if distinct else index
+    return f"请围绕{TOPICS[key % len(TOPICS)]}{TASKS[key % len(TASKS)]}，要求结构清晰并说明输出格式（编号{key}）"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_upstream(args: argparse.Namespace) -> tuple:
+    """在子进程中启动模拟模型服务，返回 (进程, 地址)"""
+    port = free_port()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_openai_server.py")
+    process = subprocess.Popen(
+        [sys.executable, script, "--port", str(port), *server_arguments(args)],
+        stdout=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("模拟模型服务启动失败")
+        try:
+            httpx.get(f"{url}/stats", timeout=0.5).raise_for_status()
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("等待模拟模型服务启动超时")
+
+
+class Recorder:
+    """收集每个请求的结果"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_byte: List[float] = []
+        self.status: Counter = Counter()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    def add_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        if usage:
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            self.cost += usage.get("cost_estimate", 0.0)
+
+
+async def send_json(client: httpx.AsyncClient, path: str, payload: Dict, headers: Dict, recorder: Recorder) -> str:
+    response = await client.post(path, json=payload, headers=headers)
+    if response.status_code != 200:
+        return str(response.status_code)
+    body = response.json()
+    if "results" in body:
+        for item in body["results"]:
+            recorder.add_usage(item.get("token_usage"))
+        if body.get("success_count", 0) < body.get("total_count", 0):
+            return "partial"
+    else:
+        recorder.add_usage(body.get("token_usage"))
+    return "ok"
+
+
+async def send_stream(
+    client: httpx.AsyncClient, path: str, payload: Dict, recorder: Recorder, intended: float
+) -> str:
+    outcome = "incomplete"
+    event = None
+    async with client.stream("POST", path, json=payload) as response:
+        if response.status_code != 200:
+            return str(response.status_code)
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "delta" and outcome == "incomplete":
+                    recorder.first_byte.append((time.perf_counter() - intended) * 1000)
+                    outcome = "streaming"
+                elif event == "final":
+                    recorder.add_usage(data.get("usage_stats"))
+                elif event == "done":
+                    return "ok"
+                elif event == "error":
+                    return "error_event"
+    return outcome
+
+
+async def run_load(client: httpx.AsyncClient, args: argparse.Namespace, headers: Dict) -> tuple:
+    """开环发送请求，返回 (记录, 实际耗时)"""
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    total = max(1, int(args.rps * args.duration))
+
+    def payload_for(index: int) -> tuple:
+        if args.scenario == "batch":
+            prompts = [build_prompt(index * args.batch_size + k, args.distinct) for k in range(args.batch_size)]
+            return "/optimizer/batch-optimize", {"prompts": prompts, "optimization_mode": "standard"}
+        prompt = build_prompt(index, args.distinct)
+        if args.scenario == "evaluate":
+            return "/optimizer/evaluate", {"prompt": prompt, "mode": args.evaluate_mode}
+        if args.scenario == "stream":
+            return "/optimizer/optimize/stream", {"original_prompt": prompt}
+        mode = "fused" if args.scenario == "fused" else "standard"
+        return "/optimizer/optimize", {"original_prompt": prompt, "optimization_mode": mode}
+
+    async def run_one(index: int, intended: float) -> None:
+        path, payload = payload_for(index)
+        try:
+            if args.scenario == "stream":
+                outcome = await send_stream(client, API_PREFIX + path, payload, recorder, intended)
+            else:
+                outcome = await send_json(client, API_PREFIX + path, payload, headers, recorder)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        recorder.status[outcome] += 1
+        recorder.latencies.append((time.perf_counter() - intended) * 1000)
+
+    tasks = []
+    start = time.perf_counter()
+    offset = 0.0
+    for index in range(total):
+        intended = start + offset
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(run_one(index, intended)))
+        offset += rng.expovariate(args.rps) if args.arrival == "poisson" else 1.0 / args.rps
+    await asyncio.gather(*tasks)
+    return recorder, time.perf_counter() - start
+
+
+def summarize(args: argparse.Namespace, recorder: Recorder, elapsed: float, upstream: Optional[Dict]) -> Dict:
+    latencies = recorder.latencies
+    succeeded = recorder.status.get("ok", 0)
+    summary = {
+        "scenario": args.scenario,
+        "target_rps": args.rps,
+        "requests": len(latencies),
+        "succeeded": succeeded,
+        "outcomes": dict(recorder.status),
+        "elapsed": elapsed,
+        "throughput": succeeded / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies),
+            "mean": statistics.mean(latencies)
+        },
+        "tokens": {
+            "prompt": recorder.prompt_tokens,
+            "completion": recorder.completion_tokens,
+            "cost_estimate": recorder.cost,
+            "cost_per_1k_requests": recorder.cost / succeeded * 1000 if succeeded else 0.0
+        },
+        "upstream": upstream
+    }
+    if recorder.first_byte:
+        summary["first_delta_ms"] = {
+            "p50": percentile(recorder.first_byte, 0.50),
+            "p95": percentile(recorder.first_byte, 0.95),
+            "p99": percentile(recorder.first_byte, 0.99)
+        }
+    return summary
+
+
+def print_summary(summary: Dict) -> None:
+    latency = summary["latency_ms"]
+    tokens = summary["tokens"]
+    print("=" * 60)
+    print(f"✅ 成功 {summary['succeeded']}/{summary['requests']}，耗时 {summary['elapsed']:.1f}s，"
+          f"吞吐 {summary['throughput']:.2f} req/s（目标 {summary['target_rps']:g}）")
+    failures = {k: v for k, v in summary["outcomes"].items() if k != "ok"}
+    if failures:
+        print(f"❌ 失败: {failures}")
+    print(f"{'延迟(ms)':<16}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    print(f"{'完整响应':<16}{latency['p50']:>10.0f}{latency['p95']:>10.0f}{latency['p99']:>10.0f}{latency['max']:>10.0f}")
+    if "first_delta_ms" in summary:
+        first = summary["first_delta_ms"]
+        print(f"{'首个delta':<16}{first['p50']:>10.0f}{first['p95']:>10.0f}{first['p99']:>10.0f}")
+    print(f"💰 Token 输入 {tokens['prompt']}，输出 {tokens['completion']}，"
+          f"成本估算 ${tokens['cost_estimate']:.4f}（每千请求 ${tokens['cost_per_1k_requests']:.4f}）")
+    upstream = summary["upstream"]
+    if upstream:
+        per_request = upstream["requests"] / summary["requests"] if summary["requests"] else 0.0
+        print(f"📡 上游调用 {upstream['requests']} 次（每请求 {per_request:.2f} 次），"
+              f"状态 {upstream['status']}，最大并发 {upstream['max_in_flight']}，"
+              f"Token 输入 {upstream['prompt_tokens']} 输出 {upstream['completion_tokens']}，"
+              f"成本估算 ${upstream['cost_estimate']:.4f}")
+    hedging = summary.get("hedging")
+    if hedging:
+        print(f"🔀 对冲 {hedging['hedges_sent']} 次（占主请求 {hedging['hedge_rate']:.1%}），"
+              f"对冲胜出率 {hedging['hedge_win_rate']:.1%}，预算不足 {hedging['budget_exhausted']} 次")
+
+
+async def run(args: argparse.Namespace, upstream_url: str) -> Dict:
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, timeout=args.timeout)
+    else:
+        from app.database import create_tables
+        from app.main import app
+
+        await create_tables()
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=args.timeout
+        )
+
+    async with client, httpx.AsyncClient(base_url=upstream_url, timeout=10) as upstream:
+        # 先注册用户：免登录接口使用第一个用户，避免并发的首个请求同时创建默认用户
+        await client.post(f"{API_PREFIX}/auth/register", json={
+            "username": USERNAME, "email": "load@example.com", "password": PASSWORD
+        })
+        headers = {}
+        if args.scenario == "batch":
+            response = await client.post(f"{API_PREFIX}/auth/login", json={
+                "username": USERNAME, "password": PASSWORD
+            })
+            response.raise_for_status()
+            headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        await upstream.post("/stats/reset")
+        print(f"🚀 场景 {args.scenario}，目标 {args.rps:g} req/s × {args.duration:g}s（{args.arrival}到达）")
+        recorder, elapsed = await run_load(client, args, headers)
+        try:
+            upstream_stats = (await upstream.get("/stats")).json()
+        except httpx.HTTPError:
+            upstream_stats = None
+
+    if upstream_stats is not None:
+        from app.core.ai_client import ai_client
+
+        # 响应中的用量只含优化调用本身，上游统计包含分析和再评估的全部调用
+        upstream_stats["cost_estimate"] = ai_client.estimate_cost(
+            upstream_stats["prompt_tokens"], upstream_stats["completion_tokens"]
+        )
+
+    summary = summarize(args, recorder, elapsed, upstream_stats)
+    if not args.target:
+        from app.core.ai_client import ai_client
+
+        summary["hedging"] = ai_client.get_runtime_stats()["hedging"]
+    return summary
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="优化接口端到端负载测试")
+    parser.add_argument("--scenario", choices=["optimize", "fused", "stream", "evaluate", "batch"],
+                        default="optimize", help="压测场景")
+    parser.add_argument("--rps", type=float, default=5.0, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=20.0, help="发送请求的时长（秒）")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="uniform", help="请求到达方式")
+    parser.add_argument("--distinct", type=int, default=0, help="不同提示词的数量，0表示全部不同")
+    parser.add_argument("--batch-size", type=int, default=5, help="batch场景每个请求的提示词数")
+    parser.add_argument("--evaluate-mode", choices=["llm", "fast", "auto"], default="llm", help="evaluate场景的评估模式")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个请求超时（秒）")
+    parser.add_argument("--target", help="被测服务地址，默认在进程内启动应用")
+    parser.add_argument("--upstream", help="已运行的模拟模型服务地址，默认在子进程中启动")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    process = None
+    upstream_url = args.upstream
+    if upstream_url is None:
+        process, upstream_url = start_fake_upstream(args)
+    upstream_url = upstream_url.rstrip("/")
+    # AIClient 在首次请求时才读取服务地址
+    settings.OPENAI_BASE_URL = f"{upstream_url}/v1"
+
+    try:
+        summary = asyncio.run(run(args, upstream_url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📝 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,22 @@
- 
\ No newline at end of file
+"""
+测试公共配置
+"""
+
+import pytest
+
+from app.config import settings
+from app.core.principal_cache import principal_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_semantic_cache(tmp_path, monkeypatch):
+    """语义缓存索引写入临时目录，避免读取或污染本地持久化文件"""
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_PATH", str(tmp_path / "semantic_cache.npz"))
+
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache():
+    """每个测试使用空的认证主体缓存，避免不同测试数据库中的同ID用户串用"""
+    principal_cache.clear()
+    yield
+    principal_cache.clear()
@@ -0,0 +1,144 @@
+"""
+AI客户端测试
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.ai_client import AIClient
+from app.core.tokenizer import TokenCounter
+from app.main import app
+
+
+class ScriptedCompletions:
+    """按顺序返回预设回复的模拟chat.completions接口"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def create(self, model, messages, **kwargs):
+        self.calls.append(messages)
+        content = self.replies.pop(0)
+        if kwargs.get("stream"):
+            return self._stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    async def _stream(self, content, size=3):
+        """按固定长度切片模拟流式返回"""
+        for index in range(0, len(content), size):
+            delta = SimpleNamespace(content=content[index:index + size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class CharEncoding:
+    """离线使用的简单编码器，每个字符计为一个token"""
+
+    def encode(self, text):
+        return list(text)
+
+
+def make_client(replies) -> tuple[AIClient, ScriptedCompletions]:
+    """创建使用模拟接口的AI客户端"""
+    client = AIClient()
+    completions = ScriptedCompletions(replies)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.token_counter = TokenCounter(encoding=CharEncoding())
+    return client, completions
+
+
+FUSED_REPLY = json.dumps({
+    "analysis_before": {"scores": {"clarity": 4}, "overall_score": 4, "issues": ["过于简短"]},
+    "optimized_prompt": "请用Python编写函数 add(a, b)，返回两个数的和。",
+    "improvements": [{"type": "明确语言", "description": "指定使用Python"}],
+    "analysis_after": {"scores": {"clarity": 9}, "overall_score": 8.5}
+}, ensure_ascii=False)
+
+
+async def test_fused_mode_uses_single_request():
+    """融合模式只发起一次请求并解析前后评分"""
+    client, completions = make_client([FUSED_REPLY])
+
+    result = await client.optimize_prompt("写一个函数计算两个数的和", "code", mode="fused")
+
+    assert len(completions.calls) == 1
+    assert result.optimized_prompt.startswith("请用Python编写函数")
+    assert result.improvements == [{"type": "明确语言", "description": "指定使用Python"}]
+    assert result.quality_score_before == 4
+    assert result.quality_score_after == 8.5
+    assert result.usage_stats.total_tokens > 0
+
+
+async def test_fused_mode_falls_back_to_text_format():
+    """融合模式回复不是JSON时按文本格式解析"""
+    reply = "优化后的提示词：\n请计算两个数的和\n改进说明：\n1. 清晰度: 更加明确"
+    client, _ = make_client([reply])
+
+    result = await client.optimize_prompt("计算和", mode="fused")
+
+    assert result.optimized_prompt == "请计算两个数的和"
+    assert result.improvements[0]["type"] == "清晰度"
+    assert result.quality_score_before == 5
+
+
+async def test_standard_mode_makes_three_requests():
+    """标准模式依次发起分析、优化、再分析三次请求"""
+    analysis = json.dumps({"scores": {}, "overall_score": 6, "issues": [], "suggestions": []})
+    optimization = "优化后的提示词：\n请计算两个数的和\n改进说明：\n1. 清晰度: 更加明确"
+    client, completions = make_client([analysis, optimization, analysis])
+
+    result = await client.optimize_prompt("计算和")
+
+    assert len(completions.calls) == 3
+    assert result.quality_score_before == 6
+
+
+async def test_unknown_mode_rejected():
+    """不支持的优化模式抛出异常"""
+    client, _ = make_client([])
+
+    with pytest.raises(ValueError):
+        await client.optimize_prompt("计算和", mode="turbo")
+
+
+async def test_optimize_prompt_stream_emits_events_in_order():
+    """流式优化依次推送分析、增量文本、改进说明和最终结果"""
+    analysis = json.dumps({"scores": {"clarity": 4}, "overall_score": 4, "issues": ["太笼统"], "suggestions": []})
+    optimized = (
+        "优化后的提示词：\n请用Python编写函数 add(a, b)，\n返回两数之和。\n\n"
+        "改进说明：\n1. 明确语言:指定使用Python\n2. 明确输出:说明返回值\n"
+    )
+    after = json.dumps({"scores": {"clarity": 8}, "overall_score": 8, "issues": [], "suggestions": []})
+    client, completions = make_client([analysis, optimized, after])
+    client.cache = None
+    client.semantic_cache = None
+
+    events = [item async for item in client.optimize_prompt_stream("写一个加法函数", "code")]
+    names = [item["event"] for item in events]
+
+    assert names[:2] == ["start", "analysis"]
+    assert names[-1] == "final"
+    assert names.index("improvement") > max(i for i, name in enumerate(names) if name == "delta")
+    assert events[1]["data"]["overall_score"] == 4
+
+    streamed = "".join(item["data"]["text"] for item in events if item["event"] == "delta")
+    final = events[-1]["data"]
+    assert streamed == final["optimized_prompt"] == "请用Python编写函数 add(a, b)，\n返回两数之和。"
+    assert [item["data"]["type"] for item in events if item["event"] == "improvement"] == ["明确语言", "明确输出"]
+    assert final["quality_score_before"] == 4
+    assert final["quality_score_after"] == 8
+    assert len(completions.calls) == 3
+
+
+def test_stream_endpoint_rejects_fused_mode():
+    """流式优化接口只支持standard模式，fused模式在开始推送前返回400"""
+    response = TestClient(app).post(
+        "/api/v1/optimizer/optimize/stream",
+        json={"original_prompt": "写一个加法函数", "optimization_mode": "fused"}
+    )
+
+    assert response.status_code == 400
+    assert "fused" in response.json()["detail"]
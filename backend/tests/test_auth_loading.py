@@ -0,0 +1,93 @@
+"""
+认证用户加载测试
+"""
+
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.dependencies import get_current_user
+from app.core.security import create_access_token
+from app.database import Base
+from app.models.batch_job import BatchJob, BatchJobItem
+from app.models.optimization import Optimization, OptimizationImprovement, OptimizationTemplate
+from app.models.user import LoginHistory, User
+from app.services.auth_service import AuthService
+from app.services.user_service import UserService
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """包含一个带历史数据用户的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'auth.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as db:
+        db.add(User(id=1, username="alice", email="alice@example.com", hashed_password="hash", preferences="{}"))
+        db.add_all(
+            Optimization(
+                user_id=1,
+                original_prompt="原始",
+                optimized_prompt="优化",
+                improvements=[OptimizationImprovement(improvement_type="明确", description="补充细节")]
+            )
+            for _ in range(5)
+        )
+        db.add_all(LoginHistory(user_id=1, ip_address="127.0.0.1") for _ in range(5))
+        await db.flush()
+        db.add(BatchJob(id=1, user_id=1, total_count=1))
+        db.add(BatchJobItem(job_id=1, position=0, prompt="原始", optimization_id=1))
+        db.add(OptimizationTemplate(
+            name="模板", category="通用", optimization_type="general",
+            template_content="内容", instruction="说明", created_by=1
+        ))
+        await db.commit()
+    yield engine
+    await engine.dispose()
+
+
+async def test_current_user_loads_identity_columns_only(engine):
+    """认证依赖只发出一条查询，不加载历史数据和敏感列"""
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(subject=1))
+
+    async with AsyncSession(engine) as db:
+        user = await get_current_user(credentials, db)
+
+        assert user.username == "alice"
+        assert len(statements) == 1
+        assert "hashed_password" not in statements[0]
+        with pytest.raises(InvalidRequestError):
+            user.optimizations
+        with pytest.raises(InvalidRequestError):
+            user.hashed_password
+
+        # 同一会话中的完整查询会补齐未加载的列
+        full = await AuthService(db).get_user_by_id(1)
+        assert full is user
+        assert user.hashed_password == "hash"
+
+
+async def test_delete_user_cascades_history(engine):
+    """删除用户时批量删除历史数据，不把历史记录加载到会话中"""
+    statements = []
+
+    def listener(*args):
+        statements.append(args[2])
+
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+
+    async with AsyncSession(engine) as db:
+        assert await UserService(db).delete_user(1)
+
+        assert not any(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+        for model in (Optimization, OptimizationImprovement, LoginHistory, BatchJob, BatchJobItem, User):
+            assert (await db.execute(select(func.count()).select_from(model))).scalar_one() == 0
+        # 共享模板保留，只解除创建者关联
+        template = (await db.execute(select(OptimizationTemplate))).scalar_one()
+        assert template.created_by is None
+        assert not await UserService(db).delete_user(1)
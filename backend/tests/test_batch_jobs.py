@@ -0,0 +1,362 @@
+"""
+批量优化任务测试
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.ai_client import AIServiceException, AIUsageStats, OptimizationResult
+from app.core.dependencies import get_current_user
+from app.utils.exceptions import CircuitOpenException
+from app.database import Base
+from app.main import app
+from app.models.batch_job import BatchJobItem, BatchJobItemStatus
+from app.models.optimization import Optimization
+from app.models.user import User
+from app.services.batch_job_service import BatchJobService, BatchJobWorker
+
+
+class FakeAIClient:
+    """记录并发度的模拟AI客户端，包含"失败"的提示词会报错"""
+
+    model = "fake-model"
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.prompts = []
+
+    async def optimize_prompt(self, original_prompt, optimization_type="general", mode="standard"):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            self.prompts.append(original_prompt)
+            if "失败" in original_prompt:
+                raise AIServiceException("模拟失败")
+            return OptimizationResult(
+                optimized_prompt=f"优化：{original_prompt}",
+                improvements=[{"type": "明确", "description": "补充细节"}],
+                quality_score_before=4,
+                quality_score_after=8,
+                usage_stats=AIUsageStats(total_tokens=10),
+                processing_time=self.delay
+            )
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    """使用临时SQLite文件的会话工厂"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as db:
+        db.add(User(username="tester", email="tester@example.com", hashed_password="x"))
+        await db.commit()
+    yield maker
+    await engine.dispose()
+
+
+async def create_job(session_maker, prompts):
+    async with session_maker() as db:
+        return await BatchJobService(db).create_job(1, prompts, "general", "fused")
+
+
+async def wait_for_completion(session_maker, job_id, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        async with session_maker() as db:
+            job = await BatchJobService(db).get_job(job_id)
+        if job.status == "completed":
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError("任务未在限定时间内完成")
+
+
+async def test_worker_processes_job_with_bounded_concurrency(session_maker):
+    """worker按并发上限处理全部任务项，结果按完成顺序分页"""
+    prompts = [f"提示词{i}" for i in range(19)] + ["会失败的提示词"]
+    job = await create_job(session_maker, prompts)
+    assert job.status == "pending"
+    assert job.total_count == 20
+
+    client = FakeAIClient()
+    worker = BatchJobWorker(session_maker=session_maker, client=client, concurrency=3, poll_interval=0.05)
+    await worker.start()
+    worker.notify()
+    job = await wait_for_completion(session_maker, job.id)
+    await worker.stop()
+
+    assert client.peak == 3
+    assert (job.succeeded_count, job.failed_count) == (19, 1)
+    assert job.started_at is not None and job.finished_at is not None
+
+    async with session_maker() as db:
+        service = BatchJobService(db)
+        first_page = await service.get_results(job.id, skip=0, limit=15)
+        second_page = await service.get_results(job.id, skip=15, limit=15)
+
+    assert len(first_page) == 15
+    assert len(second_page) == 5
+    items = first_page + second_page
+    assert sorted(item.position for item in items) == list(range(20))
+    failed = [item for item in items if item.status == BatchJobItemStatus.FAILED]
+    assert failed[0].error == "模拟失败"
+    succeeded = next(item for item in items if item.status == BatchJobItemStatus.SUCCEEDED)
+    assert succeeded.optimization.optimized_prompt == f"优化：{succeeded.prompt}"
+    assert succeeded.optimization.improvements[0].description == "补充细节"
+
+
+async def test_restart_resumes_interrupted_items(session_maker):
+    """重启时中断的任务项重新排队，已完成的项不会重复处理"""
+    await create_job(session_maker, [f"提示词{i}" for i in range(6)])
+
+    client = FakeAIClient(delay=0.2)
+    worker = BatchJobWorker(session_maker=session_maker, client=client, concurrency=2, poll_interval=0.05)
+    await worker.start()
+    await asyncio.sleep(0.1)
+    await worker.stop()
+
+    # 模拟进程崩溃：处理中的项停留在running状态
+    async with session_maker() as db:
+        await db.execute(
+            update(BatchJobItem).where(BatchJobItem.position == 5).values(status=BatchJobItemStatus.RUNNING)
+        )
+        await db.execute(
+            update(BatchJobItem)
+            .where(BatchJobItem.position == 0)
+            .values(status=BatchJobItemStatus.SUCCEEDED, finished_at=None)
+        )
+        await db.commit()
+
+    client = FakeAIClient()
+    worker = BatchJobWorker(session_maker=session_maker, client=client, concurrency=2, poll_interval=0.05)
+    await worker.start()
+    assert worker.recovered == 1
+    for _ in range(250):
+        if len(client.prompts) == 5 and worker.get_stats()["in_flight"] == 0:
+            break
+        await asyncio.sleep(0.02)
+    await worker.stop()
+
+    assert sorted(client.prompts) == [f"提示词{i}" for i in range(1, 6)]
+    async with session_maker() as db:
+        statuses = (await db.execute(select(BatchJobItem.status))).scalars().all()
+    assert statuses.count(BatchJobItemStatus.SUCCEEDED) == 6
+
+
+async def test_jobs_are_scoped_to_owner(session_maker):
+    """任务和结果只对创建者可见"""
+    job = await create_job(session_maker, ["提示词"])
+    async with session_maker() as db:
+        db.add(User(username="other", email="other@example.com", hashed_password="x"))
+        await db.commit()
+
+    worker = BatchJobWorker(session_maker=session_maker, client=FakeAIClient(), concurrency=1, poll_interval=0.05)
+    await worker.start()
+    await wait_for_completion(session_maker, job.id)
+    await worker.stop()
+
+    async with session_maker() as db:
+        service = BatchJobService(db)
+        assert (await service.get_job(job.id, user_id=1)).id == job.id
+        assert await service.get_job(job.id, user_id=2) is None
+        assert len(await service.get_results(job.id, user_id=1)) == 1
+        assert await service.get_results(job.id, user_id=2) == []
+
+
+def test_job_endpoints_require_authentication():
+    """任务接口需要登录"""
+    client = TestClient(app)
+    assert client.post("/api/v1/optimizer/jobs", json={"prompts": ["提示词"]}).status_code == 401
+    assert client.get("/api/v1/optimizer/jobs/1").status_code == 401
+    assert client.get("/api/v1/optimizer/jobs/1/results").status_code == 401
+
+
+class FlakyAIClient(FakeAIClient):
+    """前几次调用抛出熔断异常（暂时性错误）"""
+
+    def __init__(self, transient_failures):
+        super().__init__(delay=0.0)
+        self.transient_failures = transient_failures
+
+    async def optimize_prompt(self, original_prompt, optimization_type="general", mode="standard"):
+        if self.transient_failures > 0:
+            self.transient_failures -= 1
+            raise CircuitOpenException("熔断中", retry_after=0.0)
+        return await super().optimize_prompt(original_prompt, optimization_type, mode)
+
+
+async def item_state(session_maker):
+    async with session_maker() as db:
+        return (await db.execute(select(BatchJobItem))).scalar_one()
+
+
+async def test_transient_errors_are_retried_up_to_max_attempts(session_maker):
+    """暂时性错误重新排队后重试，达到最大尝试次数才标记为失败"""
+    job = await create_job(session_maker, ["提示词"])
+    client = FlakyAIClient(transient_failures=2)
+    worker = BatchJobWorker(session_maker=session_maker, client=client, concurrency=1,
+                            poll_interval=0.02, max_attempts=3, retry_delay=0.0)
+    await worker.start()
+    job = await wait_for_completion(session_maker, job.id)
+    await worker.stop()
+    assert (job.succeeded_count, job.failed_count) == (1, 0)
+    assert worker.retried == 2
+    assert (await item_state(session_maker)).attempts == 3
+
+    job = await create_job(session_maker, ["提示词"])
+    client = FlakyAIClient(transient_failures=10)
+    worker = BatchJobWorker(session_maker=session_maker, client=client, concurrency=1,
+                            poll_interval=0.02, max_attempts=2, retry_delay=0.0)
+    await worker.start()
+    job = await wait_for_completion(session_maker, job.id)
+    await worker.stop()
+    assert (job.succeeded_count, job.failed_count) == (0, 1)
+    assert worker.retried == 1
+
+
+async def test_retry_backoff_delays_next_claim(session_maker):
+    """重新排队的任务项在退避时间内不会被领取"""
+    await create_job(session_maker, ["提示词"])
+    worker = BatchJobWorker(session_maker=session_maker, client=FlakyAIClient(1), retry_delay=60.0)
+    [item] = await worker.claim(1)
+    await worker._process(item)
+
+    state = await item_state(session_maker)
+    assert state.status == BatchJobItemStatus.PENDING
+    assert state.next_attempt_at is not None
+    assert await worker.claim(1) == []
+    assert worker._backoff(3, retry_after=1.0) == 240.0
+
+
+async def test_failed_save_is_requeued(session_maker):
+    """保存结果失败时任务项重新排队，不会停留在running状态"""
+    await create_job(session_maker, ["提示词"])
+    worker = BatchJobWorker(session_maker=session_maker, client=FakeAIClient(delay=0.0), retry_delay=0.0)
+    [item] = await worker.claim(1)
+
+    original_finish = worker._finish
+
+    async def broken_finish(item, result=None, error=None):
+        raise RuntimeError("数据库不可用")
+
+    worker._finish = broken_finish
+    await worker._process(item)
+    assert (await item_state(session_maker)).status == BatchJobItemStatus.PENDING
+
+    worker._finish = original_finish
+    [item] = await worker.claim(1)
+    await worker._process(item)
+    assert (await item_state(session_maker)).status == BatchJobItemStatus.SUCCEEDED
+
+
+async def test_finishing_an_item_twice_counts_once(session_maker):
+    """同一任务项重复完成时只保存一次结果、计数一次"""
+    job = await create_job(session_maker, ["提示词", "提示词2"])
+    worker = BatchJobWorker(session_maker=session_maker, client=FakeAIClient(delay=0.0))
+    [item] = await worker.claim(1)
+
+    await worker._process(item)
+    await worker._process(item)
+
+    async with session_maker() as db:
+        job = await BatchJobService(db).get_job(job.id)
+        optimizations = (await db.execute(select(func.count()).select_from(Optimization))).scalar_one()
+    assert (job.succeeded_count, job.failed_count) == (1, 0)
+    assert optimizations == 1
+    assert worker.succeeded == 1
+
+
+async def test_live_leases_are_not_recovered(session_maker):
+    """其他worker租约未过期的任务项不会被恢复或领取；租约过期后被接手，原worker的结果不再保存"""
+    job = await create_job(session_maker, ["提示词"])
+    first = BatchJobWorker(session_maker=session_maker, client=FakeAIClient(delay=0.0), lease_seconds=60.0)
+    second = BatchJobWorker(session_maker=session_maker, client=FakeAIClient(delay=0.0), lease_seconds=60.0)
+    [item] = await first.claim(1)
+
+    assert await second.recover() == 0
+    assert await second.claim(1) == []
+    assert await first.renew_leases() == 1
+    assert await second.renew_leases() == 0
+
+    # 模拟第一个worker失联，租约过期
+    async with session_maker() as db:
+        await db.execute(update(BatchJobItem).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        await db.commit()
+    [taken] = await second.claim(1)
+    assert taken["attempts"] == 2
+
+    await first._process(item)
+    await second._process(taken)
+    async with session_maker() as db:
+        job = await BatchJobService(db).get_job(job.id)
+    assert (job.succeeded_count, job.failed_count) == (1, 0)
+    assert (first.succeeded, second.succeeded) == (0, 1)
+
+
+async def test_results_page_by_completion_sequence(session_maker):
+    """结果按完成序号分页，序号连续，已读取的页之后完成的项追加在末尾"""
+    job = await create_job(session_maker, [f"提示词{i}" for i in range(4)])
+    worker = BatchJobWorker(session_maker=session_maker, client=FakeAIClient(delay=0.0))
+    first, second, third, fourth = await worker.claim(4)
+
+    for item in (third, first):
+        await worker._process(item)
+    async with session_maker() as db:
+        page = await BatchJobService(db).get_results(job.id, skip=0, limit=10)
+    assert [(item.position, item.finished_seq) for item in page] == [(2, 1), (0, 2)]
+
+    for item in (fourth, second):
+        await worker._process(item)
+    async with session_maker() as db:
+        page = await BatchJobService(db).get_results(job.id, skip=2, limit=10)
+    assert [(item.position, item.finished_seq) for item in page] == [(3, 3), (1, 4)]
+
+
+def test_results_reject_negative_skip():
+    """结果分页的skip不能为负数"""
+    app.dependency_overrides[get_current_user] = lambda: User(id=1, username="tester")
+    try:
+        response = TestClient(app).get("/api/v1/optimizer/jobs/1/results", params={"skip": -1})
+    finally:
+        app.dependency_overrides.pop(get_current_user)
+    assert response.status_code == 422
+
+
+async def test_batch_optimize_reports_failures_separately(session_maker, monkeypatch):
+    """同步批量优化只保存并计数成功项，失败项单独返回"""
+    from app.api.v1.endpoints import optimizer
+    from app.schemas.optimization import BatchOptimizationRequest
+
+    client = FakeAIClient(delay=0.0)
+
+    async def batch_optimize(prompts, optimization_type="general", mode="standard"):
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(await client.optimize_prompt(prompt, optimization_type, mode))
+            except AIServiceException as e:
+                results.append(optimizer.ai_client._create_error_result(prompt, e))
+        return results
+
+    monkeypatch.setattr(optimizer.ai_client, "batch_optimize", batch_optimize)
+    request = BatchOptimizationRequest(prompts=["提示词一", "失败的提示词", "提示词三"])
+    async with session_maker() as db:
+        user = await db.get(User, 1)
+        response = await optimizer.batch_optimize_prompts(request, current_user=user, db=db)
+        saved = await db.scalar(select(func.count()).select_from(Optimization))
+
+    assert (response.total_count, response.success_count, response.failed_count) == (3, 2, 1)
+    assert [result.original_prompt for result in response.results] == ["提示词一", "提示词三"]
+    assert [(failure.index, failure.original_prompt) for failure in response.failures] == [(1, "失败的提示词")]
+    assert saved == 2
@@ -0,0 +1,133 @@
+"""
+模拟模型服务测试
+"""
+
+import random
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, RateLimitError
+
+from app.core.ai_client import AIClient
+from app.core.tokenizer import TokenCounter
+from scripts.fake_openai_server import (
+    CannedResponse,
+    Distribution,
+    FakeOpenAIServer,
+    FakeServerConfig,
+)
+
+
+class CharEncoding:
+    """离线使用的简单编码器，每个字符计为一个token"""
+
+    def encode(self, text):
+        return list(text)
+
+
+def make_openai(server: FakeOpenAIServer) -> AsyncOpenAI:
+    """通过ASGI传输直接调用模拟服务"""
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    return AsyncOpenAI(api_key="test", base_url="http://fake/v1", http_client=http_client, max_retries=0)
+
+
+def instant_config(**overrides) -> FakeServerConfig:
+    return FakeServerConfig(**{"ttft": Distribution.fixed(0.0), "tokens_per_second": 0.0, **overrides})
+
+
+async def test_ai_client_runs_standard_and_stream_pipelines():
+    """AIClient 的标准和流式优化流程都能在模拟服务上完整运行"""
+    server = FakeOpenAIServer(instant_config())
+    client = AIClient()
+    client.client = make_openai(server)
+    client.token_counter = TokenCounter(encoding=CharEncoding())
+
+    result = await client.optimize_prompt("写一个加法函数")
+    assert result.optimized_prompt.startswith("请使用Python编写")
+    assert result.quality_score_before == 5
+    assert len(result.improvements) == 3
+
+    events = [event async for event in client.optimize_prompt_stream("写一个减法函数")]
+    assert events[-1]["event"] == "final"
+    assert "".join(e["data"]["text"] for e in events if e["event"] == "delta") == events[-1]["data"]["optimized_prompt"]
+
+    stats = server.get_stats()
+    assert stats["streamed"] == 1
+    assert stats["replies"]["optimization"] == 2
+    assert stats["completion_tokens"] > 0
+
+
+async def test_fused_and_free_form_replies():
+    """按系统提示词选择融合回复，其他请求返回自由文本"""
+    server = FakeOpenAIServer(instant_config(free_form_tokens=5))
+    openai_client = make_openai(server)
+
+    fused = await openai_client.chat.completions.create(model="m", messages=[
+        {"role": "system", "content": "你是一个专业的提示词优化专家，同时负责质量评估。请严格按照JSON格式回复。"},
+        {"role": "user", "content": "x"}
+    ])
+    assert "optimized_prompt" in fused.choices[0].message.content
+
+    free = await openai_client.chat.completions.create(model="m", messages=[{"role": "user", "content": "Hello"}])
+    assert len(free.choices[0].message.content.split()) == 5
+    assert free.usage.total_tokens == free.usage.prompt_tokens + free.usage.completion_tokens
+
+
+async def test_canned_responses_take_precedence():
+    """预设回复按顺序匹配消息内容"""
+    server = FakeOpenAIServer(instant_config(responses=[
+        CannedResponse.from_dict({"match": "翻译", "content": "translated"}),
+        CannedResponse.from_dict({"json": {"ok": True}})
+    ]))
+    openai_client = make_openai(server)
+
+    first = await openai_client.chat.completions.create(model="m", messages=[{"role": "user", "content": "请翻译"}])
+    second = await openai_client.chat.completions.create(model="m", messages=[{"role": "user", "content": "其他"}])
+    assert first.choices[0].message.content == "translated"
+    assert second.choices[0].message.content == '{"ok": true}'
+
+
+async def test_injected_rate_limit_carries_retry_after():
+    """注入的429带有Retry-After"""
+    server = FakeOpenAIServer(instant_config(rate_429=1.0, retry_after=2.5))
+    openai_client = make_openai(server)
+
+    with pytest.raises(RateLimitError) as excinfo:
+        await openai_client.chat.completions.create(model="m", messages=[{"role": "user", "content": "x"}])
+    assert excinfo.value.response.headers["retry-after"] == "2.5"
+    assert server.get_stats()["status"] == {"429": 1}
+
+
+async def test_outcomes_are_deterministic_per_request():
+    """相同种子下，结果只取决于请求内容和出现次数，与其他请求的到达顺序无关"""
+    config = instant_config(rate_5xx=0.5, seed=7)
+    messages = [[{"role": "user", "content": f"prompt {i}"}] for i in range(20)]
+
+    async def outcomes(order):
+        openai_client = make_openai(FakeOpenAIServer(config))
+        result = {}
+        for i in order:
+            try:
+                await openai_client.chat.completions.create(model="m", messages=messages[i])
+                result[i] = 200
+            except Exception as e:
+                result[i] = e.status_code
+        return result
+
+    forward = await outcomes(range(20))
+    backward = await outcomes(reversed(range(20)))
+    assert forward == backward
+    assert {200}.issubset(forward.values()) and len(set(forward.values())) > 1
+
+
+def test_distribution_parsing_and_sampling():
+    """延迟分布解析与采样"""
+    rng = random.Random(0)
+    assert Distribution.parse("fixed:0.5").sample(rng) == 0.5
+    assert 0.1 <= Distribution.parse("uniform:0.1,0.2").sample(rng) <= 0.2
+    assert Distribution.parse("normal:0,1").sample(rng) >= 0
+    assert str(Distribution.parse("lognormal:0.4,0.5")) == "lognormal:0.4,0.5"
+
+    for spec in ("pareto:1", "uniform:1", "fixed:a"):
+        with pytest.raises(ValueError):
+            Distribution.parse(spec)
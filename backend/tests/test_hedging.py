@@ -0,0 +1,121 @@
+"""
+请求对冲测试
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.ai_client import AIClient
+from app.core.hedging import HedgeBudget, HedgePolicy, LatencyTracker
+
+
+def reply(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def warmed_policy(client: AIClient, call_site: str, **overrides) -> HedgePolicy:
+    """预先填充耗时样本，使对冲等待时间为 min_delay"""
+    policy = HedgePolicy(**{"min_delay": 0.02, "min_samples": 5, "budget_ratio": 1.0, **overrides})
+    for _ in range(100):
+        policy.record_latency(client.model, call_site, 0.001)
+    return policy
+
+
+def test_latency_percentile_and_budget():
+    """分位数按最近秩计算；对冲额度按主请求比例积累且有上限"""
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile("m", "analyze", 0.95) is None
+    for value in range(1, 101):
+        tracker.record("m", "analyze", value / 100)
+    assert tracker.percentile("m", "analyze", 0.95) == 0.95
+    assert tracker.percentile("m", "analyze", 0.5) == 0.5
+    tracker.record("m", "analyze", 5.0)
+    assert tracker.count("m", "analyze") == 100
+    assert tracker.percentile("m", "optimize", 0.5) is None
+
+    budget = HedgeBudget(ratio=0.25, max_credit=1.0)
+    spent = 0
+    for _ in range(20):
+        budget.deposit()
+        spent += budget.try_spend()
+    assert spent == 5
+    for _ in range(10):
+        budget.deposit()
+    assert budget.credit == 1.0
+
+    with pytest.raises(ValueError):
+        HedgePolicy(percentile=1.5)
+
+
+async def test_slow_primary_is_hedged_and_cancelled():
+    """主请求过慢时发出对冲请求，取先完成的结果并取消主请求"""
+    client = AIClient()
+    client.hedging = warmed_policy(client, "analyze")
+    calls = []
+    cancelled = []
+
+    async def create(**kwargs):
+        calls.append(len(calls))
+        try:
+            await asyncio.sleep(1.0 if len(calls) == 1 else 0.001)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return reply(f"第{len(calls)}次")
+
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    response = await client._make_request_with_retry([{"role": "user", "content": "x"}], call_site="analyze")
+    await asyncio.sleep(0)
+
+    assert len(calls) == 2
+    assert cancelled == [True]
+    assert response.choices[0].message.content == "第2次"
+    stats = client.get_runtime_stats()["hedging"]
+    assert stats["hedges_sent"] == 1
+    assert stats["hedge_win_rate"] == 1.0
+
+
+async def test_fast_primary_is_not_hedged_and_failures_fall_back():
+    """主请求及时返回时不对冲；对冲请求失败时仍等待主请求"""
+    client = AIClient()
+    client.hedging = warmed_policy(client, "optimize")
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs["messages"][0]["content"])
+        if kwargs["messages"][0]["content"] == "slow" and len(calls) == 3:
+            raise RuntimeError("对冲失败")
+        await asyncio.sleep(0.05 if kwargs["messages"][0]["content"] == "slow" else 0.001)
+        return reply("ok")
+
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    await client._make_request_with_retry([{"role": "user", "content": "fast"}], call_site="optimize")
+    assert calls == ["fast"]
+
+    response = await client._make_request_with_retry([{"role": "user", "content": "slow"}], call_site="optimize")
+    assert response.choices[0].message.content == "ok"
+    assert calls == ["fast", "slow", "slow"]
+    assert client.hedging.get_stats()["hedge_wins"] == 0
+
+
+async def test_hedging_respects_budget():
+    """预算用尽后不再对冲"""
+    client = AIClient()
+    client.hedging = warmed_policy(client, "evaluate", budget_ratio=0.5)
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(1)
+        await asyncio.sleep(0.04)
+        return reply("ok")
+
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    for _ in range(4):
+        await client._make_request_with_retry([{"role": "user", "content": "x"}], call_site="evaluate")
+
+    stats = client.hedging.get_stats()
+    assert stats["hedges_sent"] == 2
+    assert stats["budget_exhausted"] == 2
+    assert len(calls) == 6
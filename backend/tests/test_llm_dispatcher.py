@@ -0,0 +1,84 @@
+"""
+LLM请求调度器测试
+"""
+
+import asyncio
+
+from app.core.llm_dispatcher import FairLimiter, LLMDispatcher
+
+
+async def test_global_limit_caps_in_flight_requests():
+    """全局并发上限生效"""
+    dispatcher = LLMDispatcher(max_concurrency=2, max_concurrency_per_model=10)
+    active = 0
+    peak = 0
+
+    async def request():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return "ok"
+
+    results = await asyncio.gather(*[dispatcher.run("model-a", request) for _ in range(8)])
+
+    assert results == ["ok"] * 8
+    assert peak == 2
+    stats = dispatcher.get_stats()
+    assert stats["total_requests"] == 8
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["max_wait_time"] > 0
+
+
+async def test_per_model_limit_and_override():
+    """按模型的并发上限和覆盖配置生效"""
+    dispatcher = LLMDispatcher(
+        max_concurrency=10,
+        max_concurrency_per_model=3,
+        model_concurrency={"small-model": 1}
+    )
+    peaks = {"small-model": 0, "large-model": 0}
+    active = {"small-model": 0, "large-model": 0}
+
+    async def request(model):
+        active[model] += 1
+        peaks[model] = max(peaks[model], active[model])
+        await asyncio.sleep(0.01)
+        active[model] -= 1
+
+    await asyncio.gather(*[
+        dispatcher.run(model, lambda model=model: request(model))
+        for model in ["small-model", "large-model"] * 5
+    ])
+
+    assert peaks == {"small-model": 1, "large-model": 3}
+
+
+async def test_fair_limiter_is_fifo_and_survives_cancellation():
+    """排队按先进先出交接，取消的等待者不占用名额"""
+    limiter = FairLimiter(1)
+    order = []
+
+    await limiter.acquire()
+
+    async def waiter(name):
+        await limiter.acquire()
+        order.append(name)
+        limiter.release()
+
+    first = asyncio.create_task(waiter("first"))
+    cancelled = asyncio.create_task(waiter("cancelled"))
+    last = asyncio.create_task(waiter("last"))
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 3
+
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(first, last)
+
+    assert order == ["first", "last"]
+    assert limiter.in_flight == 0
+    assert limiter.queue_depth == 0
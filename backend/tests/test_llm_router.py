@@ -0,0 +1,146 @@
+"""
+模型路由测试
+"""
+
+import random
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.ai_client import AIClient
+from app.core.llm_router import LLMRouter, ProviderConfig
+from app.core.retry_policy import RetryPolicy
+from scripts.fake_openai_server import Distribution, FakeOpenAIServer, FakeServerConfig
+
+SMALL = "Qwen/Qwen2.5-7B-Instruct"
+LARGE = "Qwen/Qwen2.5-72B-Instruct"
+MEDIUM = "Qwen/Qwen2.5-32B-Instruct"
+PRICING = {
+    SMALL: {"input": 0.0007, "output": 0.0007},
+    MEDIUM: {"input": 0.0021, "output": 0.0021},
+    LARGE: {"input": 0.0056, "output": 0.0056}
+}
+
+
+def fake_server(**overrides) -> FakeOpenAIServer:
+    return FakeOpenAIServer(FakeServerConfig(**{
+        "ttft": Distribution.fixed(0.0), "tokens_per_second": 0.0, **overrides
+    }))
+
+
+def fake_client(server: FakeOpenAIServer) -> AsyncOpenAI:
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    return AsyncOpenAI(api_key="test", base_url="http://fake/v1", http_client=http_client, max_retries=0)
+
+
+def make_router(routes, **overrides) -> LLMRouter:
+    return LLMRouter(**{
+        "default_model": SMALL,
+        "providers": [ProviderConfig("primary", models=[SMALL, LARGE]), ProviderConfig("backup", models=[MEDIUM, LARGE])],
+        "routes": routes,
+        "pricing": PRICING,
+        "explore": 0.0,
+        **overrides
+    })
+
+
+def make_ai_client(router: LLMRouter, servers) -> AIClient:
+    client = AIClient(router=router, retry_policy=RetryPolicy(base_delay=0.001, max_delay=0.01))
+    for name, server in servers.items():
+        router.set_client(name, fake_client(server))
+    return client
+
+
+def test_routes_resolve_models_to_providers():
+    """模型名匹配所有提供该模型的服务，"服务/模型" 只匹配该服务，未声明的模型由默认服务提供"""
+    router = make_router({
+        "analyze": [SMALL],
+        "optimize": [LARGE, "backup/" + MEDIUM],
+        "fused": ["gpt-4"]
+    })
+    assert [t.key for t in router.candidates("analyze")] == ["primary/" + SMALL]
+    assert [t.key for t in router.candidates("optimize")] == [
+        "primary/" + LARGE, "backup/" + LARGE, "backup/" + MEDIUM
+    ]
+    assert [t.key for t in router.candidates("fused")] == ["default/gpt-4"]
+    assert [t.key for t in router.candidates("evaluate")] == ["default/" + SMALL]
+
+
+def test_ranking_uses_latency_errors_and_price():
+    """未使用的候选先尝试；之后按耗时、错误率和价格综合排序，失败过的候选排在最后"""
+    router = make_router({"optimize": ["primary/" + LARGE, MEDIUM]}, cost_weight=100.0)
+    large, medium = router.candidates("optimize")
+
+    # 都未使用时价格低的优先
+    assert router.rank("optimize")[0] is medium
+
+    router.record_success(medium, "optimize", 2.0)
+    router.record_success(large, "optimize", 0.5)
+    # 0.5 + 100 * 0.0056 = 1.06 < 2.0 + 100 * 0.0021 = 2.21
+    assert router.rank("optimize")[0] is large
+
+    for _ in range(5):
+        router.record_failure(large)
+    assert large.error_rate > 0.6
+    assert router.rank("optimize")[0] is medium
+    assert router.rank("optimize", avoid=[medium.key])[0] is large
+
+    # 耗时在其他调用位置的统计不影响本调用位置
+    router.record_success(medium, "analyze", 30.0)
+    assert router.score(medium, "optimize") < router.score(large, "optimize")
+
+    explore = make_router({"optimize": ["primary/" + LARGE, MEDIUM]}, explore=1.0, rng=random.Random(3))
+    firsts = {explore.rank("optimize")[0].key for _ in range(20)}
+    assert len(firsts) == 2
+
+
+async def test_call_sites_use_configured_models():
+    """分析使用小模型，优化使用大模型，并按实际模型计价"""
+    primary = fake_server()
+    router = make_router({"analyze": [SMALL], "optimize": [LARGE]})
+    client = make_ai_client(router, {"primary": primary})
+
+    result = await client.optimize_prompt("写一个加法函数")
+    assert result.optimized_prompt
+    assert primary.get_stats()["models"] == {SMALL: 2, LARGE: 1}
+    expected = client.estimate_cost(result.usage_stats.prompt_tokens, result.usage_stats.completion_tokens, LARGE)
+    assert result.usage_stats.cost_estimate == expected
+
+
+async def test_stream_is_priced_by_routed_model():
+    """流式优化按路由选中的模型计价，而不是默认模型"""
+    primary = fake_server()
+    router = make_router({"analyze": [SMALL], "optimize": ["primary/" + LARGE]})
+    client = make_ai_client(router, {"primary": primary})
+
+    events = [event async for event in client.optimize_prompt_stream("写一个加法函数")]
+    usage = events[-1]["data"]["usage_stats"]
+    assert events[-1]["event"] == "final"
+    assert primary.get_stats()["models"] == {SMALL: 2, LARGE: 1}
+    expected = client.estimate_cost(usage["prompt_tokens"], usage["completion_tokens"], LARGE)
+    assert usage["cost_estimate"] == expected
+    assert expected != client.estimate_cost(usage["prompt_tokens"], usage["completion_tokens"])
+
+
+async def test_failover_to_another_provider():
+    """服务持续5xx时立即切换到其他候选，不等待退避，连续失败后熔断该候选"""
+    broken, healthy = fake_server(rate_5xx=1.0), fake_server()
+    router = make_router({"optimize": [LARGE]})
+    client = make_ai_client(router, {"primary": broken, "backup": healthy})
+    messages = [{"role": "user", "content": "hi"}]
+
+    for _ in range(6):
+        response = await client._make_request_with_retry(messages, call_site="optimize")
+        assert response.choices[0].message.content
+
+    stats = client.get_runtime_stats()
+    assert stats["router"]["targets"]["primary/" + LARGE]["failures"] >= 1
+    assert healthy.get_stats()["requests"] == 6
+    # 错误率升高后主要流量转向健康的服务
+    assert broken.get_stats()["requests"] < 6
+
+    async def stream_text():
+        return "".join([chunk async for chunk in client._stream_request_with_retry(messages, call_site="optimize")])
+
+    assert await stream_text()
+    assert healthy.get_stats()["streamed"] == 1
@@ -0,0 +1,113 @@
+"""
+登录记录写入测试
+"""
+
+import pytest
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.services.auth_service as auth_service_module
+from app.database import Base
+from app.models.user import LoginHistory, User
+from app.schemas.auth import UserLogin
+from app.services.auth_service import AuthService
+from app.services.login_history_buffer import LoginHistoryBuffer
+
+
+class PlainHasher:
+    """明文比较的密码验证，避免测试中计算bcrypt"""
+
+    def __init__(self):
+        self.verified = []
+
+    async def verify(self, plain_password, hashed_password):
+        self.verified.append(hashed_password)
+        return plain_password == hashed_password
+
+
+@pytest.fixture
+async def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth_service_module, "password_hasher", PlainHasher())
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'login.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as db:
+        db.add(User(id=1, username="alice", email="alice@example.com", hashed_password="secret", login_count=0))
+        await db.commit()
+    yield engine
+    await engine.dispose()
+
+
+async def count_history(engine) -> int:
+    async with AsyncSession(engine) as db:
+        return (await db.execute(select(func.count()).select_from(LoginHistory))).scalar_one()
+
+
+async def test_login_bookkeeping_in_one_transaction(engine):
+    """登录信息和登录历史在同一事务中提交"""
+    commits = []
+    event.listen(engine.sync_engine, "commit", lambda conn: commits.append(conn))
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        user = await AuthService(db).authenticate_user(UserLogin(username="alice", password="secret"), "127.0.0.1")
+        assert user.login_count == 1
+        assert await AuthService(db).authenticate_user(UserLogin(username="alice", password="wrong")) is None
+
+    assert len(commits) == 2
+    assert await count_history(engine) == 2
+
+
+async def test_login_always_verifies_password(engine):
+    """停用用户和不存在的用户同样执行密码校验，登录耗时不暴露账号状态"""
+    hasher = auth_service_module.password_hasher
+    async with AsyncSession(engine) as db:
+        await db.execute(update(User).where(User.id == 1).values(is_active=False))
+        await db.commit()
+
+        assert await AuthService(db).authenticate_user(UserLogin(username="alice", password="secret")) is None
+        assert await AuthService(db).authenticate_user(UserLogin(username="nobody", password="secret")) is None
+
+    assert hasher.verified == ["secret", auth_service_module._DUMMY_PASSWORD_HASH]
+
+
+async def test_login_history_buffer_batches_inserts(engine, monkeypatch):
+    """开启写缓冲时登录历史批量写入，停止时写完剩余记录"""
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    buffer = LoginHistoryBuffer(maker, flush_interval=60, batch_size=100)
+    monkeypatch.setattr(auth_service_module, "login_history_buffer", buffer)
+    inserts = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: inserts.append(statement) if "INSERT INTO login_history" in statement else None
+    )
+
+    await buffer.start()
+    async with AsyncSession(engine) as db:
+        for password in ("secret", "wrong", "secret"):
+            await AuthService(db).authenticate_user(UserLogin(username="alice", password=password))
+    assert await count_history(engine) == 0
+
+    await buffer.stop()
+    assert await count_history(engine) == 3
+    assert len(inserts) == 1
+    assert buffer.get_stats()["written"] == 3
+
+
+async def test_login_history_buffer_caps_rows_restored_after_failure():
+    """写入失败放回缓冲区时同样限制 max_buffered，丢弃最早的记录"""
+    def unavailable():
+        # 写入期间又有新的登录记录进入缓冲区
+        buffer.add(user_id=1, success=True, ip_address="10.0.0.3")
+        buffer.add(user_id=1, success=True, ip_address="10.0.0.4")
+        raise ConnectionError("数据库不可用")
+
+    buffer = LoginHistoryBuffer(unavailable, flush_interval=60, batch_size=100, max_buffered=3)
+    for i in range(3):
+        buffer.add(user_id=1, success=True, ip_address=f"10.0.0.{i}")
+
+    assert await buffer.flush() == 0
+
+    stats = buffer.get_stats()
+    assert (stats["pending"], stats["failures"], stats["dropped"]) == (3, 1, 2)
+    assert [row["ip_address"] for row in buffer._rows] == ["10.0.0.2", "10.0.0.3", "10.0.0.4"]
@@ -0,0 +1,144 @@
+"""
+监控指标测试
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.ai_client import AIClient
+from app.core.metrics import (
+    EventLoopLagMonitor,
+    MetricsRegistry,
+    current_endpoint,
+    db_query_duration,
+    event_loop_lag,
+    instrument_engine,
+    llm_request_duration,
+    registry
+)
+from app.main import app
+from app.utils.exceptions import AIServiceException
+
+
+def sample_lines(text: str, name: str):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_histogram_renders_cumulative_buckets():
+    """直方图按累计计数导出，上界为闭区间"""
+    metrics = MetricsRegistry()
+    histogram = metrics.histogram("latency_seconds", "耗时", ("route",), buckets=(0.1, 1.0))
+    child = histogram.labels("/a")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    text = metrics.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert sample_lines(text, "latency_seconds") == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4'
+    ]
+
+
+def test_counters_gauges_and_callbacks():
+    """无标签指标默认导出0，回调指标在抓取时取值，标签值需要转义"""
+    metrics = MetricsRegistry()
+    counter = metrics.counter("events_total", "事件数", ("kind",))
+    gauge = metrics.gauge("in_flight", "进行中")
+    state = {"hits": 3}
+    metrics.callback("hits_total", "命中", "counter", lambda: {("memory",): state["hits"]}, ("cache",))
+    metrics.callback("broken", "出错的回调", "gauge", lambda: 1 / 0)
+
+    assert sample_lines(metrics.render(), "in_flight") == ["in_flight 0"]
+    counter.labels('a"b').inc()
+    counter.labels('a"b').inc(2)
+    gauge.inc()
+    state["hits"] = 5
+
+    text = metrics.render()
+    assert sample_lines(text, "events_total") == ['events_total{kind="a\\"b"} 3']
+    assert sample_lines(text, "in_flight") == ["in_flight 1"]
+    assert sample_lines(text, "hits_total") == ['hits_total{cache="memory"} 5']
+    assert "broken" not in text
+
+    with pytest.raises(ValueError):
+        counter.labels()
+
+
+def test_metrics_endpoint_reports_route_templates_and_db_time():
+    """/metrics 按路由模板统计HTTP耗时和数据库耗时"""
+    client = TestClient(app)
+    assert client.get("/api/v1/health/db").status_code == 200
+    client.get("/api/v1/optimizer/history/123")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",endpoint="/api/v1/health/db",status="200"}' in text
+    assert 'endpoint="/api/v1/optimizer/history/{optimization_id}"' in text
+    assert 'db_query_duration_seconds_count{endpoint="/api/v1/health/db"}' in text
+    assert "http_requests_in_flight 1" in text
+    assert "cache_hits_total" in text
+
+
+async def test_failed_statements_do_not_leak_db_timers(tmp_path):
+    """执行失败的语句不在连接上残留计时状态，之后的语句照常统计"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metrics.db'}")
+    instrument_engine(engine)
+    child = db_query_duration.labels(current_endpoint())
+    before = child.count
+    try:
+        async with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("SELECT * FROM missing_table"))
+            await conn.execute(text("SELECT 1"))
+            raw = await conn.get_raw_connection()
+            assert "metrics_query_start" not in raw.info
+    finally:
+        await engine.dispose()
+
+    assert child.count == before + 1
+
+
+async def test_llm_latency_is_recorded_by_call_site():
+    """模型请求耗时按调用位置和结果分别统计"""
+    client = AIClient()
+
+    async def create(**kwargs):
+        if kwargs["messages"][0]["content"] == "fail":
+            raise RuntimeError("boom")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    success = llm_request_duration.labels("test_site", client.model, "success")
+    error = llm_request_duration.labels("test_site", client.model, "error")
+    success_before, error_before = success.count, error.count
+
+    await client._make_request_with_retry([{"role": "user", "content": "hi"}], max_retries=1, call_site="test_site")
+    with pytest.raises(AIServiceException):
+        await client._make_request_with_retry([{"role": "user", "content": "fail"}], max_retries=1, call_site="test_site")
+
+    assert success.count == success_before + 1
+    assert error.count == error_before + 1
+
+
+async def test_event_loop_lag_monitor_samples():
+    """事件循环延迟监控定期采样，停止后不再运行"""
+    before = event_loop_lag.labels().count
+    monitor = EventLoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    assert event_loop_lag.labels().count > before
+    assert registry.get("event_loop_lag_last_seconds") is not None
@@ -0,0 +1,176 @@
+"""
+优化历史查询测试
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import delete, event, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.models.optimization import Optimization, OptimizationImprovement
+from app.models.user import User
+from app.services.optimization_service import (
+    OptimizationService,
+    decode_history_cursor,
+    encode_history_cursor
+)
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """包含两个用户历史记录的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as db:
+        db.add_all([
+            User(id=1, username="alice", email="alice@example.com", hashed_password="x"),
+            User(id=2, username="bob", email="bob@example.com", hashed_password="x"),
+        ])
+        for i in range(12):
+            optimization = Optimization(
+                user_id=1 if i < 10 else 2,
+                original_prompt=f"原始提示词{i}" * 50,
+                optimized_prompt=f"优化后提示词{i}",
+                quality_score_before=3,
+                quality_score_after=i,
+                optimization_type="code" if i % 2 else "general",
+                improvements=[
+                    OptimizationImprovement(improvement_type=f"类型{j}", description="描述")
+                    for j in range(i % 3)
+                ]
+            )
+            db.add(optimization)
+        await db.commit()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def statements(engine):
+    """记录执行的SQL语句"""
+    executed = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: executed.append(args[2]))
+    return executed
+
+
+async def test_history_page_uses_constant_queries(engine, statements):
+    """分页查询的语句数量与页大小无关"""
+    async with AsyncSession(engine) as db:
+        service = OptimizationService(db)
+        total = await service.count_history(1)
+        records = await service.list_history(1, skip=0, limit=8, sort_by="quality_score")
+
+        assert total == 10
+        assert [r.quality_score_after for r in records] == [9, 8, 7, 6, 5, 4, 3, 2]
+        assert [len(r.improvements) for r in records] == [0, 2, 1, 0, 2, 1, 0, 2]
+        assert len(statements) == 3
+        assert "count(" in statements[0]
+
+        assert await service.count_history(1, category="code") == 5
+
+
+async def test_history_summaries_project_previews(engine):
+    """摘要视图截取提示词预览并返回改进说明数量"""
+    async with AsyncSession(engine) as db:
+        summaries = await OptimizationService(db).list_history_summaries(
+            1, limit=3, sort_by="quality_score", sort_order="asc", preview_length=10
+        )
+
+    assert [s["quality_score_after"] for s in summaries] == [0, 1, 2]
+    assert summaries[1]["original_prompt"] == ("原始提示词1" * 2)[:10]
+    assert summaries[1]["original_length"] == len("原始提示词1" * 50)
+    assert [s["improvement_count"] for s in summaries] == [0, 1, 2]
+
+
+async def _paginate(service, sort_by, sort_order, limit=3, on_page=None):
+    """按游标逐页读取全部记录id，on_page 在取得每页后调用"""
+    seen, cursor = [], None
+    while True:
+        after = decode_history_cursor(cursor, sort_by, sort_order) if cursor else None
+        page = await service.list_history_summaries(
+            1, limit=limit, sort_by=sort_by, sort_order=sort_order, after=after
+        )
+        if not page:
+            return seen
+        seen.extend(row["id"] for row in page)
+        if on_page:
+            await on_page(page)
+        cursor = encode_history_cursor(page[-1], sort_by, sort_order)
+
+
+@pytest.mark.parametrize("sort_by,sort_order", [(None, None), ("quality_score", "asc"), ("quality_score", "desc")])
+async def test_cursor_pages_match_offset_pages(engine, sort_by, sort_order):
+    """游标分页与偏移分页的结果一致"""
+    async with AsyncSession(engine) as db:
+        service = OptimizationService(db)
+        expected = [r.id for r in await service.list_history(1, limit=10, sort_by=sort_by, sort_order=sort_order)]
+
+        assert await _paginate(service, sort_by, sort_order) == expected
+
+
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+async def test_cursor_pages_with_null_scores(engine, sort_order):
+    """评分为空的记录排在最后，游标跨过空值时不跳过也不重复"""
+    async with AsyncSession(engine) as db:
+        await db.execute(
+            update(Optimization).where(Optimization.id.in_([2, 5, 6])).values(quality_score_after=None)
+        )
+        await db.commit()
+        service = OptimizationService(db)
+        expected = [r.id for r in await service.list_history(1, limit=10, sort_by="quality_score", sort_order=sort_order)]
+
+        assert sorted(expected) == list(range(1, 11))
+        assert expected[-3:] == ([2, 5, 6] if sort_order == "asc" else [6, 5, 2])
+        assert await _paginate(service, "quality_score", sort_order, limit=2) == expected
+
+
+async def test_cursor_condition_is_index_range(engine, statements):
+    """游标条件只用 (排序列, id) 的范围比较，不为空值加 OR 条件，不可为空的排序列不读空值区间"""
+    async with AsyncSession(engine) as db:
+        service = OptimizationService(db)
+        first = await service.list_history_summaries(1, limit=3)
+        after = decode_history_cursor(encode_history_cursor(first[-1]))
+        statements.clear()
+        await service.list_history_summaries(1, limit=3, after=after)
+        after = decode_history_cursor(
+            encode_history_cursor(first[-1], "quality_score", "asc"), "quality_score", "asc"
+        )
+        await service.list_history_summaries(1, limit=3, sort_by="quality_score", sort_order="asc", after=after)
+
+    by_created, by_quality = statements
+    assert "IS NULL" not in by_created
+    assert " OR " not in by_quality.upper()
+    assert "UNION ALL" in by_quality
+
+
+async def test_cursor_survives_anchor_deletion(engine):
+    """游标记录在翻页过程中被删除时，下一页从原位置继续"""
+    async with AsyncSession(engine) as db:
+        service = OptimizationService(db)
+        expected = [r.id for r in await service.list_history(1, limit=10, sort_by="quality_score")]
+
+        async def delete_anchor(page):
+            if page[-1]["id"] == expected[2]:
+                await db.execute(delete(Optimization).where(Optimization.id == page[-1]["id"]))
+                await db.commit()
+
+        assert await _paginate(service, "quality_score", None, on_page=delete_anchor) == expected
+
+
+def test_history_cursor_round_trip():
+    """游标携带排序值，绑定排序方式，不一致或格式错误时拒绝"""
+    cursor = encode_history_cursor({"id": 42, "quality_score_after": 7}, "quality_score", "asc")
+
+    assert decode_history_cursor(cursor, "quality_score", "asc") == (7.0, 42)
+    with pytest.raises(ValueError):
+        decode_history_cursor(cursor, "created_at", "asc")
+    with pytest.raises(ValueError):
+        decode_history_cursor("not-a-cursor")
+
+    created_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_history_cursor({"id": 3, "created_at": created_at})
+    assert decode_history_cursor(cursor) == (created_at, 3)
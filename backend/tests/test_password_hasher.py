@@ -0,0 +1,56 @@
+"""
+密码哈希线程池测试
+"""
+
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+import app.core.password_hasher as password_hasher_module
+from app.core.password_hasher import PasswordHasher
+
+
+def slow_hash(password):
+    """模拟释放GIL的耗时哈希"""
+    time.sleep(0.05)
+    return f"hashed:{password}"
+
+
+async def test_hashing_does_not_block_event_loop(monkeypatch):
+    """哈希在线程池中执行，期间事件循环仍能调度其他协程"""
+    monkeypatch.setattr(password_hasher_module, "get_password_hash", slow_hash)
+    hasher = PasswordHasher(workers=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    results = await asyncio.gather(*(hasher.hash(str(i)) for i in range(3)))
+    task.cancel()
+    hasher.shutdown()
+
+    assert results == ["hashed:0", "hashed:1", "hashed:2"]
+    assert ticks >= 10
+    stats = hasher.get_stats()
+    assert stats["completed"] == 3 and stats["peak_pending"] == 3
+    # 单线程时后两个请求需要排队
+    assert stats["avg_queue_time"] > 0.02
+
+
+async def test_rejects_when_queue_is_full(monkeypatch):
+    """排队数超过上限时返回503"""
+    monkeypatch.setattr(password_hasher_module, "get_password_hash", slow_hash)
+    hasher = PasswordHasher(workers=1, max_pending=1)
+
+    results = await asyncio.gather(*(hasher.hash("x") for _ in range(3)), return_exceptions=True)
+    hasher.shutdown()
+
+    assert [r for r in results if r == "hashed:x"] == ["hashed:x"] * 2
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1 and rejected[0].status_code == 503
+    assert hasher.get_stats()["rejected"] == 1
@@ -0,0 +1,113 @@
+"""
+词表匹配引擎测试
+"""
+import re
+
+import pytest
+
+from app.core.pattern_engine import PatternEngine
+from app.core.prompt_analyzer import FEATURE_INDICATORS, STRUCTURE_INDICATORS, TECHNICAL_TERMS, PromptAnalyzer
+
+
+SAMPLES = [
+    "For example, given a data structure like a list, write a Python function.",
+    "Please make sure the output is within the limit and no more than 200 words.",
+    "Based on the dataset, analyze the trend and also explain the regression results.",
+    "Likely formatting issues: c++ code, C++x, forum posts, andrew and android.",
+    "In the context of research, present as a table; for instance: sample rows.",
+    "",
+]
+
+
+def _findall_groups(vocabularies, text):
+    """按分组分别 findall 的参考结果"""
+    counts, hits = {}, {}
+    for group, phrases in vocabularies.items():
+        alternation = "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+        matches = re.findall(r"\b(" + alternation + r")\b", text)
+        if matches:
+            counts[group] = len(matches)
+            hits[group] = list(dict.fromkeys(matches))
+    return counts, hits
+
+
+def test_scan_counts_nested_phrases_in_every_group():
+    engine = PatternEngine({
+        "context": ["for", "given"],
+        "example": ["for example", "example", "like"],
+        "term": ["data", "data structure", "structure"],
+    })
+
+    result = engine.scan("for example, given data structure like lists. likely formats")
+
+    # 同一位置每个分组只计最长的词组
+    assert dict(result.counts) == {"context": 2, "example": 3, "term": 2}
+    assert result.hits["context"] == ["for", "given"]
+    assert result.hits["example"] == ["for example", "example", "like"]
+    assert result.hits["term"] == ["data structure", "structure"]
+    assert not result.has("missing")
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_scan_matches_per_group_findall(text):
+    vocabularies = {
+        **{f"term:{name}": words for name, words in TECHNICAL_TERMS.items()},
+        **STRUCTURE_INDICATORS,
+        **{f"feature:{name}": words for name, words in FEATURE_INDICATORS.items()},
+    }
+    engine = PatternEngine(vocabularies)
+
+    result = engine.scan(text.lower())
+    counts, hits = _findall_groups(vocabularies, text.lower())
+
+    assert dict(result.counts) == counts
+    assert {group: sorted(words) for group, words in result.hits.items()} == {
+        group: sorted(words) for group, words in hits.items()
+    }
+
+
+def test_analyze_local_uses_single_scan():
+    analyzer = PromptAnalyzer()
+
+    result = analyzer.analyze_local(SAMPLES[0] + " " + SAMPLES[1])
+
+    assert result.features.imperative_count == 3
+    assert result.features.has_examples and result.features.has_constraints and result.features.has_context
+    assert {"data", "data structure", "structure", "python", "function"} <= set(result.features.technical_terms)
+    assert result.structure.has_clear_goal and result.structure.has_instructions
+    assert result.structure.has_examples and result.structure.has_constraints
+    assert result.structure.has_output_format  # data structure 中的 structure
+    assert not analyzer.analyze_local(SAMPLES[1]).structure.has_output_format
+
+
+def test_scan_many_matches_scan():
+    """批量扫描的计数矩阵和命中词与逐条扫描一致"""
+    engine = PromptAnalyzer().engine
+    texts = [text.lower() for text in SAMPLES] + ["data\x00structure"]
+
+    batch = engine.scan_many(texts)
+    term_groups = [f"term:{category}" for category in TECHNICAL_TERMS]
+    hits = batch.hits(term_groups)
+
+    assert batch.counts.shape == (len(texts), len(engine.groups))
+    for row, text in enumerate(texts):
+        result = engine.scan(text.replace("\x00", " "))
+        counts = {group: int(count) for group, count in zip(batch.groups, batch.counts[row]) if count}
+        assert counts == dict(result.counts)
+        assert hits[row] == list(dict.fromkeys(term for group in term_groups for term in result.hits.get(group, ())))
+
+
+def test_scan_matches_chinese_phrases_without_word_boundaries():
+    engine = PatternEngine({
+        "term": ["python", "函数"],
+        "constraint": ["不超过", "以内"],
+        "format": ["格式", "格式化"],
+    })
+
+    result = engine.scan("请用python写一个格式化函数，不超过20行，pythonic 的写法不算")
+
+    assert result.hits["term"] == ["python", "函数"]
+    assert result.counts["term"] == 2
+    assert result.hits["constraint"] == ["不超过"]
+    assert result.hits["format"] == ["格式化"]
+    assert result.counts["format"] == 1
@@ -0,0 +1,78 @@
+"""
+认证主体缓存测试
+"""
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+from sqlalchemy.orm.exc import DetachedInstanceError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.dependencies import get_current_user
+from app.core.principal_cache import PrincipalCache, principal_cache
+from app.core.security import create_access_token
+from app.database import Base
+from app.models.user import User
+from app.services.auth_service import AuthService
+
+
+def test_principal_cache_ttl_and_lru():
+    """过期和超出容量的条目被移除，统计命中与失效次数"""
+    now = [0.0]
+    cache = PrincipalCache(ttl=10, max_entries=2, clock=lambda: now[0])
+
+    cache.put(1, {"id": 1})
+    cache.put(2, {"id": 2})
+    assert cache.get(1) == {"id": 1}
+    cache.put(3, {"id": 3})
+    assert cache.get(2) is None
+
+    cache.invalidate(3)
+    assert cache.get(3) is None
+    now[0] = 11
+    assert cache.get(1) is None
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"], stats["evictions"]) == (1, 3, 1, 1)
+    assert stats["size"] == 0
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'principal.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as db:
+        db.add(User(id=1, username="alice", email="alice@example.com", hashed_password="hash"))
+        await db.commit()
+    yield engine
+    await engine.dispose()
+
+
+async def test_current_user_served_from_cache_until_invalidated(engine):
+    """缓存命中时不访问数据库，停用用户后立即生效"""
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(subject=1))
+
+    async with AsyncSession(engine) as db:
+        await get_current_user(credentials, db)
+    statements.clear()
+
+    async with AsyncSession(engine) as db:
+        user = await get_current_user(credentials, db)
+    assert statements == []
+    assert (user.id, user.username, user.is_active) == (1, "alice", True)
+    with pytest.raises(DetachedInstanceError):
+        user.hashed_password
+
+    invalidations = principal_cache.invalidations
+    async with AsyncSession(engine) as db:
+        assert await AuthService(db).deactivate_user(1)
+    assert principal_cache.invalidations == invalidations + 1
+
+    async with AsyncSession(engine) as db:
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user(credentials, db)
+    assert exc_info.value.status_code == 403
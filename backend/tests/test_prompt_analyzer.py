@@ -0,0 +1,147 @@
+"""
+提示词分析器测试
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.prompt_analyzer import PromptAnalyzer
+from app.core.tokenizer import TokenCounter
+from app.main import app
+
+STRONG_PROMPT = (
+    "Please write a Python function that, given two integers, returns their sum. "
+    "Use type hints and include an example such as add(1, 2). Format the output as a code block."
+)
+
+
+def test_estimate_quality_maps_to_all_criteria():
+    """本地评估给出五个维度的评分，结构完整的提示词得分更高"""
+    analyzer = PromptAnalyzer()
+
+    strong = analyzer.estimate_quality(STRONG_PROMPT)
+    weak = analyzer.estimate_quality("sum")
+
+    assert set(strong.scores) == {"clarity", "completeness", "structure", "specificity", "actionability"}
+    assert all(1 <= score <= 10 for score in strong.scores.values())
+    assert strong.overall_score > weak.overall_score + 3
+    assert strong.confidence >= 0.6
+    assert weak.issues and weak.suggestions
+
+
+def test_estimate_quality_has_low_confidence_outside_vocabulary():
+    """规则词表不覆盖的文字置信度低"""
+    result = PromptAnalyzer().estimate_quality("Напишите функцию, которая вычисляет сумму двух чисел")
+
+    assert result.confidence < 0.3
+
+
+def test_chinese_prompt_segmentation_and_vocabulary():
+    """中文按字折算词数、按全角标点分句，中文指示词与中英混排的英文术语都能识别"""
+    analyzer = PromptAnalyzer()
+
+    result = analyzer.analyze_local(
+        "请用Python写一个函数，计算两个数的和。例如：输入1和2，输出3。代码不超过20行，以列表形式说明思路！可以吗？"
+    )
+    features, structure = result.features, result.structure
+
+    assert features.sentence_count == 4
+    assert features.question_count == 1
+    assert 20 <= features.word_count <= 30
+    assert {"python", "函数", "代码"} <= set(features.technical_terms)
+    assert features.has_examples and features.has_constraints
+    assert structure.has_clear_goal and structure.has_instructions and structure.has_output_format
+    assert result.prompt_type.value == "code"
+    assert analyzer.estimate_quality("写一个函数计算两个数的和").confidence >= 0.5
+
+
+async def test_analyze_without_ai_matches_local_analysis():
+    analyzer = PromptAnalyzer()
+
+    result = await analyzer.analyze(STRONG_PROMPT, use_ai=False)
+    local = analyzer.analyze_local(STRONG_PROMPT)
+
+    assert result.features == local.features
+    assert result.suggestions == local.suggestions
+
+
+def test_evaluate_fast_mode_skips_model():
+    """fast 模式直接返回本地评估结果"""
+    response = TestClient(app).post("/api/v1/optimizer/evaluate", json={"prompt": STRONG_PROMPT, "mode": "fast"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["source"] == "heuristic"
+    assert data["confidence"] >= 0.6
+    assert set(data["detailed_scores"]) == {"clarity", "completeness", "structure", "specificity", "actionability"}
+
+
+BATCH_PROMPTS = [
+    STRONG_PROMPT,
+    "sum",
+    "",
+    "什么是机器学习？",
+    "Given the dataset, analyze the trend and also explain the regression. Limit it to 100 words?",
+    "Imagine a story about a dragon and a knight, and also describe the castle and the village.",
+]
+
+
+def test_analyze_many_matches_analyze_local():
+    """批量分析的每一列与逐条本地分析一致"""
+    analyzer = PromptAnalyzer()
+
+    batch = analyzer.analyze_many(iter(BATCH_PROMPTS), chunk_size=4)
+
+    assert len(batch) == len(BATCH_PROMPTS)
+    for row, prompt in zip(batch.columns, BATCH_PROMPTS):
+        result = analyzer.analyze_local(prompt)
+        features, structure = result.features, result.structure
+        assert row["word_count"] == features.word_count
+        assert row["sentence_count"] == features.sentence_count
+        assert row["avg_sentence_length"] == pytest.approx(features.avg_sentence_length)
+        assert row["question_count"] == features.question_count
+        assert row["imperative_count"] == features.imperative_count
+        assert row["technical_term_count"] == len(features.technical_terms)
+        assert (row["has_examples"], row["has_constraints"], row["has_context"]) == (
+            features.has_examples, features.has_constraints, features.has_context
+        )
+        assert row["readability_score"] == pytest.approx(features.readability_score)
+        assert row["token_count"] == features.token_count
+        assert row["tokens_per_word"] == pytest.approx(features.tokens_per_word)
+        assert (row["has_clear_goal"], row["has_instructions"], row["has_output_format"]) == (
+            structure.has_clear_goal, structure.has_instructions, structure.has_output_format
+        )
+        assert row["structure_score"] == pytest.approx(structure.structure_score)
+        assert row["prompt_type"] == result.prompt_type.value
+        assert row["complexity_level"] == result.complexity_level.value
+    assert batch.technical_terms == [analyzer.analyze_local(p).features.technical_terms for p in BATCH_PROMPTS]
+
+
+def test_analyze_many_process_pool_keeps_order():
+    """进程池与单进程结果一致且保持输入顺序"""
+    analyzer = PromptAnalyzer()
+
+    serial = analyzer.analyze_many(BATCH_PROMPTS * 3, chunk_size=5)
+    parallel = analyzer.analyze_many(BATCH_PROMPTS * 3, processes=2, chunk_size=5)
+
+    assert (serial.columns == parallel.columns).all()
+    assert serial.technical_terms == parallel.technical_terms
+
+
+def test_analyze_many_process_pool_uses_instance_token_counter():
+    """进程池子进程使用分析器自己的Token计数器，而不是全局计数器"""
+    analyzer = PromptAnalyzer(token_counter=TokenCounter(encoding=SimpleNamespace(encode=list)))
+
+    parallel = analyzer.analyze_many(BATCH_PROMPTS, processes=2, chunk_size=3)
+
+    assert parallel["token_count"].tolist() == [len(prompt) for prompt in BATCH_PROMPTS]
+
+
+def test_analyze_many_empty_input():
+    batch = PromptAnalyzer().analyze_many([])
+
+    assert len(batch) == 0
+    assert batch["word_count"].shape == (0,)
+    assert batch.technical_terms == []
@@ -0,0 +1,109 @@
+"""
+速率限制与批量调度测试
+"""
+
+import asyncio
+
+from app.core.ai_client import AIClient, AIUsageStats, OptimizationResult
+from app.core.rate_limiter import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """由 asyncio.sleep 推进的模拟时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def test_token_bucket_paces_after_burst(monkeypatch):
+    """突发额度用完后按速率等待"""
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    bucket = TokenBucket(60, burst=2, clock=clock)
+
+    assert await bucket.acquire() == 0
+    assert await bucket.acquire() == 0
+    waited = await bucket.acquire()
+
+    assert waited == sleeps[0] == 1.0
+    assert bucket.total_wait_time == 1.0
+
+
+async def test_token_bucket_refund_and_oversized_request():
+    """退还的配额可再次使用，超过容量的申请按容量处理"""
+    bucket = TokenBucket(600, burst=10)
+
+    assert await bucket.acquire(25) == 0
+    bucket.adjust(4)
+    assert await bucket.acquire(4) == 0
+
+    limiter = RateLimiter(None, 0)
+    assert limiter.requests is None and limiter.tokens is None
+    assert await limiter.acquire(100, 100000) == 0
+
+
+class SlowClient(AIClient):
+    """记录并发数的模拟客户端，部分提示词失败"""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+
+    def count_tokens(self, text):
+        return len(text)
+
+    async def optimize_prompt(self, original_prompt, optimization_type="general", mode="standard"):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            # 序号越小耗时越长，使完成顺序与输入顺序相反
+            await asyncio.sleep(0.001 * (10 - int(original_prompt)))
+            if original_prompt == "3":
+                raise RuntimeError("上游错误")
+            return OptimizationResult(
+                optimized_prompt=f"优化{original_prompt}",
+                improvements=[],
+                quality_score_before=5,
+                quality_score_after=8,
+                usage_stats=AIUsageStats(total_tokens=10),
+                processing_time=0.0
+            )
+        finally:
+            self.active -= 1
+
+
+async def test_batch_optimize_caps_concurrency_and_keeps_order():
+    """批量优化限制并发，按完成顺序产出，列表接口保持输入顺序"""
+    client = SlowClient()
+    prompts = [str(i) for i in range(8)]
+
+    completed = [index async for index, _ in client.iter_batch_optimize(prompts, max_concurrency=3)]
+    assert sorted(completed) == list(range(8))
+    assert completed != list(range(8))
+    assert client.peak == 3
+
+    results = await client.batch_optimize(prompts, max_concurrency=2, requests_per_minute=0)
+    assert [r.optimized_prompt for r in results[:3]] == ["优化0", "优化1", "优化2"]
+    assert results[3].improvements[0]["type"] == "错误"
+    assert client.peak == 3
+
+
+async def test_iter_batch_optimize_cancels_on_early_exit():
+    """调用方提前退出时取消剩余流程"""
+    client = SlowClient()
+    iterator = client.iter_batch_optimize([str(i) for i in range(8)], max_concurrency=4)
+
+    await iterator.__anext__()
+    await iterator.aclose()
+
+    assert client.active == 0
@@ -0,0 +1,148 @@
+"""
+响应缓存测试
+"""
+
+import json
+import time
+from types import SimpleNamespace
+
+from app.core.ai_client import AIClient
+from app.core.response_cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache
+from app.core.tokenizer import TokenCounter
+
+
+class InMemoryRedis:
+    """测试用的Redis替身，实现get/set(ex=)接口"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.store[key]
+            return None
+        return value
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = (value, time.monotonic() + ex if ex else None)
+
+
+class CountingCompletions:
+    """统计调用次数的模拟chat.completions接口"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+async def test_memory_backend_evicts_least_recently_used():
+    """超过条目上限时淘汰最久未使用的条目"""
+    backend = MemoryCacheBackend(max_entries=2)
+    await backend.set("a", "1", ttl=60)
+    await backend.set("b", "2", ttl=60)
+    await backend.get("a")
+    await backend.set("c", "3", ttl=60)
+
+    assert await backend.get("a") == "1"
+    assert await backend.get("b") is None
+    assert backend.get_stats()["evictions"] == 1
+
+
+async def test_memory_backend_respects_byte_limit_and_ttl():
+    """按总字节数淘汰，过期条目不返回"""
+    backend = MemoryCacheBackend(max_entries=10, max_bytes=5)
+    await backend.set("a", "1234", ttl=60)
+    await backend.set("b", "5678", ttl=60)
+    assert await backend.get("a") is None
+    assert backend.total_bytes == 4
+
+    await backend.set("c", "x", ttl=0)
+    assert await backend.get("c") is None
+
+
+async def test_key_normalizes_whitespace_and_width():
+    """规范化后相同的提示词得到相同的缓存键"""
+    cache = ResponseCache(MemoryCacheBackend())
+    key1 = cache.make_key("analysis", "写一个函数  计算和\n", "model-a", "general", "1")
+    key2 = cache.make_key("analysis", " 写一个函数 计算和", "model-a", "general", "1")
+    key3 = cache.make_key("analysis", "写一个函数 计算和", "model-b", "general", "1")
+    key4 = cache.make_key("analysis", "写一个函数 计算和", "model-a", "general", "2")
+
+    assert key1 == key2
+    assert len({key1, key3, key4}) == 3
+
+
+async def test_redis_backend_with_stand_in():
+    """Redis后端读写并统计命中"""
+    redis = InMemoryRedis()
+    cache = ResponseCache(RedisCacheBackend(client=redis), ttl=60)
+
+    assert await cache.get("k") is None
+    await cache.set("k", {"overall_score": 7})
+    assert await cache.get("k") == {"overall_score": 7}
+    assert any(key.startswith("prompt-optimizer:cache:") for key in redis.store)
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+async def test_ai_client_serves_repeated_analysis_from_cache():
+    """重复分析同一提示词只调用一次模型"""
+    reply = json.dumps({"scores": {"clarity": 7}, "overall_score": 7, "issues": [], "suggestions": []})
+    completions = CountingCompletions(reply)
+    client = AIClient(cache=ResponseCache(RedisCacheBackend(client=InMemoryRedis())))
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.token_counter = TokenCounter(encoding=SimpleNamespace(encode=list))
+
+    first = await client.analyze_prompt_quality("写一个函数计算两个数的和")
+    second = await client.analyze_prompt_quality("写一个函数计算两个数的和 ")
+
+    assert completions.calls == 1
+    assert second["overall_score"] == first["overall_score"] == 7
+    assert client.get_runtime_stats()["cache"]["hits"] == 1
+
+
+async def test_ai_client_does_not_cache_unparseable_analysis():
+    """解析失败的默认结果不写入缓存"""
+    completions = CountingCompletions("无法给出评分")
+    client = AIClient(cache=ResponseCache(MemoryCacheBackend()))
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.token_counter = TokenCounter(encoding=SimpleNamespace(encode=list))
+
+    await client.analyze_prompt_quality("计算和")
+    await client.analyze_prompt_quality("计算和")
+
+    assert completions.calls == 2
+
+
+async def test_ai_client_caches_optimization_without_token_usage():
+    """命中优化缓存时不重复调用且不计token"""
+    reply = json.dumps({
+        "analysis_before": {"overall_score": 4},
+        "optimized_prompt": "请用Python编写函数 add(a, b)",
+        "improvements": [{"type": "明确语言", "description": "指定使用Python"}],
+        "analysis_after": {"overall_score": 8}
+    }, ensure_ascii=False)
+    completions = CountingCompletions(reply)
+    client = AIClient(cache=ResponseCache(MemoryCacheBackend()))
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.token_counter = TokenCounter(encoding=SimpleNamespace(encode=list))
+
+    first = await client.optimize_prompt("写一个加法函数", "code", mode="fused")
+    second = await client.optimize_prompt("写一个加法函数", "code", mode="fused")
+    await client.optimize_prompt("写一个加法函数", "general", mode="fused")
+
+    assert completions.calls == 2
+    assert second.optimized_prompt == first.optimized_prompt
+    assert second.quality_score_after == 8
+    assert second.usage_stats.total_tokens == 0
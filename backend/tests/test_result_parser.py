@@ -0,0 +1,120 @@
+"""
+优化结果增量解析测试
+"""
+
+import pytest
+
+from app.core.result_parser import IncrementalResultParser, parse_optimization_result
+
+
+SAMPLE = """优化后的提示词：
+请扮演资深Python工程师，
+编写一个计算斐波那契数列的函数。
+改进说明：
+1. 角色设定:明确了回答者身份
+2. 增加约束
+- 输出格式:要求给出代码
+"""
+
+MARKDOWN_SAMPLE = """## 优化后的提示词
+你是一名数据分析师。请按以下步骤完成任务：
+1. 清洗数据
+2. 计算各季度增长率
+
+最后用表格输出结果。
+
+### **改进说明**：
+6. **明确角色**：指定了数据分析师身份
+7) 拆分步骤：将任务拆成可执行的步骤
+   - 每一步都有明确产出
+（8）输出格式：要求表格
+---
+"""
+
+
+def feed_in_chunks(text, size):
+    """按固定大小切片输入，返回事件和最终结果"""
+    parser = IncrementalResultParser()
+    events = []
+    for index in range(0, len(text), size):
+        events.extend(parser.feed(text[index:index + size]))
+    events.extend(parser.finish())
+    return events, parser.close()
+
+
+def test_one_shot_parse():
+    """一次性解析得到提示词和改进说明"""
+    prompt, improvements = parse_optimization_result(SAMPLE)
+
+    assert prompt == "请扮演资深Python工程师，\n编写一个计算斐波那契数列的函数。"
+    assert improvements == [
+        {"type": "角色设定", "description": "明确了回答者身份"},
+        {"type": "改进", "description": "增加约束"},
+        {"type": "输出格式", "description": "要求给出代码"}
+    ]
+
+
+def test_markdown_headers_numbering_and_full_width_colons():
+    """识别markdown标题、任意编号、全角冒号，提示词中的列表和空行保留"""
+    prompt, improvements = parse_optimization_result(MARKDOWN_SAMPLE)
+
+    assert prompt == (
+        "你是一名数据分析师。请按以下步骤完成任务：\n1. 清洗数据\n2. 计算各季度增长率\n\n最后用表格输出结果。"
+    )
+    assert improvements == [
+        {"type": "明确角色", "description": "指定了数据分析师身份"},
+        {"type": "拆分步骤", "description": "将任务拆成可执行的步骤 每一步都有明确产出"},
+        {"type": "输出格式", "description": "要求表格"}
+    ]
+
+
+def test_inline_header_content_and_mid_line_keywords():
+    """标题同行的内容归入该章节，句中出现的标题词不视为标题"""
+    prompt, improvements = parse_optimization_result(
+        "**优化后的提示词**：请参考改进说明书的格式撰写周报\n改进点：\n• 补充格式：引用模板\n"
+    )
+
+    assert prompt == "请参考改进说明书的格式撰写周报"
+    assert improvements == [{"type": "补充格式", "description": "引用模板"}]
+
+
+@pytest.mark.parametrize("text", [SAMPLE, MARKDOWN_SAMPLE])
+@pytest.mark.parametrize("size", [1, 2, 5, 17, 1000])
+def test_chunked_parse_matches_and_deltas_rebuild_prompt(text, size):
+    """任意切片方式结果一致，增量文本拼接后等于最终提示词"""
+    events, (prompt, improvements) = feed_in_chunks(text, size)
+
+    assert (prompt, improvements) == parse_optimization_result(text)
+    assert "".join(payload for kind, payload in events if kind == "delta") == prompt
+    assert [payload for kind, payload in events if kind == "prompt"] == [prompt]
+    assert [payload for kind, payload in events if kind == "improvement"] == improvements
+
+
+def test_partial_line_streams_before_newline():
+    """足够长且不可能是标题的未完成行会立即推送，行尾空白暂缓"""
+    parser = IncrementalResultParser()
+    parser.feed("优化后的提示词：\n")
+    assert parser.feed("请写一首诗") == []
+    events = parser.feed("，主题是春天，要求押韵并且每句七个字，共四句 ")
+    assert events == [("delta", "请写一首诗，主题是春天，要求押韵并且每句七个字，共四句")]
+    assert parser.feed("。\n") == [("delta", " 。")]
+
+
+def test_improvement_completes_when_next_item_starts():
+    """改进说明在下一项开始或输入结束时产出"""
+    parser = IncrementalResultParser()
+    parser.feed("改进说明：\n1. 明确目标\n")
+    assert parser.feed("   补充了预期结果\n") == []
+    assert parser.feed("2. 精简") == []
+    assert parser.feed("\n") == [("improvement", {"type": "改进", "description": "明确目标 补充了预期结果"})]
+    assert parser.feed("3. ") == []
+    assert parser.feed("x\n") == [("improvement", {"type": "改进", "description": "精简"})]
+    assert parser.finish() == [("improvement", {"type": "改进", "description": "x"})]
+
+
+def test_fallbacks_without_sections():
+    """没有标题时整段作为提示词并给出默认改进说明"""
+    prompt, improvements = parse_optimization_result("  直接给出的新提示词  ")
+
+    assert prompt == "直接给出的新提示词"
+    assert improvements[0]["type"] == "整体优化"
@@ -0,0 +1,219 @@
+"""
+重试策略与熔断测试
+"""
+
+import asyncio
+import random
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.config import settings
+from app.core.ai_client import AIClient
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.retry_policy import (
+    RetryPolicy,
+    classify_error,
+    is_transient_error,
+    parse_retry_after,
+    transient_retry_after
+)
+from app.utils.exceptions import AIServiceException, CircuitOpenException
+from scripts.fake_openai_server import Distribution, FakeOpenAIServer, FakeServerConfig
+
+
+def status_error(status_code: int, headers=None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "http://fake/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    error_class = {400: openai.BadRequestError, 401: openai.AuthenticationError,
+                   429: openai.RateLimitError, 500: openai.InternalServerError}.get(status_code, openai.APIStatusError)
+    return error_class("error", response=response, body=None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_client(server: FakeOpenAIServer, breaker: CircuitBreaker = None) -> AIClient:
+    """通过ASGI传输调用模拟服务，退避时间缩短到毫秒级"""
+    client = AIClient(retry_policy=RetryPolicy(base_delay=0.001, max_delay=0.01, rng=random.Random(0)))
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    client.client = openai.AsyncOpenAI(api_key="test", base_url="http://fake/v1", http_client=http_client, max_retries=0)
+    if breaker is not None:
+        client.breakers[f"default/{client.model}"] = breaker
+    return client
+
+
+def test_errors_are_classified_by_type():
+    """按错误类型区分可重试错误"""
+    request = httpx.Request("POST", "http://fake")
+    assert classify_error(status_error(429)) == "rate_limit"
+    assert classify_error(status_error(500)) == "server"
+    assert classify_error(status_error(503)) == "server"
+    assert classify_error(status_error(408)) == "timeout"
+    assert classify_error(status_error(400)) == "client"
+    assert classify_error(status_error(401)) == "client"
+    assert classify_error(openai.APITimeoutError(request=request)) == "timeout"
+    assert classify_error(openai.APIConnectionError(request=request)) == "connection"
+    assert classify_error(asyncio.TimeoutError()) == "timeout"
+    assert classify_error(ValueError("bad json")) == "unknown"
+
+
+def test_retry_after_parsing():
+    """支持毫秒、秒和HTTP日期格式"""
+    assert parse_retry_after(status_error(429, {"retry-after-ms": "1500"})) == 1.5
+    assert parse_retry_after(status_error(429, {"retry-after": "2"})) == 2.0
+    assert parse_retry_after(status_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert parse_retry_after(status_error(429, {"retry-after": "soon"})) is None
+    assert parse_retry_after(status_error(429)) is None
+    assert parse_retry_after(ValueError()) is None
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    """退避时间在 [base, 上次*3] 内随机且不超过上限；Retry-After 超过上限时不再重试"""
+    policy = RetryPolicy(base_delay=0.5, max_delay=8.0, rng=random.Random(1))
+    delay = None
+    delays = []
+    for _ in range(50):
+        upper = max(0.5, (delay or 0.5) * 3)
+        delay = policy.next_delay(delay)
+        assert 0.5 <= delay <= min(8.0, upper)
+        delays.append(delay)
+    assert len(set(delays)) > 10
+
+    assert policy.next_delay(0.5, retry_after=3.0) == 3.0
+    assert policy.next_delay(0.5, retry_after=30.0) is None
+    assert policy.delay_for(status_error(400), "client") is None
+    with pytest.raises(ValueError):
+        RetryPolicy(base_delay=2.0, max_delay=1.0)
+
+
+def test_circuit_breaker_state_transitions():
+    """连续失败后打开，恢复时间后放行一个探测请求，探测结果决定关闭或重新打开"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=10.0, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    assert breaker.get_stats()["retry_in"] == 10.0
+
+    clock.now = 10.0
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 20.0
+    assert breaker.allow_request()
+    breaker.record_ignored()
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.get_stats()["times_opened"] == 2
+
+    # 探测请求未上报结果时，超过恢复时间后允许新的探测
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 30.0
+    assert breaker.allow_request()
+    clock.now = 40.0
+    assert breaker.allow_request()
+
+    disabled = CircuitBreaker(failure_threshold=0)
+    for _ in range(10):
+        disabled.record_failure()
+    assert disabled.allow_request()
+    assert disabled.get_stats()["state"] == "disabled"
+
+
+async def test_client_errors_are_not_retried():
+    """4xx 不重试，也不计入熔断"""
+    client = AIClient()
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        raise status_error(400)
+
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    with pytest.raises(AIServiceException):
+        await client._make_request_with_retry([{"role": "user", "content": "x"}])
+    assert len(calls) == 1
+    assert client.breakers[f"default/{client.model}"].get_stats()["consecutive_failures"] == 0
+
+
+async def test_rate_limit_honors_retry_after():
+    """429 按 Retry-After 等待后重试；要求的等待超过上限时尽快失败"""
+    server = FakeOpenAIServer(FakeServerConfig(
+        ttft=Distribution.fixed(0.0), tokens_per_second=0.0, rate_429=1.0, retry_after=0.005
+    ))
+    client = make_client(server)
+    with pytest.raises(AIServiceException):
+        await client._make_request_with_retry([{"role": "user", "content": "x"}], max_retries=3)
+    assert server.get_stats()["status"] == {"429": 3}
+    assert client.breakers[f"default/{client.model}"].state == "closed"
+
+    server = FakeOpenAIServer(FakeServerConfig(
+        ttft=Distribution.fixed(0.0), tokens_per_second=0.0, rate_429=1.0, retry_after=60
+    ))
+    client = make_client(server)
+    with pytest.raises(AIServiceException):
+        await client._make_request_with_retry([{"role": "user", "content": "x"}], max_retries=3)
+    assert server.get_stats()["status"] == {"429": 1}
+
+
+async def test_breaker_opens_on_server_errors_and_fails_fast(monkeypatch):
+    """上游持续5xx时熔断，之后的请求不再发往上游，健康检查显示熔断状态"""
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test")
+    server = FakeOpenAIServer(FakeServerConfig(ttft=Distribution.fixed(0.0), tokens_per_second=0.0, rate_5xx=1.0))
+    clock = FakeClock()
+    client = make_client(server, CircuitBreaker(failure_threshold=3, recovery_time=30.0, clock=clock))
+    messages = [{"role": "user", "content": "x"}]
+
+    with pytest.raises(CircuitOpenException):
+        await client._make_request_with_retry(messages, max_retries=5)
+    assert server.get_stats()["requests"] == 3
+
+    with pytest.raises(CircuitOpenException) as excinfo:
+        await client._make_request_with_retry(messages)
+    assert excinfo.value.details["retry_after"] == 30.0
+    assert server.get_stats()["requests"] == 3
+
+    health = await client.health_check()
+    assert health["status"] == "circuit_open"
+    assert health["circuit_breakers"][f"default/{client.model}"]["state"] == "open"
+
+    # 恢复时间后上游恢复，探测成功即关闭熔断
+    server.config.rate_5xx = 0.0
+    clock.now = 30.0
+    response = await client._make_request_with_retry(messages)
+    assert response.choices[0].message.content
+    assert client.get_runtime_stats()["circuit_breakers"][f"default/{client.model}"]["state"] == "closed"
+
+
+def test_transient_errors_follow_exception_chain():
+    """AIClient 重试耗尽后抛出的异常可按上游原因判断是否为暂时性错误"""
+    try:
+        raise AIServiceException("AI服务请求失败") from status_error(429, {"retry-after": "3"})
+    except AIServiceException as e:
+        wrapped = e
+    assert is_transient_error(wrapped)
+    assert transient_retry_after(wrapped) == 3.0
+    assert is_transient_error(CircuitOpenException("熔断中", retry_after=5.0))
+    assert transient_retry_after(CircuitOpenException("熔断中", retry_after=5.0)) == 5.0
+    assert not is_transient_error(AIServiceException("解析失败"))
+    assert not is_transient_error(status_error(400))
@@ -0,0 +1,121 @@
+"""
+语义近似缓存测试
+"""
+
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.config import Settings, settings
+from app.core.ai_client import AIClient
+from app.core.semantic_cache import SemanticCache, create_semantic_cache
+from app.core.tokenizer import TokenCounter
+
+
+PROMPT = "请写一个Python函数，计算列表中所有偶数的平方和，并给出单元测试示例"
+
+
+class CountingCompletions:
+    """统计调用次数的模拟chat.completions接口"""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+def test_embedding_ignores_whitespace_punctuation_and_case():
+    """仅空白、标点、大小写不同的提示词向量一致"""
+    cache = SemanticCache()
+    a = cache.embed(PROMPT)
+    b = cache.embed("  请写一个python函数 计算列表中所有偶数的平方和。并给出单元测试示例！")
+
+    assert np.isclose(np.linalg.norm(a), 1.0)
+    assert float(a @ b) > 0.999
+
+
+def test_lookup_respects_threshold_and_namespace():
+    """近似提示词命中，无关提示词和其他命名空间不命中"""
+    cache = SemanticCache(threshold=0.8)
+    cache.put("m:code", PROMPT, {"optimized_prompt": "cached"})
+
+    assert cache.lookup("m:code", PROMPT.replace("所有", "全部"))["optimized_prompt"] == "cached"
+    assert cache.lookup("m:code", "为产品发布会撰写一篇面向投资人的新闻稿") is None
+    assert cache.lookup("m:writing", PROMPT) is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_evicts_least_recently_used_and_expired():
+    """容量满时先清理过期条目，再淘汰最久未使用的条目"""
+    cache = SemanticCache(max_entries=2, threshold=0.99)
+    cache.put("ns", "第一条提示词内容", {"id": 1})
+    cache.put("ns", "第二条完全不同的文本", {"id": 2})
+    cache.lookup("ns", "第一条提示词内容")
+    cache.put("ns", "第三条另外一个主题", {"id": 3})
+
+    assert cache.size == 2
+    assert cache.evictions == 1
+    assert cache.lookup("ns", "第一条提示词内容") == {"id": 1}
+    assert cache.lookup("ns", "第二条完全不同的文本") is None
+
+    cache.created_at[: cache.size] = time.time() - cache.ttl - 1
+    assert cache.lookup("ns", "第一条提示词内容") is None
+
+
+def test_disabled_by_default_and_zero_capacity(monkeypatch):
+    """默认不启用；容量为0视为不启用，直接构造时拒绝"""
+    assert Settings.model_fields["SEMANTIC_CACHE_ENABLED"].default is False
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_ENABLED", False)
+    assert create_semantic_cache() is None
+
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_MAX_ENTRIES", 0)
+    assert create_semantic_cache() is None
+    with pytest.raises(ValueError):
+        SemanticCache(max_entries=0)
+
+
+async def test_index_persists_across_restarts(tmp_path):
+    """刷盘后重新加载的索引仍可命中"""
+    path = str(tmp_path / "index.npz")
+    cache = SemanticCache(path=path, flush_every=2)
+    cache.put("ns", PROMPT, {"optimized_prompt": "持久化结果"})
+    assert not cache.needs_flush
+    cache.put("ns", "另一条提示词", {"optimized_prompt": "其他"})
+    assert cache.needs_flush
+    await cache.flush()
+
+    restored = SemanticCache(path=path)
+    assert restored.size == 2
+    assert restored.lookup("ns", PROMPT + "。")["optimized_prompt"] == "持久化结果"
+
+
+async def test_ai_client_serves_near_duplicate_from_semantic_cache():
+    """近似重复的优化请求只调用一次模型且不计token"""
+    reply = json.dumps({
+        "analysis_before": {"overall_score": 4},
+        "optimized_prompt": "请用Python编写函数 sum_even_squares(nums)",
+        "improvements": [{"type": "明确命名", "description": "给出函数签名"}],
+        "analysis_after": {"overall_score": 8}
+    }, ensure_ascii=False)
+    completions = CountingCompletions(reply)
+    client = AIClient(semantic_cache=SemanticCache(threshold=0.9))
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.token_counter = TokenCounter(encoding=SimpleNamespace(encode=list))
+
+    first = await client.optimize_prompt(PROMPT, "code", mode="fused")
+    second = await client.optimize_prompt(PROMPT.replace("，", " "), "code", mode="fused")
+
+    assert completions.calls == 1
+    assert second.optimized_prompt == first.optimized_prompt
+    assert second.usage_stats.total_tokens == 0
+    assert client.get_runtime_stats()["semantic_cache"]["hits"] == 1
@@ -0,0 +1,117 @@
+"""
+单飞请求合并测试
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.ai_client import AIClient
+from app.core.singleflight import SingleFlight
+from app.core.tokenizer import TokenCounter
+
+
+async def test_concurrent_calls_share_one_execution():
+    """相同键的并发调用只执行一次，复用方拿到独立副本"""
+    flight = SingleFlight()
+    executions = 0
+
+    async def work():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return {"score": 7}
+
+    results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+
+    assert executions == 1
+    assert [shared for _, shared in results].count(False) == 1
+    results[0][0]["score"] = 0
+    assert all(value == {"score": 7} for value, _ in results[1:])
+    assert flight.get_stats() == {
+        "calls": 5, "executions": 1, "collapsed": 4, "cancelled": 0, "in_flight": 0
+    }
+
+    await flight.do("k", work)
+    assert executions == 2
+
+
+async def test_errors_propagate_to_all_waiters():
+    """底层调用失败时所有等待者都收到异常"""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*[flight.do("k", fail) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.in_flight == 0
+
+
+async def test_cancelling_one_waiter_keeps_call_running():
+    """单个调用方取消不影响其他等待者，全部取消时才取消底层调用"""
+    flight = SingleFlight()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def work():
+        started.set()
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    release.set()
+    assert await second == ("done", True)
+
+    release.clear()
+    started.clear()
+    only = asyncio.create_task(flight.do("k2", work))
+    await started.wait()
+    only.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await only
+    await asyncio.sleep(0)
+
+    assert flight.get_stats()["cancelled"] == 1
+    assert flight.in_flight == 0
+
+
+async def test_ai_client_collapses_concurrent_optimizations():
+    """并发的相同优化请求只调用一次模型，合并方不计token"""
+    reply = json.dumps({
+        "analysis_before": {"overall_score": 4},
+        "optimized_prompt": "请用Python编写函数 add(a, b)",
+        "improvements": [],
+        "analysis_after": {"overall_score": 8}
+    }, ensure_ascii=False)
+    calls = 0
+
+    async def create(model, messages, **kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    client = AIClient()
+    client.cache = None
+    client.semantic_cache = None
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    client.token_counter = TokenCounter(encoding=SimpleNamespace(encode=list))
+
+    results = await asyncio.gather(*[
+        client.optimize_prompt("写一个加法函数", "code", mode="fused") for _ in range(4)
+    ])
+
+    assert calls == 1
+    assert sorted(result.usage_stats.total_tokens > 0 for result in results) == [False, False, False, True]
+    assert client.get_runtime_stats()["singleflight"]["collapsed"] == 3
@@ -0,0 +1,108 @@
+"""
+Token计数服务测试
+"""
+from types import SimpleNamespace
+
+import tiktoken
+
+from app.config import settings
+from app.core.ai_client import AIClient
+from app.core.prompt_analyzer import PromptAnalyzer
+from app.core.tokenizer import MAX_CACHED_TEXT_LENGTH, TokenCounter, estimate_tokens
+
+
+class CountingEncoding:
+    """按字符计数并记录调用次数的编码器"""
+
+    name = "chars"
+
+    def __init__(self):
+        self.single_calls = 0
+        self.batch_calls = 0
+
+    def encode_ordinary(self, text):
+        self.single_calls += 1
+        return list(text)
+
+    def encode_ordinary_batch(self, texts):
+        self.batch_calls += 1
+        return [list(text) for text in texts]
+
+
+def test_count_memoizes_repeated_text():
+    encoding = CountingEncoding()
+    counter = TokenCounter(encoding=encoding)
+
+    assert counter.count("hello") == 5
+    assert counter.count("hello") == 5
+    assert counter.count("") == 0
+
+    assert encoding.single_calls == 1
+    assert counter.get_stats()["hits"] == 1
+    assert counter.get_stats()["encoding"] == "chars"
+
+
+def test_long_text_is_not_cached():
+    encoding = CountingEncoding()
+    counter = TokenCounter(encoding=encoding)
+    text = "x" * (MAX_CACHED_TEXT_LENGTH + 1)
+
+    counter.count(text)
+    counter.count(text)
+
+    assert encoding.single_calls == 2
+    assert counter.get_stats()["cache_size"] == 0
+
+
+def test_count_many_deduplicates_and_batches_misses():
+    encoding = CountingEncoding()
+    counter = TokenCounter(encoding=encoding)
+    counter.count("cached")
+    texts = ["cached", ""] + [f"text{i}" for i in range(10)] * 2
+
+    counts = counter.count_many(texts)
+
+    assert counts == [len(text) for text in texts]
+    assert encoding.batch_calls == 1
+    assert encoding.single_calls == 1
+    assert counter.count_many(texts[2:12]) == counts[2:12]
+    assert encoding.batch_calls == 1
+
+
+def test_load_failure_falls_back_to_estimate_once(monkeypatch):
+    calls = []
+
+    def failing_get_encoding(name):
+        calls.append(name)
+        raise OSError("offline")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", failing_get_encoding)
+    counter = TokenCounter("cl100k_base")
+
+    assert counter.count("写一个函数计算两个数的和") == estimate_tokens("写一个函数计算两个数的和") == 12
+    assert counter.count_many(["abcdefgh", "abcd"]) == [2, 1]
+    assert calls == ["cl100k_base"]
+    assert not counter.available
+    assert counter.get_stats()["load_error"] == "offline"
+
+
+def test_ai_client_counts_tokens_without_api_key(monkeypatch):
+    """计数不依赖API客户端初始化"""
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+    client = AIClient(token_counter=TokenCounter(encoding=SimpleNamespace(encode=list)))
+
+    assert client.count_tokens("abc") == 3
+    assert client.client is None
+
+
+def test_analyzer_reports_token_features():
+    analyzer = PromptAnalyzer(token_counter=TokenCounter(encoding=SimpleNamespace(encode=list)))
+    prompt = "Please write a Python function."
+
+    features = analyzer.analyze_local(prompt).features
+    batch = analyzer.analyze_many([prompt, ""])
+
+    assert features.token_count == len(prompt)
+    assert features.tokens_per_word == len(prompt) / 5
+    assert batch["token_count"].tolist() == [len(prompt), 0]
+    assert batch["tokens_per_word"][1] == 0